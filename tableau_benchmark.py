@@ -0,0 +1,365 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import tableau_rest
+from tableau_mock_server import MockTableauServer, SyntheticSite
+
+
+### benchmark harness: times every Query* class, lookup method and write path in tableau_rest.py against a local MockTableauServer
+#### python tableau_benchmark.py --users 100000 --groups 5000 --workbooks 10000 --latency 0.02 --repeat 3 --json results.json
+#### python tableau_benchmark.py --baseline results.json   (prints each scenario's median time relative to an earlier run)
+#### scenarios can be chosen with --only (e.g --only QueryUsers user_id_from_name); --list shows them
+
+
+VERSION = '3.11'
+xmlns = {'t': 'http://tableau.com/api'}
+_scenarios = []
+
+
+def scenario(group):
+    """
+    registers a benchmark; the function is called with the Context and times one run. group is 'read', 'lookup' or 'write'
+    """
+    def register(function):
+        _scenarios.append((function.__name__, group, function))
+        return function
+    return register
+
+
+class Context():
+    """
+    what a scenario needs: the signed-in client, the mock server, the site and objects prepared by earlier scenarios
+    """
+    def __init__(self, server, site, client, lookups):
+        self.server = server
+        self.site = site
+        self.client = client
+        self.lookups = lookups
+        self.token, self.site_id, self.user_id = tableau_rest.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+        self.args = (VERSION, self.site_id, self.token, server.url, xmlns)
+        self._names = itertools.count()
+        self.users = self.groups = self.projects = self.workbooks = None
+
+    def unique_name(self, prefix):
+        return 'benchmark_{0}_{1}_{2}'.format(prefix, os.getpid(), next(self._names))
+
+    def sample(self, records):
+        # lookups spread across the listing rather than hitting the first few entries
+        step = max(1, len(records) // self.lookups)
+        return records[::step][:self.lookups]
+
+
+## reads: one full listing or traversal per run
+
+@scenario('read')
+def sign_in(ctx):
+    tableau_rest.sign_in(ctx.server.url, 'admin', 'password', VERSION, xmlns)
+
+@scenario('read')
+def QueryUsers(ctx):
+    ctx.users = tableau_rest.QueryUsers(*ctx.args, client=ctx.client, cache=False)
+
+@scenario('read')
+def QueryGroups(ctx):
+    ctx.groups = tableau_rest.QueryGroups(*ctx.args, client=ctx.client, cache=False)
+
+@scenario('read')
+def QueryProjects(ctx):
+    ctx.projects = tableau_rest.QueryProjects(*ctx.args, client=ctx.client, cache=False)
+
+@scenario('read')
+def QueryWorkbooks(ctx):
+    ctx.workbooks = tableau_rest.QueryWorkbooks(*ctx.args, client=ctx.client, cache=False)
+
+@scenario('read')
+def iter_users(ctx):
+    for user in tableau_rest.iter_users(*ctx.args, client=ctx.client):
+        pass
+
+@scenario('read')
+def QueryUsers_refresh(ctx):
+    ctx.users.refresh(ctx.token)
+
+@scenario('read')
+def QueryWorkbookViews(ctx):
+    for workbook_id in ctx.sample(ctx.workbooks.workbook_ids)[:10]:
+        tableau_rest.QueryWorkbookViews(*ctx.args, workbook_id, client=ctx.client)
+
+@scenario('read')
+def ViewIndex(ctx):
+    # every view on the site, against one QueryWorkbookViews call per workbook
+    tableau_rest.ViewIndex(*ctx.args, client=ctx.client, cache=False)
+
+@scenario('read')
+def users_in_group(ctx):
+    for group_id in ctx.groups.group_ids[1:11]:
+        tableau_rest.users_in_group(ctx.args[0], ctx.site_id, ctx.token, group_id, ctx.server.url, xmlns, client=ctx.client)
+
+@scenario('read')
+def groups_for_user(ctx):
+    for user_id in ctx.sample(ctx.users.user_ids)[:10]:
+        tableau_rest.groups_for_user(ctx.args[0], ctx.site_id, ctx.token, user_id, ctx.server.url, xmlns, client=ctx.client)
+
+@scenario('read')
+def MembershipGraph(ctx):
+    tableau_rest.MembershipGraph(*ctx.args, group_ids=ctx.groups.group_ids[1:101], client=ctx.client)
+
+@scenario('read')
+def QueryDefaultPermissions(ctx):
+    tableau_rest.QueryDefaultPermissions(*ctx.args, ctx.projects.project_ids[0], client=ctx.client)
+
+@scenario('read')
+def BulkQueryDefaultPermissions(ctx):
+    tableau_rest.BulkQueryDefaultPermissions(*ctx.args, ctx.projects.project_ids[:50], client=ctx.client)
+
+@scenario('read')
+def query_view_data(ctx):
+    view_id = ctx.site.views[0]['id']
+    tableau_rest.query_view_data(VERSION, ctx.site_id, ctx.token, xmlns, view_id, ctx.server.url, client=ctx.client)
+
+@scenario('read')
+def download_workbook(ctx):
+    with tempfile.TemporaryDirectory() as directory:
+        tableau_rest.download_workbook(VERSION, ctx.site_id, ctx.token, xmlns, ctx.workbooks.workbook_ids[0], ctx.server.url,
+                                       client=ctx.client, path=os.path.join(directory, 'workbook.twbx'))
+
+
+## lookups: ctx.lookups in-memory lookups per run on the listings read above
+
+@scenario('lookup')
+def user_id_from_name(ctx):
+    for name in ctx.sample(ctx.users.user_names):
+        ctx.users.user_id_from_name(name)
+
+@scenario('lookup')
+def user_ids_from_names(ctx):
+    ctx.users.ids_from_names(ctx.sample(ctx.users.user_names))
+
+@scenario('lookup')
+def user_names_from_ids(ctx):
+    ctx.users.names_from_ids(ctx.sample(ctx.users.user_ids))
+
+@scenario('lookup')
+def user_siterole_from_name(ctx):
+    for name in ctx.sample(ctx.users.user_names):
+        ctx.users.user_siterole_from_name(name)
+
+@scenario('lookup')
+def group_id_from_name(ctx):
+    for name in ctx.sample(ctx.groups.group_names):
+        ctx.groups.group_id_from_name(name)
+
+@scenario('lookup')
+def group_ids_from_names(ctx):
+    ctx.groups.ids_from_names(ctx.sample(ctx.groups.group_names))
+
+@scenario('lookup')
+def project_id_from_name(ctx):
+    for name in ctx.sample(ctx.projects.project_names):
+        ctx.projects.project_id_from_name(name)
+
+@scenario('lookup')
+def workbook_id_from_name(ctx):
+    for name in ctx.sample(ctx.workbooks.workbook_names):
+        ctx.workbooks.workbook_id_from_name(name)
+
+@scenario('lookup')
+def workbooks_from_projectid(ctx):
+    for project_id in ctx.sample(ctx.projects.project_ids):
+        ctx.workbooks.workbooks_from_projectid(project_id)
+
+
+## writes: each run creates what it changes, so runs can repeat against the same site
+
+@scenario('write')
+def add_update_delete_user(ctx):
+    name = ctx.unique_name('user')
+    tableau_rest.add_user(*ctx.args, name, 'Viewer', client=ctx.client)
+    user_id = ctx.site.users[-1]['id']
+    tableau_rest.update_user(*ctx.args, user_id, name, name + '@example.com', 'password', 'Explorer', client=ctx.client)
+    tableau_rest.delete_user(*ctx.args, user_id, client=ctx.client)
+
+@scenario('write')
+def add_delete_group(ctx):
+    group_id = tableau_rest.add_group(*ctx.args, ctx.unique_name('group'), client=ctx.client)[1]
+    tableau_rest.delete_group(*ctx.args, group_id, client=ctx.client)
+
+@scenario('write')
+def add_remove_user_from_group(ctx):
+    group_id = tableau_rest.add_group(*ctx.args, ctx.unique_name('group'), client=ctx.client)[1]
+    for user_id in ctx.sample(ctx.users.user_ids)[:20]:
+        tableau_rest.add_user_to_group(*ctx.args, group_id, user_id, client=ctx.client)
+        tableau_rest.remove_user_from_group(*ctx.args, group_id, user_id, client=ctx.client)
+    tableau_rest.delete_group(*ctx.args, group_id, client=ctx.client)
+
+@scenario('write')
+def sync_group_members(ctx):
+    group_id = tableau_rest.add_group(*ctx.args, ctx.unique_name('group'), client=ctx.client)[1]
+    tableau_rest.sync_group_members(*ctx.args, group_id, ctx.sample(ctx.users.user_ids)[:100], client=ctx.client)
+    tableau_rest.delete_group(*ctx.args, group_id, client=ctx.client)
+
+@scenario('write')
+def create_update_delete_project(ctx):
+    name = ctx.unique_name('project')
+    tableau_rest.create_project(*ctx.args, name, 'benchmark project', client=ctx.client)
+    project_id = ctx.site.projects[-1]['id']
+    tableau_rest.update_project_contentpermissions(VERSION, ctx.site_id, ctx.token, project_id, ctx.server.url, xmlns, 'ManagedByOwner', client=ctx.client)
+    tableau_rest.delete_project(*ctx.args, project_id, client=ctx.client)
+
+def _onboarding_plan(ctx, users=20):
+    # a department: a project, a group, users in the group and the group's five default permissions
+    project, group = ctx.unique_name('project'), ctx.unique_name('group')
+    user_names = [ctx.unique_name('user') for _ in range(users)]
+    return {'projects': [{'name': project, 'description': 'benchmark project'}],
+            'groups': [{'name': group}],
+            'users': [{'name': name, 'site_role': 'Viewer'} for name in user_names],
+            'memberships': {group: user_names},
+            'permissions': {project: {permissions_obj: {'groups': {group: {'Read': 'Allow'}}} for permissions_obj in tableau_rest._permissions_objects}}}
+
+def _delete_onboarding(ctx, plan):
+    names = {(kind, item['name']) for kind in ('projects', 'groups', 'users') for item in plan[kind]}
+    for kind, delete in (('projects', tableau_rest.delete_project), ('groups', tableau_rest.delete_group), ('users', tableau_rest.delete_user)):
+        for item in [item for item in ctx.site.collection(kind) if (kind, item['name']) in names]:
+            delete(*ctx.args, item['id'], client=ctx.client)
+
+@scenario('write')
+def onboarding_serial(ctx):
+    plan = _onboarding_plan(ctx)
+    tableau_rest.create_project(*ctx.args, plan['projects'][0]['name'], 'benchmark project', client=ctx.client)
+    project_id = ctx.site.projects[-1]['id']
+    group_id = tableau_rest.add_group(*ctx.args, plan['groups'][0]['name'], client=ctx.client)[1]
+    for user in plan['users']:
+        tableau_rest.add_user(*ctx.args, user['name'], user['site_role'], client=ctx.client)
+        tableau_rest.add_user_to_group(*ctx.args, group_id, ctx.site.users[-1]['id'], client=ctx.client)
+    for permissions_obj in tableau_rest._permissions_objects:
+        writer = tableau_rest.WriteDefaultPermissions(*ctx.args, permissions_obj, project_id, client=ctx.client)
+        writer.add_permissions(writer.create_permissions_dict(group_id_list=[group_id], group_cap_name_list=['Read'], group_cap_mode_list=['Allow']))
+    _delete_onboarding(ctx, plan)
+
+@scenario('write')
+def onboarding_plan(ctx):
+    plan = _onboarding_plan(ctx)
+    tableau_rest.execute_plan(*ctx.args, plan, client=ctx.client)
+    _delete_onboarding(ctx, plan)
+
+@scenario('write')
+def WriteDefaultPermissions(ctx):
+    writer = tableau_rest.WriteDefaultPermissions(*ctx.args, 'workbook', ctx.projects.project_ids[0], client=ctx.client)
+    user_ids = ctx.sample(ctx.users.user_ids)[:20]
+    perm_dict = writer.create_permissions_dict(user_id_list=user_ids, user_cap_name_list=['Read'] * len(user_ids), user_cap_mode_list=['Allow'] * len(user_ids))
+    writer.add_permissions(perm_dict)
+    writer.delete_permissions(perm_dict)
+
+@scenario('write')
+def add_delete_user_permission(ctx):
+    project_id = ctx.projects.project_ids[0]
+    for user_id in ctx.sample(ctx.users.user_ids)[:10]:
+        tableau_rest.add_user_permission_to_project(*ctx.args, project_id, user_id, 'Read', 'Allow', client=ctx.client)
+        tableau_rest.delete_user_permission_from_project(*ctx.args, project_id, user_id, 'Read', 'Allow', client=ctx.client)
+
+
+def run(server, site, repeat=3, lookups=1000, only=None, pool_size=10, response_format='xml'):
+    """
+    runs the scenarios (all of them, or those named in only) repeat times each, in registration order
+    returns a dictionary of scenario name -> {'group', 'calls', 'min', 'median', 'max', 'parse'} (seconds; calls is API calls per run
+    and parse the seconds per run spent turning responses into records) and the client's Instrumentation summary of every
+    scenario under 'instrumentation'. response_format is the client's ('xml' or 'json')
+    """
+    instrumentation = tableau_rest.Instrumentation()
+    client = tableau_rest.TableauClient(pool_size=pool_size, instrumentation=instrumentation, response_format=response_format)
+    ctx = Context(server, site, client, lookups)
+    # later scenarios look things up in the listings, so these are always read once
+    for prerequisite in (QueryUsers, QueryGroups, QueryProjects, QueryWorkbooks):
+        prerequisite(ctx)
+    results = {}
+    summaries = {}
+    for name, group, function in _scenarios:
+        if only and name not in only:
+            continue
+        instrumentation.reset()
+        times = []
+        calls_before = len(server.calls)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            # write functions print what they changed
+            with contextlib.redirect_stdout(io.StringIO()):
+                function(ctx)
+            times.append(time.perf_counter() - started)
+        summaries[name] = instrumentation.summary()
+        results[name] = {'group': group, 'calls': (len(server.calls) - calls_before) // repeat,
+                         'min': min(times), 'median': statistics.median(times), 'max': max(times),
+                         'parse': sum(stats['parse']['sum'] for stats in summaries[name].values()) / repeat}
+    client.close()
+    return {'scenarios': results, 'instrumentation': summaries}
+
+
+def report(results, baseline=None, out=sys.stdout):
+    rows = [('scenario', 'group', 'calls', 'median s', 'min s', 'parse s', 'vs baseline', 'parse vs baseline')]
+    for name, result in results['scenarios'].items():
+        relative = parse_relative = ''
+        previous = baseline['scenarios'].get(name) if baseline else None
+        if previous:
+            relative = '{0:.2f}x'.format(result['median'] / previous['median'])
+            if previous.get('parse') and result['parse']:
+                parse_relative = '{0:.2f}x'.format(result['parse'] / previous['parse'])
+        rows.append((name, result['group'], str(result['calls']), '{0:.4f}'.format(result['median']), '{0:.4f}'.format(result['min']),
+                     '{0:.4f}'.format(result['parse']), relative, parse_relative))
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip(), file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark tableau_rest against a local mock Tableau server')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--groups', type=int, default=500)
+    parser.add_argument('--projects', type=int, default=200)
+    parser.add_argument('--workbooks', type=int, default=1000)
+    parser.add_argument('--views-per-workbook', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many seconds more are added at random')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls answered with a 503')
+    parser.add_argument('--max-page-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--lookups', type=int, default=1000, help='lookups per run in the lookup scenarios')
+    parser.add_argument('--pool-size', type=int, default=10)
+    parser.add_argument('--xml-parser', choices=tableau_rest._xml_parsers, default=tableau_rest.get_xml_parser(), help='see tableau_rest.set_xml_parser')
+    parser.add_argument('--response-format', choices=tableau_rest._response_formats, default='xml', help='format the client asks read endpoints for')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='+', help='scenario names to run')
+    parser.add_argument('--list', action='store_true', help='list the scenarios and exit')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file from an earlier run to compare against')
+    args = parser.parse_args(argv)
+    if args.list:
+        for name, group, function in _scenarios:
+            print(group.ljust(8), name)
+        return
+    tableau_rest.set_xml_parser(args.xml_parser)
+    site = SyntheticSite.generate(users=args.users, groups=args.groups, projects=args.projects, workbooks=args.workbooks,
+                                  views_per_workbook=args.views_per_workbook, seed=args.seed)
+    with MockTableauServer(site, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           max_page_size=args.max_page_size, seed=args.seed) as server:
+        results = run(server, site, repeat=args.repeat, lookups=args.lookups, only=args.only, pool_size=args.pool_size,
+                      response_format=args.response_format)
+    results['parameters'] = vars(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
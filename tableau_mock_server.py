@@ -0,0 +1,474 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from xml.sax.saxutils import quoteattr
+
+
+### local stand-in for the Tableau REST API endpoints tableau_rest.py uses, for measuring performance without a server
+#### serves auth, users, groups, projects, workbooks, views, group members, permissions, default permissions,
+#### workbook content and view data for one or more synthetic sites, with configurable latency, pagination and error injection
+##       site = tableau_mock_server.SyntheticSite.generate(users=100000, groups=5000, workbooks=10000)
+##       with tableau_mock_server.MockTableauServer({"": site}, latency=0.01) as server:
+##           token, site_id, user_id = tableau_rest.sign_in(server.url, "admin", "password", "3.11", xmlns)
+#### any username and password are accepted; each site is signed in to with its contentUrl
+
+
+XMLNS = 'http://tableau.com/api'
+_range_operators = {'eq': lambda a, b: a == b, 'gt': lambda a, b: a > b, 'gte': lambda a, b: a >= b, 'lt': lambda a, b: a < b, 'lte': lambda a, b: a <= b}
+
+
+def _timestamp(seconds):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(seconds))
+
+
+class SyntheticSite():
+    """
+    the objects of one site, kept as lists of attribute dictionaries in server order with id indexes
+    keys are the XML attribute names; keys starting with _ hold child elements (e.g _project_id) and are not rendered as attributes
+    """
+    def __init__(self, content_url="", name=None):
+        self.id = str(uuid.uuid4())
+        self.content_url = content_url
+        self.name = name or content_url or 'Default'
+        self.users, self.groups, self.projects, self.workbooks, self.views = [], [], [], [], []
+        self.members = {}
+        self.permissions = {}
+
+    @classmethod
+    def generate(cls, users=1000, groups=50, projects=20, workbooks=200, views_per_workbook=3, memberships_per_user=3, content_url="", seed=0):
+        """
+        returns a site with the given numbers of objects, built from seed so runs are reproducible
+        every user is in memberships_per_user random groups plus All Users; about 1% of names are non-ASCII
+        """
+        rng = random.Random(seed)
+        site = cls(content_url)
+        ids = lambda: str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        dates = lambda: _timestamp(1577836800 + rng.randrange(0, 3 * 365 * 86400))
+        site_roles = ('Viewer', 'Explorer', 'ExplorerCanPublish', 'Creator', 'SiteAdministratorExplorer', 'Unlicensed')
+        for number in range(users):
+            name = 'user{0}'.format(number) if number % 100 else 'üser{0}'.format(number)
+            site.users.append({'id': ids(), 'name': name, 'siteRole': rng.choice(site_roles), 'lastLogin': dates() if number % 10 else None,
+                               'externalAuthUserId': '', 'language': 'en', 'locale': 'en_US', 'fullName': name.title(), 'email': name + '@example.com'})
+        all_users = {'id': ids(), 'name': 'All Users', 'minimumSiteRole': 'Unlicensed', '_domain_name': 'local'}
+        site.groups.append(all_users)
+        for number in range(groups):
+            site.groups.append({'id': ids(), 'name': 'group{0}'.format(number), 'minimumSiteRole': rng.choice(site_roles), '_domain_name': 'local'})
+        site.members = {group['id']: {} for group in site.groups}
+        site.members[all_users['id']] = dict.fromkeys(user['id'] for user in site.users)
+        if groups:
+            for user in site.users:
+                for group in rng.sample(site.groups[1:], min(memberships_per_user, groups)):
+                    site.members[group['id']][user['id']] = None
+        owner = site.users[0]['id'] if site.users else ids()
+        for number in range(projects):
+            created = dates()
+            parent = site.projects[rng.randrange(len(site.projects))]['id'] if site.projects and number % 4 == 0 else None
+            site.projects.append({'id': ids(), 'name': 'project{0}'.format(number), 'description': 'synthetic project {0}'.format(number),
+                                  'parentProjectId': parent, 'contentPermissions': 'LockedToProject', 'createdAt': created, 'updatedAt': max(created, dates()),
+                                  'topLevelProject': 'false' if parent else 'true', '_owner_id': owner})
+        for number in range(workbooks):
+            project = site.projects[rng.randrange(len(site.projects))] if site.projects else {'id': None, 'name': None}
+            created = dates()
+            workbook = {'id': ids(), 'name': 'workbook{0}'.format(number), 'contentUrl': 'workbook{0}'.format(number), 'createdAt': created,
+                        'updatedAt': max(created, dates()), 'projectName': project['name'], 'size': str(rng.randrange(1, 500)),
+                        '_project_id': project['id'], '_owner_id': owner}
+            site.workbooks.append(workbook)
+            for view_number in range(views_per_workbook):
+                site.views.append({'id': ids(), 'name': 'view{0}'.format(view_number), 'contentUrl': '{0}/sheets/view{1}'.format(workbook['contentUrl'], view_number),
+                                   'viewUrlName': 'view{0}'.format(view_number), 'createdAt': created, 'updatedAt': workbook['updatedAt'],
+                                   '_workbook_id': workbook['id'], '_owner_id': owner, '_project_id': project['id']})
+        return site
+
+    def collection(self, resource):
+        return getattr(self, resource)
+
+    def find(self, resource, object_id):
+        for item in self.collection(resource):
+            if item['id'] == object_id:
+                return item
+        return None
+
+
+def _attributes(item, fields=None):
+    return ' '.join('{0}={1}'.format(key, quoteattr(value)) for key, value in item.items()
+                    if not key.startswith('_') and value is not None and (fields is None or key in fields))
+
+def _render(resource, item, fields=None):
+    attributes = _attributes(item, fields)
+    if fields is not None:
+        return '<{0} {1}/>'.format(resource[:-1], attributes)
+    if resource in ('users', 'sites'):
+        return '<{0} {1}/>'.format(resource[:-1], attributes)
+    if resource == 'groups':
+        return '<group {0}><domain name={1}/></group>'.format(attributes, quoteattr(item['_domain_name']))
+    if resource == 'projects':
+        return '<project {0}><owner id="{1}"/></project>'.format(attributes, item['_owner_id'])
+    if resource == 'workbooks':
+        return '<workbook {0}><project id="{1}" name={2}/><owner id="{3}"/></workbook>'.format(attributes, item['_project_id'], quoteattr(item['projectName'] or ''), item['_owner_id'])
+    return '<view {0}><workbook id="{1}"/><owner id="{2}"/><project id="{3}"/></view>'.format(attributes, item['_workbook_id'], item['_owner_id'], item['_project_id'])
+
+_children = {
+    'groups': lambda item: {'domain': {'name': item['_domain_name']}},
+    'projects': lambda item: {'owner': {'id': item['_owner_id']}},
+    'workbooks': lambda item: {'project': {'id': item['_project_id'], 'name': item['projectName'] or ''}, 'owner': {'id': item['_owner_id']}},
+    'views': lambda item: {'workbook': {'id': item['_workbook_id']}, 'owner': {'id': item['_owner_id']}, 'project': {'id': item['_project_id']}},
+}
+
+def _render_json(resource, item, fields=None):
+    # the json rendering of _render: attributes become keys, child elements nested objects
+    rendered = {key: value for key, value in item.items()
+                if not key.startswith('_') and value is not None and (fields is None or key in fields)}
+    if fields is None and resource in _children:
+        rendered.update(_children[resource](item))
+    return rendered
+
+def _filtered(items, query):
+    if 'filter' in query:
+        for expression in re.split(r',(?![^\[]*\])', query['filter'][0]):
+            field, operator, value = expression.split(':', 2)
+            if operator == 'in':
+                values = set(value.strip('[]').split(','))
+                items = [item for item in items if item.get(field) in values]
+            else:
+                compare = _range_operators[operator]
+                items = [item for item in items if item.get(field) is not None and compare(item.get(field), value)]
+    if 'sort' in query:
+        for key in reversed(query['sort'][0].split(',')):
+            field, _, direction = key.partition(':')
+            items = sorted(items, key=lambda item: item.get(field) or '', reverse=direction == 'desc')
+    return items
+
+
+class MockTableauServer():
+    """
+    serves sites (a dictionary of contentUrl -> SyntheticSite, or a single SyntheticSite for the default site) on a local port
+    latency: seconds added to every response (plus up to jitter seconds more)
+    max_page_size: largest pageSize accepted; larger values get a 400 like the real server
+    error_rate, error_statuses: fraction of calls answered with a random one of error_statuses (seeded with seed)
+    fail_next(statuses): the next calls are answered with these statuses, in order
+    require_auth: reject calls without a token issued by sign in; tokens expire after token_lifetime seconds (None for never)
+    workbook_size: bytes of workbook content served (HTTP Range requests are honoured); view_rows: rows of view data served
+    calls holds a (method, path, status) tuple for every call
+    """
+    def __init__(self, sites, latency=0.0, jitter=0.0, max_page_size=1000, error_rate=0.0, error_statuses=(503,), require_auth=True,
+                 token_lifetime=None, workbook_size=1000000, view_rows=1000, seed=0, host='127.0.0.1', port=0):
+        self.sites = {"": sites} if isinstance(sites, SyntheticSite) else dict(sites)
+        self._sites_by_id = {site.id: site for site in self.sites.values()}
+        self.latency = latency
+        self.jitter = jitter
+        self.max_page_size = max_page_size
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.require_auth = require_auth
+        self.token_lifetime = token_lifetime
+        self.workbook_size = workbook_size
+        self.view_rows = view_rows
+        self.calls = []
+        self.tokens = {}
+        self._failures = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+        self.url = 'http://{0}:{1}'.format(*self._httpd.server_address[:2])
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def fail_next(self, statuses):
+        with self._lock:
+            self._failures.extend(statuses)
+
+    def expire_tokens(self):
+        with self._lock:
+            self.tokens.clear()
+
+    def _injected_failure(self):
+        with self._lock:
+            if self._failures:
+                return self._failures.pop(0)
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self._random.choice(self.error_statuses)
+        return None
+
+    def _valid_token(self, token):
+        with self._lock:
+            issued = self.tokens.get(token)
+        if issued is None:
+            return None
+        if self.token_lifetime is not None and time.time() - issued[1] > self.token_lifetime:
+            return None
+        return issued[0]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _send(self, status, body=b'', content_type='application/xml', headers=None):
+        # recorded before the response goes out so a client never sees a call that calls does not hold yet
+        self.server.mock.calls.append((self.command, self.path, status))
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _xml(self, status, body=''):
+        self._send(status, '<?xml version="1.0" encoding="UTF-8"?><tsResponse xmlns="{0}">{1}</tsResponse>'.format(XMLNS, body).encode('utf-8'))
+
+    def _json(self, status, payload):
+        self._send(status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def _wants_json(self):
+        return 'application/json' in self.headers.get('Accept', '')
+
+    def _error(self, status, code, summary, detail):
+        if self._wants_json():
+            return self._json(status, {'error': {'code': code, 'summary': summary, 'detail': detail}})
+        self._xml(status, '<error code="{0}"><summary>{1}</summary><detail>{2}</detail></error>'.format(code, summary, detail))
+
+    def _handle(self, method):
+        mock = self.server.mock
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if mock.latency or mock.jitter:
+            time.sleep(mock.latency + mock.jitter * mock._random.random())
+        status = mock._injected_failure()
+        if status is not None:
+            return self._error(status, '{0}000'.format(status), 'Injected failure', 'injected by MockTableauServer')
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        path = parts.path
+        if re.match(r'^/api/[^/]+/auth/signin$', path) and method == 'POST':
+            return self._sign_in(body)
+        token = self.headers.get('x-tableau-auth')
+        signed_in_site = mock._valid_token(token)
+        if re.match(r'^/api/[^/]+/auth/signout$', path) and method == 'POST':
+            if signed_in_site is None and mock.require_auth:
+                return self._error(401, '401002', 'Unauthorized Access', 'Invalid authentication credentials were provided.')
+            with mock._lock:
+                mock.tokens.pop(token, None)
+            return self._send(204)
+        if re.match(r'^/api/[^/]+/sites$', path) and method == 'GET':
+            if signed_in_site is None and mock.require_auth:
+                return self._error(401, '401002', 'Unauthorized Access', 'Invalid authentication credentials were provided.')
+            return self._page('sites', [{'id': site.id, 'name': site.name, 'contentUrl': site.content_url, 'adminMode': 'ContentAndUsers', 'state': 'Active'}
+                                        for site in mock.sites.values()], query)
+        match = re.match(r'^/api/[^/]+/sites/([^/]+)/(.*)$', path)
+        if match is None:
+            return self._error(404, '404000', 'Resource Not Found', 'Unknown path {0}'.format(path))
+        site = mock._sites_by_id.get(match.group(1))
+        if mock.require_auth and (signed_in_site is None or site is not signed_in_site):
+            return self._error(401, '401002', 'Unauthorized Access', 'Invalid authentication credentials were provided.')
+        if site is None:
+            return self._error(404, '404000', 'Site not found', match.group(1))
+        rest = match.group(2)
+        try:
+            return self._route(site, method, rest, query, body)
+        except KeyError as error:
+            return self._error(404, '404000', 'Resource Not Found', 'not found: {0}'.format(error))
+
+    def _sign_in(self, body):
+        mock = self.server.mock
+        credentials = ET.fromstring(body).find('credentials')
+        content_url = credentials.find('site').get('contentUrl', '')
+        site = mock.sites.get(content_url)
+        if site is None:
+            return self._error(401, '401001', 'Signin Error', 'Site {0} not found'.format(content_url))
+        token = uuid.uuid4().hex
+        with mock._lock:
+            mock.tokens[token] = (site, time.time())
+        self._xml(200, '<credentials token="{0}"><site id="{1}" contentUrl={2}/><user id="{3}"/></credentials>'.format(
+            token, site.id, quoteattr(content_url), site.users[0]['id'] if site.users else uuid.uuid4()))
+
+    def _page(self, resource, items, query):
+        mock = self.server.mock
+        page_size = int(query.get('pageSize', ['100'])[0])
+        page_number = int(query.get('pageNumber', ['1'])[0])
+        if page_size > mock.max_page_size:
+            return self._error(400, '400006', 'Invalid page size', 'The page size must be between 1 and {0}'.format(mock.max_page_size))
+        items = _filtered(items, query)
+        fields = None
+        if 'fields' in query and query['fields'][0] not in ('_all_', '_default_'):
+            fields = set(query['fields'][0].split(','))
+        chunk = items[(page_number - 1) * page_size: page_number * page_size]
+        if self._wants_json():
+            return self._json(200, {'pagination': {'pageNumber': str(page_number), 'pageSize': str(page_size), 'totalAvailable': str(len(items))},
+                                    resource: {resource[:-1]: [_render_json(resource, item, fields) for item in chunk]}})
+        self._xml(200, '<pagination pageNumber="{0}" pageSize="{1}" totalAvailable="{2}"/><{3}>{4}</{3}>'.format(
+            page_number, page_size, len(items), resource, ''.join(_render(resource, item, fields) for item in chunk)))
+
+    def _route(self, site, method, rest, query, body):
+        segments = rest.split('/')
+        request = ET.fromstring(body) if body else None
+        if method == 'GET' and rest in ('users', 'groups', 'projects', 'workbooks', 'views'):
+            return self._page(rest, site.collection(rest), query)
+        if method == 'GET' and re.match(r'^users/[^/]+$', rest):
+            user = site.find('users', segments[1])
+            if user is None:
+                raise KeyError(segments[1])
+            if self._wants_json():
+                return self._json(200, {'user': _render_json('users', user)})
+            return self._xml(200, _render('users', user))
+        if method == 'GET' and re.match(r'^users/[^/]+/groups$', rest):
+            return self._page('groups', [group for group in site.groups if segments[1] in site.members[group['id']]], query)
+        if re.match(r'^groups/[^/]+/users$', rest):
+            members = site.members[segments[1]]
+            if method == 'GET':
+                users_by_id = {user['id']: user for user in site.users}
+                return self._page('users', [users_by_id[user_id] for user_id in members if user_id in users_by_id], query)
+            user = site.find('users', request.find('{*}user').get('id'))
+            if user is None:
+                raise KeyError('user')
+            if user['id'] in members:
+                return self._error(409, '409011', 'Specified User Already In Group', user['id'])
+            members[user['id']] = None
+            return self._xml(200, _render('users', user))
+        if method == 'DELETE' and re.match(r'^groups/[^/]+/users/[^/]+$', rest):
+            del site.members[segments[1]][segments[3]]
+            return self._send(204)
+        if method == 'GET' and re.match(r'^workbooks/[^/]+/views$', rest):
+            return self._page('views', [view for view in site.views if view['_workbook_id'] == segments[1]], query)
+        if method == 'GET' and re.match(r'^workbooks/[^/]+/content$', rest):
+            return self._content(site.find('workbooks', segments[1]))
+        if method == 'GET' and re.match(r'^views/[^/]+/data$', rest):
+            return self._view_data(site.find('views', segments[1]))
+        if method == 'POST' and rest in ('users', 'groups', 'projects'):
+            return self._create(site, rest, request)
+        if method in ('PUT', 'DELETE') and re.match(r'^(users|groups|projects)/[^/]+$', rest):
+            return self._update(site, method, segments[0], segments[1], request)
+        match = re.match(r'^projects/([^/]+)/(?:permissions|default-permissions/(\w+))(?:/(users|groups)/([^/]+)/([^/]+)/([^/]+))?$', rest)
+        if match:
+            return self._permissions(site, method, match, request)
+        return self._error(404, '404000', 'Resource Not Found', 'Unknown endpoint {0} {1}'.format(method, rest))
+
+    def _create(self, site, resource, request):
+        element = request.find('{*}' + resource[:-1]) if request.find('{*}' + resource[:-1]) is not None else request.find(resource[:-1])
+        name = element.get('name')
+        # project names are only unique under one parent
+        same_parent = (lambda item: item.get('parentProjectId') == element.get('parentProjectId')) if resource == 'projects' else (lambda item: True)
+        if any(item['name'] == name and same_parent(item) for item in site.collection(resource)):
+            return self._error(409, '409000', 'Resource Conflict', '{0} {1} already exists'.format(resource[:-1], name))
+        now = _timestamp(time.time())
+        item = {'id': str(uuid.uuid4()), 'name': name}
+        if resource == 'users':
+            item.update(siteRole=element.get('siteRole'), lastLogin=None, externalAuthUserId='', language='en', locale='en_US')
+        elif resource == 'groups':
+            item.update(minimumSiteRole=element.get('minimumSiteRole'), _domain_name='local')
+            site.members[item['id']] = {}
+        else:
+            item.update(description=element.get('description'), parentProjectId=element.get('parentProjectId'), contentPermissions=element.get('contentPermissions'),
+                        createdAt=now, updatedAt=now, topLevelProject='false' if element.get('parentProjectId') else 'true', _owner_id=site.users[0]['id'] if site.users else None)
+        site.collection(resource).append(item)
+        return self._xml(201, _render(resource, item))
+
+    def _update(self, site, method, resource, object_id, request):
+        item = site.find(resource, object_id)
+        if item is None:
+            raise KeyError(object_id)
+        if method == 'DELETE':
+            site.collection(resource).remove(item)
+            if resource == 'groups':
+                del site.members[object_id]
+            if resource == 'users':
+                for members in site.members.values():
+                    members.pop(object_id, None)
+            if resource == 'projects':
+                site.workbooks[:] = [workbook for workbook in site.workbooks if workbook['_project_id'] != object_id]
+            return self._send(204)
+        element = request.find('{*}' + resource[:-1]) if request.find('{*}' + resource[:-1]) is not None else request.find(resource[:-1])
+        item.update((key, value) for key, value in element.attrib.items() if key != 'password')
+        if resource == 'projects':
+            item['updatedAt'] = _timestamp(time.time())
+            for workbook in site.workbooks:
+                if workbook['_project_id'] == object_id:
+                    workbook['projectName'] = item['name']
+        return self._xml(200, _render(resource, item))
+
+    def _permissions(self, site, method, match, request):
+        project_id, content_type, grantee_type, grantee_id, cap_name, cap_mode = match.groups()
+        if site.find('projects', project_id) is None:
+            raise KeyError(project_id)
+        grants = site.permissions.setdefault((project_id, content_type[:-1] if content_type else 'project'), {})
+        if method == 'DELETE':
+            capabilities = grants.get((grantee_type[:-1], grantee_id), {})
+            if capabilities.get(cap_name) != cap_mode:
+                return self._error(404, '404000', 'Permission not found', '{0} {1}'.format(cap_name, cap_mode))
+            del capabilities[cap_name]
+            return self._send(204)
+        if method == 'PUT':
+            for grantee_capabilities in request.iter('granteeCapabilities'):
+                grantee = grantee_capabilities.find('user')
+                grantee = grantee if grantee is not None else grantee_capabilities.find('group')
+                capabilities = grants.setdefault((grantee.tag, grantee.get('id')), {})
+                for capability in grantee_capabilities.iter('capability'):
+                    capabilities[capability.get('name')] = capability.get('mode')
+        if self._wants_json():
+            return self._json(200, {'permissions': {'project': {'id': project_id}, 'granteeCapabilities': [
+                {grantee_type: {'id': grantee_id}, 'capabilities': {'capability': [{'name': name, 'mode': mode} for name, mode in capabilities.items()]}}
+                for (grantee_type, grantee_id), capabilities in grants.items() if capabilities]}})
+        body = ''.join('<granteeCapabilities><{0} id="{1}"/><capabilities>{2}</capabilities></granteeCapabilities>'.format(
+            grantee_type, grantee_id, ''.join('<capability name="{0}" mode="{1}"/>'.format(name, mode) for name, mode in capabilities.items()))
+            for (grantee_type, grantee_id), capabilities in grants.items() if capabilities)
+        return self._xml(200, '<permissions><project id="{0}"/>{1}</permissions>'.format(project_id, body))
+
+    def _content(self, workbook):
+        if workbook is None:
+            raise KeyError('workbook')
+        mock = self.server.mock
+        data = (workbook['id'].encode() * (mock.workbook_size // 36 + 1))[:mock.workbook_size]
+        headers = {'Content-Disposition': 'name="tableau_workbook"; filename="{0}.twbx"'.format(workbook['contentUrl'])}
+        requested = self.headers.get('Range')
+        if requested:
+            start = int(requested.split('=')[1].split('-')[0])
+            if start >= len(data):
+                return self._error(416, '416000', 'Range Not Satisfiable', requested)
+            headers['Content-Range'] = 'bytes {0}-{1}/{2}'.format(start, len(data) - 1, len(data))
+            return self._send(206, data[start:], 'application/octet-stream', headers)
+        return self._send(200, data, 'application/octet-stream', headers)
+
+    def _view_data(self, view):
+        if view is None:
+            raise KeyError('view')
+        rows = self.server.mock.view_rows
+        lines = ['Region,Category,Sales,Profit'] + ['"{0}",Category {1},{2},{3}'.format(('East', 'West', 'Nörth', 'South')[row % 4], row % 17, row * 3, '' if row % 11 == 0 else row * 0.25) for row in range(rows)]
+        self._send(200, ('﻿' + '\n'.join(lines) + '\n').encode('utf-8'), 'text/csv; charset=utf-8')
@@ -1,7 +1,24 @@
 import requests
+import csv
+import io
+import itertools
 import re
+import sqlite3
+import bisect
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
 import xml.etree.ElementTree as ET
+from xml.parsers import expat
+import urllib.parse
 import urllib3
+import weakref
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 
 # urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -28,7 +45,7 @@ class UserDefinedFieldError(Exception):
 def _encode_for_display(text):
     """
     Encodes strings so they can display as ASCII in a Windows terminal window.
-    This function also encodes strings for processing by xml.etree.ElementTree functions.
+    Only used for printing; responses are parsed from their bytes and records hold the original text.
     Returns an ASCII-encoded version of the text.
     Unicode characters are converted to ASCII placeholders (for example, "?").
     """
@@ -43,7 +60,11 @@ def _check_status(server_response, success_code, xmlns):
     Throws an ApiCallError exception if the API call fails.
     """
     if server_response.status_code != success_code:
-        parsed_response = ET.fromstring(server_response.text)
+        if server_response.headers.get('Content-Type', '').startswith('application/json'):
+            # json error: {"error": {"code": ..., "summary": ..., "detail": ...}}
+            error = json.loads(server_response.content).get('error') or {}
+            raise ApiCallError('{0}: {1} - {2}'.format(error.get('code', 'unknown code'), error.get('summary', 'unknown summary'), error.get('detail', 'unknown detail')))
+        parsed_response = _parse_xml(server_response.content)
 
         # Obtain the 3 xml tags from the response: error, summary, and detail tags
         error_element = parsed_response.find('t:error', namespaces = xmlns)
@@ -61,14 +82,674 @@ def _check_status(server_response, success_code, xmlns):
 def _check_user_input(input, list):
     """
     input: a group or user uuid from the tableau server
-    list: a list of group uuids/ user uuids on the tableau server
+    list: a list of group uuids/ user uuids on the tableau server, or a dictionary keyed by them (constant time check)
     used as a check to display a more helpful error if the uuid is not found on the tableua server
     """
     if input not in list:
         raise ValueError("{0} not found".format(input))
     return
 
-def sign_in(server, username, password, VERSION, xmlns, site=""):
+
+# responses are parsed straight from the response bytes; _encode_for_display is only applied to what gets printed
+_xml_parsers = ('expat', 'etree', 'lxml')
+_xml_parser = 'expat'
+
+def get_xml_parser():
+    return _xml_parser
+
+def set_xml_parser(parser):
+    """
+    chooses how responses are parsed; every parser returns identical records
+    'expat' (default): listing pages are read with expat callbacks straight into records, without building an element tree
+    'etree': listing pages are parsed into an xml.etree.ElementTree tree first
+    'lxml': responses are parsed into lxml trees and iter_* listings are streamed with lxml.etree.iterparse (lxml must be installed)
+    """
+    global _xml_parser
+    if parser not in _xml_parsers:
+        raise ValueError("invalid argument: must be one of %r." % (_xml_parsers,))
+    if parser == 'lxml':
+        import lxml.etree
+    _xml_parser = parser
+
+def _xml_module():
+    if _xml_parser == 'lxml':
+        import lxml.etree
+        return lxml.etree
+    return ET
+
+def _parse_xml(content):
+    # content: the response body as bytes; the parser reads the encoding from the xml declaration
+    return _xml_module().fromstring(content)
+
+_record_layouts = {}
+
+def _record_layout(record_type, namespace):
+    """
+    precompiled paths for reading record_type from an element in namespace: the attribute of the element itself for each
+    field (None for fields read from a child), a dictionary of '{namespace}child' tag -> [(field index, child attribute)]
+    and the indexes of the fields to intern
+    """
+    key = (record_type, namespace)
+    layout = _record_layouts.get(key)
+    if layout is None:
+        attributes, children = [], {}
+        for index, attribute in enumerate(record_type._xml_attributes):
+            child_name, _, child_attribute = attribute.rpartition('/')
+            attributes.append(None if child_name else attribute)
+            if child_name:
+                children.setdefault('{' + namespace + '}' + child_name, []).append((index, child_attribute))
+        shared = tuple(index for index, attribute in enumerate(record_type._xml_attributes) if attribute in record_type._shared_attributes)
+        layout = _record_layouts[key] = (tuple(attributes), children, shared)
+    return layout
+
+def _make_record(record_type, values, shared):
+    for index in shared:
+        if values[index] is not None:
+            values[index] = sys.intern(values[index])
+    return record_type._make(values)
+
+def _expat_page_records(content, namespace, element_name, record_type):
+    # reads the records and totalAvailable of a listing page from expat callbacks, so no element tree is built
+    attributes, children, shared = _record_layout(record_type, namespace)
+    # expat names are 'namespace}tag' with namespace_separator '}', the layout's are '{namespace}tag'
+    children = {tag[1:]: fields for tag, fields in children.items()}
+    tag = namespace + '}' + element_name
+    pagination_tag = namespace + '}pagination'
+    records = []
+    total_available = None
+    values = None
+    depth = record_depth = 0
+    def start(name, element_attributes):
+        nonlocal values, depth, record_depth, total_available
+        depth += 1
+        if name == tag:
+            get = element_attributes.get
+            values = [get(attribute) if attribute else None for attribute in attributes]
+            record_depth = depth
+        elif values is not None:
+            fields = children.get(name) if depth == record_depth + 1 else None
+            if fields:
+                for index, attribute in fields:
+                    values[index] = element_attributes.get(attribute)
+        elif name == pagination_tag:
+            total_available = int(element_attributes['totalAvailable'])
+    def end(name):
+        nonlocal values, depth
+        if values is not None and depth == record_depth:
+            records.append(_make_record(record_type, values, shared))
+            values = None
+        depth -= 1
+    parser = expat.ParserCreate(namespace_separator='}')
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.Parse(content, True)
+    return records, total_available
+
+def _page_records(content, xmlns, element_name, record_type):
+    """
+    returns the record_type records of every element_name element (e.g 'user') in a response body (bytes) and the
+    totalAvailable of its pagination element (None when there is none), with the parser chosen by set_xml_parser
+    """
+    if _xml_parser == 'expat':
+        return _expat_page_records(content, xmlns['t'], element_name, record_type)
+    namespace = '{' + xmlns['t'] + '}'
+    parsed_response = _parse_xml(content)
+    records = [_record_from_element(record_type, element, xmlns) for element in parsed_response.iter(namespace + element_name)]
+    pagination = parsed_response.find(namespace + 'pagination')
+    return records, int(pagination.get('totalAvailable')) if pagination is not None else None
+
+# read endpoints can answer in json instead (Accept: application/json); write responses are always xml
+_response_formats = ('xml', 'json')
+
+def _check_response_format(response_format):
+    if response_format not in _response_formats:
+        raise ValueError("invalid argument: must be one of %r." % (_response_formats,))
+    return response_format
+
+def _format_headers(response_format):
+    return {'Accept': 'application/json'} if response_format == 'json' else None
+
+_json_layouts = {}
+
+def _json_layout(record_type):
+    # (child key or None, attribute) for each field of record_type, e.g ('project', 'id') for 'project/id', and the indexes to intern
+    layout = _json_layouts.get(record_type)
+    if layout is None:
+        fields = tuple((child_name or None, attribute) for child_name, _, attribute in (path.rpartition('/') for path in record_type._xml_attributes))
+        layout = _json_layouts[record_type] = (fields, _record_layout(record_type, '')[2])
+    return layout
+
+def _json_text(value):
+    # json numbers and booleans get the text the xml attribute would hold
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+def _json_list(value):
+    # a repeated element is a list, but may be a single object or missing when there are fewer than two
+    if value is None:
+        return []
+    return [value] if isinstance(value, dict) else value
+
+def _record_from_json(record_type, item):
+    fields, shared = _json_layout(record_type)
+    values = []
+    for child_name, attribute in fields:
+        value = item.get(attribute) if child_name is None else (item.get(child_name) or {}).get(attribute)
+        if value is not None and value.__class__ is not str:
+            value = _json_text(value)
+        values.append(value)
+    return _make_record(record_type, values, shared)
+
+def _json_page_records(content, element_name, record_type):
+    parsed_response = json.loads(content)
+    # listings nest the objects in a plural container ({'users': {'user': [...]}}), single objects are at the top level
+    container = parsed_response.get(element_name + 's')
+    items = container.get(element_name) if isinstance(container, dict) else parsed_response.get(element_name)
+    records = [_record_from_json(record_type, item) for item in _json_list(items)]
+    pagination = parsed_response.get('pagination')
+    return records, int(pagination['totalAvailable']) if pagination else None
+
+def _response_records(server_response, xmlns, element_name, record_type, response_format='xml'):
+    """
+    returns the record_type records of every element_name object (e.g 'user') in a read response and the totalAvailable of its
+    pagination (None when there is none); json and xml responses give identical records
+    """
+    if response_format == 'json':
+        return _json_page_records(server_response.content, element_name, record_type)
+    return _page_records(server_response.content, xmlns, element_name, record_type)
+
+
+class _AdaptiveLimit():
+    """
+    AIMD concurrency limit: callers wait in acquire() while limit requests are in flight. each successful call raises the limit by
+    1/limit (about one more slot per round of calls); a call that shows server pressure halves it, at most once per round (calls
+    started before the last decrease don't decrease it again)
+    """
+    def __init__(self, initial, minimum, maximum):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, pressure):
+        with self._condition:
+            self.in_flight -= 1
+            if pressure:
+                if started > self._last_decrease:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = time.monotonic()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+def _connection_not_opened(error):
+    # true when the request never reached the server, so even a POST can be sent again safely
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+# downloads and view data exports can take minutes to send, so they get a longer read timeout than the client default
+_default_endpoint_timeouts = ((r'/workbooks/[^/]+/content', (15, 600)), (r'/views/[^/]+/data', (15, 600)))
+
+class RequestScheduler():
+    """
+    decides how a TableauClient sends each call: its timeout, whether and when to retry it, and how many calls may be in flight
+    retries: extra attempts after a transient failure (429, 500, 502, 503, 504, connection errors, timeouts and bodies cut off
+             mid-transfer). GET, PUT and DELETE
+             are idempotent and retried on all of them; POST (other than sign in) is only retried when the server refused it before
+             doing anything (429, 503) or the connection couldn't be opened
+    backoff, max_backoff: retry n waits a random time up to min(max_backoff, backoff * 2**n) seconds, or the server's Retry-After
+    timeouts: list of (url regex, timeout) checked in order before the client timeout; defaults give downloads a long read timeout
+    max_concurrency: when given, an AIMD limit between min_concurrency and max_concurrency (starting at initial_concurrency) caps the
+             calls in flight: it grows while calls succeed and halves when the server answers 429/503, times out or the call fails
+             with any other exception (the slot is always given back)
+    """
+    retry_statuses = (429, 500, 502, 503, 504)
+    connection_errors = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)
+    pressure_statuses = (429, 503)
+    idempotent_methods = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30, timeouts=_default_endpoint_timeouts, max_concurrency=None, min_concurrency=1, initial_concurrency=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeouts = [(re.compile(pattern), timeout) for pattern, timeout in timeouts]
+        self.limit = None
+        if max_concurrency is not None:
+            self.limit = _AdaptiveLimit(initial_concurrency or max(min_concurrency, max_concurrency // 4), min_concurrency, max_concurrency)
+
+    def timeout_for(self, url, default):
+        for pattern, timeout in self.timeouts:
+            if pattern.search(url):
+                return timeout
+        return default
+
+    def _retryable(self, method, url, status_code=None, error=None):
+        idempotent = method in self.idempotent_methods or url.endswith('/auth/signin')
+        if error is not None:
+            return idempotent or _connection_not_opened(error)
+        return status_code in (self.retry_statuses if idempotent else self.pressure_statuses)
+
+    def _delay(self, attempt, server_response=None):
+        retry_after = server_response.headers.get('Retry-After') if server_response is not None else None
+        if retry_after is not None:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def send(self, send, method, url):
+        """
+        calls send() (which returns a response) with retries and the concurrency limit; returns the last response, or raises the
+        last connection error once retries run out
+        """
+        attempt = 0
+        while True:
+            started = self.limit.acquire() if self.limit is not None else None
+            server_response, error = None, None
+            pressure = True
+            try:
+                server_response = send()
+                pressure = server_response.status_code in self.pressure_statuses
+            except self.connection_errors as raised:
+                error = raised
+            finally:
+                # released whatever send() does, so an unexpected exception (e.g from an instrumentation hook) can't leak a slot
+                if self.limit is not None:
+                    self.limit.release(started, pressure)
+            status_code = server_response.status_code if server_response is not None else None
+            if attempt >= self.retries or not (error is not None or status_code in self.retry_statuses) or not self._retryable(method, url, status_code, error):
+                if error is not None:
+                    raise error
+                return server_response
+            if server_response is not None:
+                server_response.close()
+            time.sleep(self._delay(attempt, server_response))
+            attempt += 1
+
+
+class _Histogram():
+    # cumulative-bucket latency histogram in the prometheus style; buckets are upper bounds in seconds
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation (inf when it is past the last bucket)
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99),
+                'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], itertools.accumulate(self.counts)))}
+
+
+# path segments that name a collection; the segment after one is an object id
+_collection_segments = frozenset(('sites', 'users', 'groups', 'projects', 'workbooks', 'views', 'datasources', 'flows', 'metrics', 'jobs',
+                                  'schedules', 'subscriptions', 'tasks', 'favorites', 'webhooks'))
+
+def _endpoint(method, url):
+    """
+    returns the endpoint a call belongs to, e.g GET /api/3.11/sites/{id}/groups/{id}/users, so calls for different objects are
+    counted together
+    """
+    segments = urllib.parse.urlsplit(url).path.split('/')
+    for position in range(1, len(segments)):
+        if segments[position - 1] in _collection_segments and segments[position] not in _collection_segments:
+            segments[position] = '{id}'
+    return method + ' ' + '/'.join(segments)
+
+
+class Instrumentation():
+    """
+    per-endpoint call, error and byte counters and latency histograms for every call a client sends, plus hooks run around each call
+    network time is measured from sending a request to having its body (for streamed downloads, to having the headers); parse time
+    covers turning listing and permissions responses into records (for the streaming iterators it includes reading the body)
+    attach it with TableauClient(instrumentation=...), or client.instrumentation = ...
+    buckets: histogram upper bounds in seconds
+    """
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, buckets=default_buckets):
+        self.buckets = tuple(buckets)
+        self.pre_hooks = []
+        self.post_hooks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+
+    def add_pre_hook(self, hook):
+        # hook(method, url) runs before every attempt of every call
+        self.pre_hooks.append(hook)
+
+    def add_post_hook(self, hook):
+        # hook(event) runs after every attempt with a dictionary of method, url, endpoint, status (None when no response),
+        # bytes_received, bytes_sent, seconds and error
+        self.post_hooks.append(hook)
+
+    def _stats(self, endpoint):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = {'calls': 0, 'errors': 0, 'bytes_received': 0, 'bytes_sent': 0,
+                                                'network': _Histogram(self.buckets), 'parse': _Histogram(self.buckets)}
+        return stats
+
+    def before_call(self, method, url):
+        for hook in self.pre_hooks:
+            hook(method, url)
+
+    def after_call(self, method, url, status, bytes_received, bytes_sent, seconds, error=None):
+        endpoint = _endpoint(method, url)
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats['calls'] += 1
+            stats['errors'] += error is not None or status >= 400
+            stats['bytes_received'] += bytes_received
+            stats['bytes_sent'] += bytes_sent
+            stats['network'].observe(seconds)
+        event = {'method': method, 'url': url, 'endpoint': endpoint, 'status': status, 'bytes_received': bytes_received,
+                 'bytes_sent': bytes_sent, 'seconds': seconds, 'error': error}
+        for hook in self.post_hooks:
+            hook(event)
+
+    def record_parse(self, method, url, seconds):
+        with self._lock:
+            self._stats(_endpoint(method, url))['parse'].observe(seconds)
+
+    @contextlib.contextmanager
+    def parse_timer(self, method, url):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_parse(method, url, time.perf_counter() - started)
+
+    def summary(self):
+        """
+        returns {endpoint: {'calls', 'errors', 'bytes_received', 'bytes_sent', 'network': histogram, 'parse': histogram}}, where each
+        histogram is {'count', 'sum', 'p50', 'p95', 'p99', 'buckets': {upper bound: cumulative count}}
+        """
+        with self._lock:
+            return {endpoint: dict(stats, network=stats['network'].to_dict(), parse=stats['parse'].to_dict()) for endpoint, stats in self.endpoints.items()}
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2, sort_keys=True, default=str)
+
+    def to_prometheus(self):
+        # prometheus text exposition format
+        lines = []
+        summary = self.summary()
+
+        def label(endpoint, **extra):
+            method, path = endpoint.split(' ', 1)
+            labels = dict(method=method, endpoint=path, **extra)
+            return '{' + ','.join('{0}="{1}"'.format(key, value.replace('\\', '\\\\').replace('"', '\\"')) for key, value in labels.items()) + '}'
+
+        for name, key, help_text in (('tableau_rest_calls_total', 'calls', 'API calls sent'), ('tableau_rest_errors_total', 'errors', 'API calls that failed'),
+                                     ('tableau_rest_bytes_received_total', 'bytes_received', 'response bytes received'),
+                                     ('tableau_rest_bytes_sent_total', 'bytes_sent', 'request bytes sent')):
+            lines += ['# HELP {0} {1}'.format(name, help_text), '# TYPE {0} counter'.format(name)]
+            lines += ['{0}{1} {2}'.format(name, label(endpoint), stats[key]) for endpoint, stats in sorted(summary.items())]
+        for name, key, help_text in (('tableau_rest_network_seconds', 'network', 'time waiting for the server'),
+                                     ('tableau_rest_parse_seconds', 'parse', 'time parsing responses')):
+            lines += ['# HELP {0} {1}'.format(name, help_text), '# TYPE {0} histogram'.format(name)]
+            for endpoint, stats in sorted(summary.items()):
+                histogram = stats[key]
+                lines += ['{0}_bucket{1} {2}'.format(name, label(endpoint, le=bound), count) for bound, count in histogram['buckets'].items()]
+                lines += ['{0}_sum{1} {2}'.format(name, label(endpoint), histogram['sum']), '{0}_count{1} {2}'.format(name, label(endpoint), histogram['count'])]
+        return '\n'.join(lines) + '\n'
+
+
+def _parse_timer(client, method, url):
+    # times a parse step on the client's Instrumentation, if it has one
+    instrumentation = _get_client(client).instrumentation
+    return instrumentation.parse_timer(method, url) if instrumentation is not None else contextlib.nullcontext()
+
+
+class TableauClient():
+    """
+    holds a pooled, keep-alive requests.Session that every tableau_rest function and class can send its API calls through,
+    so repeated calls reuse open TCP/TLS connections instead of opening a new one per request
+    pool_size: number of connections kept open per host (set to at least the number of threads sharing the client)
+    timeout: seconds to wait for the server, either a single number or a (connect, read) tuple
+    token: optional default x-tableau-auth header; a token passed to an individual call takes precedence
+    verify: verify the server TLS certificate (off by default, matching the module level functions)
+    scheduler: RequestScheduler giving per-endpoint timeouts, retries with backoff and optional adaptive concurrency; by default
+               transient failures are retried 3 times and concurrency is not limited
+    instrumentation: optional Instrumentation recording calls, bytes and timings per endpoint
+    response_format: 'xml' (default) or 'json', the format read endpoints (listings, views, permissions) are asked to answer in;
+                     records are identical either way. write functions always read xml responses. the read functions and classes
+                     take their own response_format argument to override the client's for one call (None keeps the client's);
+                     the iter_* functions decode a json page whole, so their memory is bounded by a page instead of a record
+    every function and Query*/Write* class takes an optional client=None argument; when omitted the shared
+    default client from get_default_client() is used, so existing call signatures keep working
+    """
+    def __init__(self, pool_size=10, timeout=15, token=None, verify=False, scheduler=None, instrumentation=None, response_format='xml'):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.response_format = _check_response_format(response_format)
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.instrumentation = instrumentation
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.verify = verify
+        self.token = None
+        if token is not None:
+            self.set_token(token)
+
+    def set_token(self, token):
+        self.token = token
+        if token is None:
+            self.session.headers.pop('x-tableau-auth', None)
+        else:
+            self.session.headers['x-tableau-auth'] = token
+
+    def request(self, method, url, token=None, **kwargs):
+        headers = dict(kwargs.pop('headers', None) or {})
+        if token is not None:
+            headers['x-tableau-auth'] = token
+        kwargs.setdefault('timeout', self.scheduler.timeout_for(url, self.timeout))
+        return self.scheduler.send(lambda: self._send(method, url, headers, kwargs), method, url)
+
+    def _send(self, method, url, headers, kwargs):
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return self.session.request(method, url, headers=headers, **kwargs)
+        data = kwargs.get('data')
+        bytes_sent = len(data) if isinstance(data, (bytes, str)) else 0
+        instrumentation.before_call(method, url)
+        started = time.perf_counter()
+        try:
+            server_response = self.session.request(method, url, headers=headers, **kwargs)
+        except requests.RequestException as error:
+            instrumentation.after_call(method, url, None, 0, bytes_sent, time.perf_counter() - started, error)
+            raise
+        # a streamed body hasn't been read yet, so its size comes from Content-Length
+        bytes_received = int(server_response.headers.get('Content-Length') or 0) if kwargs.get('stream') else len(server_response.content)
+        instrumentation.after_call(method, url, server_response.status_code, bytes_received, bytes_sent, time.perf_counter() - started)
+        return server_response
+
+    def get(self, url, token=None, **kwargs):
+        return self.request('GET', url, token, **kwargs)
+
+    def post(self, url, token=None, **kwargs):
+        return self.request('POST', url, token, **kwargs)
+
+    def put(self, url, token=None, **kwargs):
+        return self.request('PUT', url, token, **kwargs)
+
+    def delete(self, url, token=None, **kwargs):
+        return self.request('DELETE', url, token, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_client = None
+
+def get_default_client():
+    """
+    returns the shared TableauClient used when no client is passed to a function, creating it on first use
+    """
+    global _default_client
+    if _default_client is None:
+        _default_client = TableauClient()
+    return _default_client
+
+def set_default_client(client):
+    """
+    replaces the shared TableauClient used when no client is passed to a function (e.g. to change pool size or timeout)
+    """
+    global _default_client
+    _default_client = client
+
+def _get_client(client=None):
+    return client if client is not None else get_default_client()
+
+def _client_response_format(client=None, response_format=None):
+    # the format passed to a call or Query* class, otherwise the client's
+    return _check_response_format(response_format or _get_client(client).response_format)
+
+def _paged_url(url, page_size, page_number):
+    separator = '&' if '?' in url else '?'
+    return url + separator + "pageSize={0}&pageNumber={1}".format(page_size, page_number)
+
+def _get_page_records(url, token, xmlns, element_name, record_type, page_size, page_number, client=None, response_format=None):
+    # returns the page's records and the totalAvailable of the listing
+    response_format = _client_response_format(client, response_format)
+    paged_url = _paged_url(url, page_size, page_number)
+    server_response = _get_client(client).get(paged_url, token, headers=_format_headers(response_format))
+    _check_status(server_response, 200, xmlns)
+    with _parse_timer(client, 'GET', paged_url):
+        records, total_available = _response_records(server_response, xmlns, element_name, record_type, response_format)
+    return records, total_available if total_available is not None else len(records)
+
+def _query_all_pages(url, token, xmlns, element_name, record_type, client=None, page_size=1000, max_workers=8, response_format=None):
+    """
+    returns a record_type record for every element_name element (e.g 'user') from a paginated listing url, in page order
+    the first page is fetched on its own to read totalAvailable from the pagination element,
+    the remaining pages are then fetched concurrently with at most max_workers requests in flight
+    each page is converted to records as soon as it is parsed, so no xml tree outlives its page
+    page_size: the REST API accepts at most 1000
+    response_format: 'xml' or 'json' (None uses the client's)
+    """
+    records, total_available = _get_page_records(url, token, xmlns, element_name, record_type, page_size, 1, client, response_format)
+    page_count = -(-total_available // page_size)
+    if page_count > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, page_count - 1)) as executor:
+            # map yields results in submission order, so pages are merged in page order
+            pages = executor.map(lambda page_number: _get_page_records(url, token, xmlns, element_name, record_type, page_size, page_number, client, response_format)[0], range(2, page_count + 1))
+            for page in pages:
+                records.extend(page)
+    return records
+
+def _iter_elements(url, token, xmlns, element_name, client=None, page_size=1000):
+    """
+    yields element_name elements (e.g 'user') from every page of a listing url one at a time
+    each page is streamed and parsed incrementally with iterparse; every element is removed from the tree
+    once it has been yielded, so memory stays flat however many objects the site has
+    the yielded element is only valid until the next one is requested
+    """
+    tag = '{' + xmlns['t'] + '}' + element_name
+    pagination_tag = '{' + xmlns['t'] + '}pagination'
+    page_number = 1
+    while True:
+        paged_url = _paged_url(url, page_size, page_number)
+        server_response = _get_client(client).get(paged_url, token, stream=True)
+        instrumentation = _get_client(client).instrumentation
+        # parse time excludes the time the caller spends between elements
+        parse_seconds = 0.0
+        started = time.perf_counter()
+        try:
+            _check_status(server_response, 200, xmlns)
+            server_response.raw.decode_content = True
+            total_available = None
+            element_count = 0
+            open_elements = []
+            for event, element in _xml_module().iterparse(server_response.raw, events=('start', 'end')):
+                if event == 'start':
+                    open_elements.append(element)
+                    continue
+                open_elements.pop()
+                if element.tag == pagination_tag:
+                    total_available = int(element.get('totalAvailable'))
+                elif element.tag == tag:
+                    element_count += 1
+                    parse_seconds += time.perf_counter() - started
+                    yield element
+                    started = time.perf_counter()
+                    element.clear()
+                    if open_elements:
+                        open_elements[-1].remove(element)
+        finally:
+            server_response.close()
+            if instrumentation is not None:
+                instrumentation.record_parse('GET', paged_url, parse_seconds + time.perf_counter() - started)
+        if element_count == 0 or total_available is None or page_number * page_size >= total_available:
+            return
+        page_number += 1
+
+def _index_by(elements, attribute):
+    """
+    builds a dictionary of attribute value -> record (or element) in a single pass so lookups don't rescan the list
+    duplicate values (e.g two workbooks with the same name in different projects) keep the first record
+    returned by the server, matching what the list based lookups returned
+    """
+    index = {}
+    for element in elements:
+        index.setdefault(element.get(attribute), element)
+    return index
+
+def _bulk_lookup(index, keys, attribute):
+    """
+    resolves every key in keys against an index built by _index_by in one pass
+    returns the requested attribute of each match, in the same order as keys
+    raises ValueError naming every key that was not found
+    """
+    missing = [key for key in keys if key not in index]
+    if missing:
+        raise ValueError("{0} not found".format(', '.join(missing)))
+    return [index[key].get(attribute) for key in keys]
+
+def sign_in(server, username, password, VERSION, xmlns, site="", client=None):
     """
     server: e.g http://tableau.mycompany.com
     username: your tableau username
@@ -81,6 +762,7 @@ def sign_in(server, username, password, VERSION, xmlns, site=""):
     VERSION is the tableau REST API server (e.g '3.11')
     xmlns = the namespaces for the API request e.g {'t': 'http://tableau.com/api'}
     returns token, site_id and user_id in that order to be saved using those specific variable names for future API calls
+    client: optional TableauClient; the token is also stored on it as the default x-tableau-auth header
     """
     url = server + "/api/{0}/auth/signin".format(VERSION)
     # Builds the request as xml_object
@@ -89,370 +771,1363 @@ def sign_in(server, username, password, VERSION, xmlns, site=""):
     ET.SubElement(credentials_element, 'site', contentUrl=site)
     xml_request = ET.tostring(xml_request)
     # Make the request to server
-    server_response = requests.post(url, data=xml_request, verify=False) ###add timeout=15
+    server_response = _get_client(client).post(url, data=xml_request)
     _check_status(server_response, 200, xmlns)
-    # # ASCII encode server response to enable displaying to console
-    server_response = _encode_for_display(server_response.text)
-    ## without _check_status function:
-    # server_response=server_response.text.encode('ascii', errors="backslashreplace").decode('utf-8')
     # Reads and parses the response
-    parsed_response = ET.fromstring(server_response)
+    parsed_response = _parse_xml(server_response.content)
     # Gets the auth token and site ID
     token = parsed_response.find('t:credentials', namespaces = xmlns).get('token')
     site_id = parsed_response.find('.//t:site', namespaces = xmlns).get('id')
     user_id = parsed_response.find('.//t:user', namespaces = xmlns).get('id')
+    # a client passed in keeps the token as its default x-tableau-auth header
+    if client is not None:
+        client.set_token(token)
     return token, site_id, user_id
 
-def sign_out(server, VERSION, xmlns):
+def sign_out(server, VERSION, xmlns, client=None, token=None):
+    """
+    token: the token to invalidate; when omitted the client's default x-tableau-auth header (set by sign_in with client=) is sent
+    """
     ### POST /api/api-version/auth/signout
     url = server + "/api/{0}/auth/signout".format(VERSION)
-    server_response = requests.post(url, verify=False)
+    server_response = _get_client(client).post(url, token)
     _check_status(server_response, 204, xmlns)
 
+def query_sites(VERSION, token, server, xmlns, client=None, page_size=1000, max_workers=8, response_format=None):
+    """
+    returns a SiteRecord for every site on the server (all pages); the token must belong to a server administrator, signed in to any site
+    """
+    # GET /api/api-version/sites?pageSize=page-size&pageNumber=page-number
+    url = server + "/api/{0}/sites".format(VERSION)
+    return _query_all_pages(url, token, xmlns, 'site', SiteRecord, client, page_size, max_workers, response_format)
+
+
+class TokenStore():
+    """
+    keeps signed-in tokens between runs in a json file readable only by its owner (mode 600), so short scripts can skip sign_in
+    entries are keyed by server, site and username and hold the token, site id and user id; passwords are never stored
+    """
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entries):
+        part_path = self.path + '.part'
+        descriptor = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w') as f:
+            json.dump(entries, f)
+        os.replace(part_path, self.path)
+
+    def get(self, key):
+        # returns (token, site_id, user_id) or None
+        entry = self._read().get(key)
+        return tuple(entry) if entry else None
+
+    def put(self, key, token, site_id, user_id):
+        with self._lock:
+            entries = self._read()
+            entries[key] = [token, site_id, user_id]
+            self._write(entries)
+
+    def delete(self, key):
+        with self._lock:
+            entries = self._read()
+            if entries.pop(key, None) is not None:
+                self._write(entries)
+
+
+class TableauSession(TableauClient):
+    """
+    a TableauClient that signs itself in and keeps its token valid for the whole job
+    on creation it reuses a token from token_store (a TokenStore) when there is one, otherwise it signs in. when the server answers 401
+    (e.g the token expired) it signs in again, once for all threads hitting the same expired token, and retries the call
+    token, site_id and user_id hold the current values; calls made with a token this session has replaced are sent with the current one,
+    so session.token can be read once at the start of a job and passed to every function as usual
+    pool_size, timeout, verify, scheduler, instrumentation and response_format are passed to TableauClient
+    """
+    def __init__(self, server, username, password, VERSION, xmlns, site="", token_store=None, pool_size=10, timeout=15, verify=False, scheduler=None, instrumentation=None, response_format='xml'):
+        TableauClient.__init__(self, pool_size=pool_size, timeout=timeout, verify=verify, scheduler=scheduler, instrumentation=instrumentation, response_format=response_format)
+        self.server = server
+        self.username = username
+        self.password = password
+        self.VERSION = VERSION
+        self.xmlns = xmlns
+        self.site = site
+        self.token_store = token_store
+        self.site_id = None
+        self.user_id = None
+        self._key = "|".join((server, site, username))
+        self._replaced_tokens = set()
+        self._auth_lock = threading.Lock()
+        cached = token_store.get(self._key) if token_store is not None else None
+        if cached is not None:
+            token, self.site_id, self.user_id = cached
+            self.set_token(token)
+        else:
+            self._sign_in()
+
+    def _sign_in(self):
+        # sign_in stores the new token as this client's default header
+        token, self.site_id, self.user_id = sign_in(self.server, self.username, self.password, self.VERSION, self.xmlns, self.site, client=self)
+        if self.token_store is not None:
+            self.token_store.put(self._key, token, self.site_id, self.user_id)
+
+    def _reauthenticate(self, failed_token):
+        with self._auth_lock:
+            if self.token != failed_token:
+                # another thread already signed in again
+                return
+            self._replaced_tokens.add(failed_token)
+            if self.token_store is not None:
+                self.token_store.delete(self._key)
+            self._sign_in()
+
+    def request(self, method, url, token=None, **kwargs):
+        if token is None or token in self._replaced_tokens:
+            token = self.token
+        server_response = TableauClient.request(self, method, url, token, **kwargs)
+        if server_response.status_code == 401 and not url.endswith(('/auth/signin', '/auth/signout')):
+            server_response.close()
+            self._reauthenticate(token)
+            server_response = TableauClient.request(self, method, url, self.token, **kwargs)
+        return server_response
+
+    def sign_out(self):
+        # signs out on the server and forgets the stored token
+        if self.token is not None:
+            sign_out(self.server, self.VERSION, self.xmlns, client=self, token=self.token)
+        if self.token_store is not None:
+            self.token_store.delete(self._key)
+        self.set_token(None)
+
+
+class SessionPool():
+    """
+    one TableauSession per site for jobs that work across several sites with the same credentials
+    sessions are created (signed in, or loaded from token_store) the first time a site is asked for; different sites sign in
+    concurrently. client_options are passed to each TableauSession (pool_size, timeout, verify, scheduler, instrumentation,
+    response_format)
+    max_concurrency: when given, every session shares one RequestScheduler(max_concurrency=max_concurrency) so at most that many
+    calls are in flight across all sites together (instead of passing scheduler)
+    """
+    def __init__(self, server, username, password, VERSION, xmlns, token_store=None, max_concurrency=None, **client_options):
+        self.server = server
+        self.username = username
+        self.password = password
+        self.VERSION = VERSION
+        self.xmlns = xmlns
+        self.token_store = token_store
+        if max_concurrency is not None:
+            if client_options.get('scheduler') is not None:
+                raise ValueError("pass either max_concurrency or scheduler")
+            client_options['scheduler'] = RequestScheduler(max_concurrency=max_concurrency, initial_concurrency=max_concurrency)
+        self.client_options = client_options
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._site_locks = {}
+
+    def session(self, site=""):
+        # signing in holds only this site's lock, so sessions for different sites are created concurrently
+        with self._lock:
+            site_lock = self._site_locks.setdefault(site, threading.Lock())
+        with site_lock:
+            session = self.sessions.get(site)
+            if session is None:
+                session = TableauSession(self.server, self.username, self.password, self.VERSION, self.xmlns, site, self.token_store, **self.client_options)
+                with self._lock:
+                    self.sessions[site] = session
+            return session
+
+    def query_sites(self, site=""):
+        # returns a SiteRecord for every site on the server, read with the session of site (the username must be a server administrator)
+        session = self.session(site)
+        return query_sites(self.VERSION, session.token, self.server, self.xmlns, client=session)
+
+    def sign_out(self):
+        # signs every session out and closes its connections
+        with self._lock:
+            sessions, self.sessions = self.sessions, {}
+        for session in sessions.values():
+            session.sign_out()
+            session.close()
+
+    def close(self):
+        # closes connections without signing out, so stored tokens stay usable by the next run
+        with self._lock:
+            sessions, self.sessions = self.sessions, {}
+        for session in sessions.values():
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class _Record():
+    """
+    base for the immutable records returned by the listing endpoints. records are namedtuples (no per-instance
+    __dict__) holding interned strings, a fraction of the size of the ElementTree elements they are parsed from
+    _xml_attributes gives the xml attribute for each field, in field order ('child/attribute' reads an attribute
+    of a child element); get() looks fields up by those names so records can be used like the elements they replace
+    _shared_attributes are the low-cardinality attributes (site roles, locales, project ids...) whose values are
+    interned so every record points at one copy; unique values like ids and names are not interned
+    """
+    __slots__ = ()
+    _xml_attributes = ()
+    _shared_attributes = ()
+
+    def get(self, attribute, default=None):
+        if attribute not in self._xml_attributes:
+            return default
+        value = self[self._xml_attributes.index(attribute)]
+        return default if value is None else value
+
+
+class UserRecord(_Record, namedtuple('UserRecord', ['id', 'name', 'site_role', 'last_login', 'external_auth_user_id', 'language', 'locale'])):
+    __slots__ = ()
+    _xml_attributes = ('id', 'name', 'siteRole', 'lastLogin', 'externalAuthUserId', 'language', 'locale')
+    _shared_attributes = ('siteRole', 'language', 'locale')
+
+
+class GroupRecord(_Record, namedtuple('GroupRecord', ['id', 'name', 'minimum_site_role', 'domain_name'])):
+    __slots__ = ()
+    _xml_attributes = ('id', 'name', 'minimumSiteRole', 'domain/name')
+    _shared_attributes = ('minimumSiteRole', 'domain/name')
+
+
+class ProjectRecord(_Record, namedtuple('ProjectRecord', ['id', 'name', 'description', 'parent_project_id', 'content_permissions', 'controlling_permissions_project_id', 'owner_id', 'created_at', 'updated_at'])):
+    __slots__ = ()
+    _xml_attributes = ('id', 'name', 'description', 'parentProjectId', 'contentPermissions', 'controllingPermissionsProjectId', 'owner/id', 'createdAt', 'updatedAt')
+    _shared_attributes = ('parentProjectId', 'contentPermissions', 'controllingPermissionsProjectId', 'owner/id')
+
+
+class WorkbookRecord(_Record, namedtuple('WorkbookRecord', ['id', 'name', 'content_url', 'project_id', 'project_name', 'owner_id', 'created_at', 'updated_at'])):
+    __slots__ = ()
+    _xml_attributes = ('id', 'name', 'contentUrl', 'project/id', 'project/name', 'owner/id', 'createdAt', 'updatedAt')
+    _shared_attributes = ('project/id', 'project/name', 'owner/id')
+
+
+class ViewRecord(_Record, namedtuple('ViewRecord', ['id', 'name', 'content_url', 'view_url_name', 'workbook_id', 'owner_id', 'project_id', 'created_at', 'updated_at'])):
+    __slots__ = ()
+    _xml_attributes = ('id', 'name', 'contentUrl', 'viewUrlName', 'workbook/id', 'owner/id', 'project/id', 'createdAt', 'updatedAt')
+    _shared_attributes = ('workbook/id', 'owner/id', 'project/id')
+
+
+class SiteRecord(_Record, namedtuple('SiteRecord', ['id', 'name', 'content_url', 'admin_mode', 'state'])):
+    __slots__ = ()
+    _xml_attributes = ('id', 'name', 'contentUrl', 'adminMode', 'state')
+    _shared_attributes = ('adminMode', 'state')
+
+
+def _record_from_element(record_type, element, xmlns):
+    attributes, children, shared = _record_layout(record_type, xmlns['t'])
+    get = element.get
+    values = [get(attribute) if attribute else None for attribute in attributes]
+    if children:
+        # one pass over the direct children instead of a namespaced find per child attribute
+        for child in element:
+            fields = children.get(child.tag)
+            if fields:
+                for index, attribute in fields:
+                    values[index] = child.get(attribute)
+    return _make_record(record_type, values, shared)
+
+def _iter_records(record_type, url, token, xmlns, element_name, client=None, page_size=1000, response_format=None):
+    if _client_response_format(client, response_format) == 'json':
+        # a json page is decoded whole, so records are yielded a page at a time
+        page_number = 1
+        while True:
+            records, total_available = _get_page_records(url, token, xmlns, element_name, record_type, page_size, page_number, client, 'json')
+            yield from records
+            if not records or page_number * page_size >= total_available:
+                return
+            page_number += 1
+    for element in _iter_elements(url, token, xmlns, element_name, client, page_size):
+        yield _record_from_element(record_type, element, xmlns)
+
+_equality_operators = ('eq', 'in')
+_range_operators = ('eq', 'gt', 'gte', 'lt', 'lte')
+# filterable and sortable fields and their operators for each listing, from the REST API filtering and sorting reference
+_filter_fields = {
+    'users': {'name': _equality_operators, 'friendlyName': _equality_operators, 'siteRole': _equality_operators, 'domainName': _equality_operators,
+              'luid': _equality_operators, 'lastLogin': _range_operators},
+    'groups': {'name': _equality_operators, 'domainName': _equality_operators, 'domainNickname': _equality_operators, 'isLocal': ('eq',),
+               'minimumSiteRole': _equality_operators, 'userCount': _range_operators},
+    'projects': {'name': _equality_operators, 'ownerName': _equality_operators, 'ownerEmail': _equality_operators, 'ownerDomain': _equality_operators,
+                 'parentProjectId': ('eq',), 'topLevelProject': ('eq',), 'createdAt': _range_operators, 'updatedAt': _range_operators},
+    'workbooks': {'name': _equality_operators, 'contentUrl': _equality_operators, 'projectName': _equality_operators, 'ownerName': _equality_operators,
+                  'ownerEmail': _equality_operators, 'ownerDomain': _equality_operators, 'tags': _equality_operators, 'hasAlerts': ('eq',),
+                  'hasExtracts': ('eq',), 'displayTabs': ('eq',), 'createdAt': _range_operators, 'updatedAt': _range_operators,
+                  'sheetCount': _range_operators, 'size': _range_operators, 'favoritesTotal': _range_operators, 'subscriptionsTotal': _range_operators},
+    'views': {'name': _equality_operators, 'contentUrl': _equality_operators, 'viewUrlName': _equality_operators, 'workbookName': _equality_operators,
+              'projectName': _equality_operators, 'ownerName': _equality_operators, 'ownerEmail': _equality_operators, 'ownerDomain': _equality_operators,
+              'tags': _equality_operators, 'sheetType': _equality_operators, 'createdAt': _range_operators, 'updatedAt': _range_operators,
+              'hitsTotal': _range_operators, 'favoritesTotal': _range_operators},
+}
+
+class Filter():
+    """
+    a REST API filter expression (field:operator:value), sent to the server so only matching objects are returned
+    operator: eq, in (value is a list), gt, gte, lt or lte; dates are written as 2021-01-31T00:00:00Z
+    combine expressions with &, e.g Filter('projectName', 'eq', 'Finance') & Filter('updatedAt', 'gte', '2021-01-01T00:00:00Z')
+    fields and operators are checked against the listing the filter is used with
+    the Query* listing classes, ViewIndex and the iter_* functions take three server-side arguments: filter (a Filter), sort (a field
+    name or list of field names, each optionally followed by :asc or :desc) and fields (attributes to return, or ['_all_']; the
+    classes always ask for id and name as well, and ViewIndex takes no fields). filtered, sorted or trimmed listings are not cached
+    """
+    def __init__(self, field, operator, value):
+        if operator not in ('eq', 'in', 'gt', 'gte', 'lt', 'lte'):
+            raise ValueError("invalid filter operator {0}: must be eq, in, gt, gte, lt or lte".format(operator))
+        if operator == 'in':
+            if isinstance(value, str) or not value:
+                raise ValueError("filter operator in needs a non-empty list of values")
+            values = [str(v) for v in value]
+        else:
+            values = [str(value)]
+        if any(',' in v for v in values):
+            raise ValueError("filter values can't contain commas: {0}".format(value))
+        value = "[" + ",".join(values) + "]" if operator == 'in' else values[0]
+        self.expressions = ((field, operator, value),)
+
+    def __and__(self, other):
+        combined = Filter.__new__(Filter)
+        combined.expressions = self.expressions + other.expressions
+        return combined
+
+    def __str__(self):
+        return ",".join(":".join(expression) for expression in self.expressions)
+
+    def __repr__(self):
+        return "Filter({0!r})".format(str(self))
+
+def _query_string(resource, filter=None, sort=None, fields=None):
+    """
+    returns the validated ?filter=...&sort=...&fields=... string for a listing ('' when nothing is given)
+    sort: field name or list of field names, each optionally followed by :asc or :desc
+    fields: list of attributes to return (e.g ['id', 'name']), or ['_all_']
+    """
+    allowed = _filter_fields[resource]
+    params = []
+    if filter is not None:
+        for field, operator, value in filter.expressions:
+            if field not in allowed:
+                raise ValueError("{0} can't be filtered on {1}: must be one of {2}".format(resource, field, sorted(allowed)))
+            if operator not in allowed[field]:
+                raise ValueError("{0} filter on {1} must use one of {2}".format(resource, field, allowed[field]))
+        params.append("filter=" + urllib.parse.quote(str(filter), safe=':,[]'))
+    if sort:
+        sort = [sort] if isinstance(sort, str) else list(sort)
+        for key in sort:
+            field, _, direction = key.partition(':')
+            if field not in allowed:
+                raise ValueError("{0} can't be sorted on {1}: must be one of {2}".format(resource, field, sorted(allowed)))
+            if direction not in ('', 'asc', 'desc'):
+                raise ValueError("invalid sort direction {0}: must be asc or desc".format(direction))
+        params.append("sort=" + ",".join(key if ':' in key else key + ':asc' for key in sort))
+    if fields:
+        fields = [fields] if isinstance(fields, str) else list(fields)
+        for field in fields:
+            if not re.match(r'^(_all_|_default_|[A-Za-z][A-Za-z.]*)$', field):
+                raise ValueError("invalid field {0}".format(field))
+        params.append("fields=" + ",".join(fields))
+    return "?" + "&".join(params) if params else ""
+
+def _listing_fields(fields):
+    # the Query classes index records by id and name, so both are always requested
+    if not fields:
+        return fields
+    fields = [fields] if isinstance(fields, str) else list(fields)
+    if '_all_' in fields or '_default_' in fields:
+        return fields
+    return ['id', 'name'] + [field for field in fields if field not in ('id', 'name')]
+
+class SnapshotCache():
+    """
+    opt-in on-disk cache of QueryProjects, QueryWorkbooks, QueryGroups, QueryUsers and ViewIndex results, stored in a sqlite file and
+    keyed by server, site id and resource ('projects', 'workbooks', 'groups', 'users', 'views')
+    path: sqlite file, shared safely between scripts and processes
+    ttl: seconds a snapshot stays fresh; older snapshots are fetched again from the server
+    write functions in this module (add_user, delete_group, create_project...) invalidate the snapshots they change in every open cache
+    those classes take a cache argument: a SnapshotCache to load a fresh snapshot from instead of calling the server (and to store
+    what was fetched), None for the default cache from set_default_cache, or False to skip caching. their from_cache attribute
+    tells whether the records came from a snapshot. filtered, sorted or trimmed listings are never cached
+    """
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        with contextlib.closing(sqlite3.connect(self.path)) as connection, connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS snapshots (server TEXT, site_id TEXT, resource TEXT, fetched_at REAL, records TEXT, PRIMARY KEY (server, site_id, resource))")
+        _open_caches.add(self)
+
+    def get(self, server, site_id, resource, record_type):
+        # returns the cached records, or None when there is no fresh snapshot
+        with contextlib.closing(sqlite3.connect(self.path)) as connection:
+            row = connection.execute("SELECT fetched_at, records FROM snapshots WHERE server = ? AND site_id = ? AND resource = ?", (server, site_id, resource)).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        shared = [position for position, attribute in enumerate(record_type._xml_attributes) if attribute in record_type._shared_attributes]
+        records = []
+        for values in json.loads(row[1]):
+            for position in shared:
+                if values[position] is not None:
+                    values[position] = sys.intern(values[position])
+            records.append(record_type._make(values))
+        return records
+
+    def put(self, server, site_id, resource, records):
+        with contextlib.closing(sqlite3.connect(self.path)) as connection, connection:
+            connection.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)", (server, site_id, resource, time.time(), json.dumps(records, separators=(',', ':'))))
+
+    def invalidate(self, server=None, site_id=None, resource=None):
+        # removes every snapshot matching the given server, site id and resource (all snapshots when none are given)
+        conditions = [(column, value) for column, value in (('server', server), ('site_id', site_id), ('resource', resource)) if value is not None]
+        query = "DELETE FROM snapshots" + (" WHERE " + " AND ".join(column + " = ?" for column, value in conditions) if conditions else "")
+        with contextlib.closing(sqlite3.connect(self.path)) as connection, connection:
+            connection.execute(query, [value for column, value in conditions])
+
+
+_open_caches = weakref.WeakSet()
+_default_cache = None
+
+def get_default_cache():
+    """
+    returns the SnapshotCache used by the Query classes when no cache is passed (None, i.e no caching, unless set)
+    """
+    return _default_cache
+
+def set_default_cache(cache):
+    """
+    sets the SnapshotCache used by the Query classes when no cache is passed; None turns default caching off
+    """
+    global _default_cache
+    _default_cache = cache
+
+def _cached_records(cache, server, site_id, resource, record_type, fetch):
+    # returns (records, True) from a fresh snapshot, otherwise (fetch(), False) after storing the fetched records
+    # cache: a SnapshotCache, None for the default cache or False to skip caching
+    cache = _default_cache if cache is None else cache
+    if not cache:
+        return fetch(), False
+    records = cache.get(server, site_id, resource, record_type)
+    if records is not None:
+        return records, True
+    records = fetch()
+    cache.put(server, site_id, resource, records)
+    return records, False
+
+def _invalidate_snapshots(server, site_id, *resources):
+    for cache in list(_open_caches):
+        for resource in resources:
+            cache.invalidate(server, site_id, resource)
+
+def _store_snapshot(cache, server, site_id, resource, records):
+    cache = _default_cache if cache is None else cache
+    if cache:
+        cache.put(server, site_id, resource, records)
+
+def _refresh_records(records, url, token, xmlns, resource, element_name, record_type, mark_attribute, client=None, page_size=1000, max_workers=8, fetch_missing=None, filter=None, sort=None, response_format=None):
+    """
+    returns (records, report): the current records in server order, built from records plus only the objects whose mark_attribute
+    (updatedAt, lastLogin...) is at or after the newest value in records, and an id-only listing of the site to drop deleted objects
+    ids in the listing that are neither in records nor changed are read with fetch_missing(ids), or by listing everything again
+    filter and sort: those the records were listed with, applied to every listing
+    """
+    marks = [record.get(mark_attribute) for record in records if record.get(mark_attribute)]
+    if marks:
+        # gte rather than gt so objects changed within the same second as the high-water mark aren't missed
+        changed_filter = Filter(mark_attribute, 'gte', max(marks))
+        changed_filter = changed_filter if filter is None else filter & changed_filter
+        changed = _query_all_pages(url + _query_string(resource, changed_filter, sort), token, xmlns, element_name, record_type, client, page_size, max_workers, response_format)
+    else:
+        changed = []
+    current_ids = [record.id for record in _query_all_pages(url + _query_string(resource, filter, sort, ['id']), token, xmlns, element_name, record_type, client, page_size, max_workers, response_format)]
+    records_by_id = {record.id: record for record in records}
+    changed_by_id = {record.id: record for record in changed}
+    missing = [record_id for record_id in current_ids if record_id not in records_by_id and record_id not in changed_by_id]
+    if missing:
+        if fetch_missing is not None:
+            changed_by_id.update((record.id, record) for record in fetch_missing(missing))
+        else:
+            changed_by_id = {record.id: record for record in _query_all_pages(url + _query_string(resource, filter, sort), token, xmlns, element_name, record_type, client, page_size, max_workers, response_format)}
+    current = set(current_ids)
+    report = {'added': [], 'updated': [], 'deleted': [record.id for record in records if record.id not in current]}
+    for record_id, record in changed_by_id.items():
+        if record_id not in current:
+            continue
+        if record_id not in records_by_id:
+            report['added'].append(record_id)
+        elif records_by_id[record_id] != record:
+            report['updated'].append(record_id)
+        records_by_id[record_id] = record
+    return [records_by_id[record_id] for record_id in current_ids if record_id in records_by_id], report
+
 class QueryProjects():
     """
-    performs single API call that returns xml data for projects. xml is parsed using associated methods
+    queries every page of projects on the site (pages after the first are fetched concurrently). xml is parsed using associated methods
+    page_size: projects per API call (max 1000), max_workers: maximum concurrent page requests
+    lookups by name use the first project returned by the server when several share a name
+    records: list of ProjectRecord; when given (e.g fetched by tableau_rest_async) no API calls are made
+    cache: see SnapshotCache
+    filter, sort, fields: see Filter
+    response_format: see TableauClient
     """
-    def __init__(self, VERSION, site_id, token, server, xmlns):
+    _records_attribute = 'projects'
+
+    def __init__(self, VERSION, site_id, token, server, xmlns, client=None, page_size=1000, max_workers=8, records=None, cache=None, filter=None, sort=None, fields=None, response_format=None):
         self.VERSION = VERSION
         self.site_id = site_id
-        url = server + "/api/{0}/sites/{1}/projects".format(VERSION, site_id)
-        # xml_request = 'none'
-        server_response = requests.get(url, headers={'x-tableau-auth': token}, verify=False)
-        _check_status(server_response, 200, xmlns)
-        server_response = _encode_for_display(server_response.text)
-        parsed_response = ET.fromstring(server_response)
-        self.projects = parsed_response.findall('.//t:project', namespaces=xmlns)
+        self.server = server
+        self.xmlns = xmlns
+        self.client = client
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.response_format = response_format
+        self._cache = cache
+        self.from_cache = False
+        # GET /api/api-version/sites/site-id/projects?pageSize=page-size&pageNumber=page-number
+        self._url = server + "/api/{0}/sites/{1}/projects".format(VERSION, site_id)
+        self.filter = filter
+        self.sort = sort
+        self.fields = _listing_fields(fields)
+        query = _query_string('projects', filter, sort, self.fields)
+        if records is None:
+            records, self.from_cache = _cached_records(cache if not query else False, server, site_id, 'projects', ProjectRecord, lambda: _query_all_pages(self._url + query, token, xmlns, 'project', ProjectRecord, client, page_size, max_workers, self.response_format))
+        self.projects = list(records)
+        self._set_records()
+
+    def _set_records(self):
         self.project_names= [proj.get('name') for proj in self.projects]
         self.project_ids= [proj.get('id') for proj in self.projects]
+        self._projects_by_name = _index_by(self.projects, 'name')
+        self._projects_by_id = _index_by(self.projects, 'id')
+
+    def refresh(self, token):
+        """
+        updates the projects in place with only the projects changed since the newest updatedAt already held, plus an id-only
+        listing to find deleted projects. returns {'added': [project ids], 'updated': [project ids], 'deleted': [project ids]}
+        """
+        if self.fields:
+            raise ValueError("refresh needs complete records; create the object without fields")
+        self.projects[:], report = _refresh_records(self.projects, self._url, token, self.xmlns, 'projects', 'project', ProjectRecord, 'updatedAt', self.client, self.page_size, self.max_workers, None, self.filter, self.sort, self.response_format)
+        self._set_records()
+        if not self.filter and not self.sort:
+            _store_snapshot(self._cache, self.server, self.site_id, 'projects', self.projects)
+        return report
 
     def project_id_from_name(self, project_name):
-        _check_user_input(project_name, self.project_names)
-        if project_name in self.project_names:
-            project_id = [project.get('id') for project in self.projects if project.get('name') == project_name]
-            return project_id[0]
+        _check_user_input(project_name, self._projects_by_name)
+        return self._projects_by_name[project_name].get('id')
         
     def project_name_from_id(self, project_id):
-        _check_user_input(project_id, self.project_ids)
-        if project_id in self.project_ids:
-            project_name = [project.get('name') for project in self.projects if project.get('id') == project_id]
-            return project_name[0]
+        _check_user_input(project_id, self._projects_by_id)
+        return self._projects_by_id[project_id].get('name')
     
+    def ids_from_names(self, project_names):
+        """
+        returns a list of project ids for a list of project names (same order), resolved in one pass
+        """
+        return _bulk_lookup(self._projects_by_name, project_names, 'id')
+
+    def names_from_ids(self, project_ids):
+        """
+        returns a list of project names for a list of project ids (same order), resolved in one pass
+        """
+        return _bulk_lookup(self._projects_by_id, project_ids, 'name')
+
     def project_description_from_name(self, project_name):
-        _check_user_input(project_name, self.project_names)
-        if project_name in self.project_names:
-            project_description = [project.get('description') for project in self.projects if project.get('name') == project_name]
-            return project_description[0]
+        _check_user_input(project_name, self._projects_by_name)
+        return self._projects_by_name[project_name].get('description')
         
     def project_controllingpermissions_from_name(self, project_name):
-        _check_user_input(project_name, self.project_names)
-        if project_name in self.project_names:
-            project_controllingpermissions_id = [project.get('controllingPermissionsProjectId') for project in self.projects if project.get('name') == project_name]
-            return project_controllingpermissions_id[0]
+        _check_user_input(project_name, self._projects_by_name)
+        return self._projects_by_name[project_name].get('controllingPermissionsProjectId')
     
     def project_createdat_from_name(self, project_name):
-        _check_user_input(project_name, self.project_names)
-        if project_name in self.project_names:
-            project_createdat = [project.get('createdAt') for project in self.projects if project.get('name') == project_name]
-            return project_createdat[0]
+        _check_user_input(project_name, self._projects_by_name)
+        return self._projects_by_name[project_name].get('createdAt')
     
     def project_updatedat_from_name(self, project_name):
-        _check_user_input(project_name, self.project_names)
-        if project_name in self.project_names:
-            project_updatedat = [project.get('updatedAt') for project in self.projects if project.get('name') == project_name]
-            return project_updatedat[0]
+        _check_user_input(project_name, self._projects_by_name)
+        return self._projects_by_name[project_name].get('updatedAt')
     
     def project_permissionslocked_from_name(self, project_name):
-        _check_user_input(project_name, self.project_names)
-        if project_name in self.project_names:
-            project_contentpermissions = [project.get('contentPermissions') for project in self.projects if project.get('name') == project_name]
-            return project_contentpermissions[0]
+        _check_user_input(project_name, self._projects_by_name)
+        return self._projects_by_name[project_name].get('contentPermissions')
+
+def iter_projects(VERSION, site_id, token, server, xmlns, client=None, page_size=1000, filter=None, sort=None, fields=None, response_format=None):
+    """
+    yields a ProjectRecord for every project on the site, one at a time. pages are requested one after another and parsed
+    incrementally, so memory stays flat regardless of site size (use QueryProjects when you need lookups across all projects)
+    filter, sort, fields: see Filter
+    response_format: see TableauClient
+    """
+    # GET /api/api-version/sites/site-id/projects?pageSize=page-size&pageNumber=page-number
+    url = server + "/api/{0}/sites/{1}/projects".format(VERSION, site_id) + _query_string('projects', filter, sort, fields)
+    return _iter_records(ProjectRecord, url, token, xmlns, 'project', client, page_size, response_format)
 
 class QueryWorkbooks():
     """
-    performs single API call that returns xml data for workbooks. xml is parsed using associated methods
+    queries every page of workbooks on the site (pages after the first are fetched concurrently). xml is parsed using associated methods
+    page_size: workbooks per API call (max 1000), max_workers: maximum concurrent page requests
+    lookups by name use the first workbook returned by the server when several share a name
+    records: list of WorkbookRecord; when given (e.g fetched by tableau_rest_async) no API calls are made
+    cache: see SnapshotCache
+    filter, sort, fields: see Filter
+    response_format: see TableauClient
     """
-    def __init__(self, VERSION, site_id, token, server, xmlns):
+    _records_attribute = 'workbooks'
+
+    def __init__(self, VERSION, site_id, token, server, xmlns, client=None, page_size=1000, max_workers=8, records=None, cache=None, filter=None, sort=None, fields=None, response_format=None):
         self.VERSION = VERSION
         self.site_id = site_id
         self.server = server
         self.xmlns = xmlns
-        # GET /api/api-version/sites/site-id/workbooks
-        url = server + "/api/{0}/sites/{1}/workbooks?pageSize=300".format(VERSION, site_id)
-        # xml_request = 'none'
-        server_response = requests.get(url, headers={'x-tableau-auth': token}, verify = False)
-        _check_status(server_response, 200, xmlns)
-        server_response = _encode_for_display(server_response.text)
-        parsed_response = ET.fromstring(server_response)
-        self.workbooks = parsed_response.findall('.//t:workbook', namespaces = xmlns)
+        self.client = client
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.response_format = response_format
+        self._cache = cache
+        self.from_cache = False
+        # GET /api/api-version/sites/site-id/workbooks?pageSize=page-size&pageNumber=page-number
+        self._url = server + "/api/{0}/sites/{1}/workbooks".format(VERSION, site_id)
+        self.filter = filter
+        self.sort = sort
+        self.fields = _listing_fields(fields)
+        query = _query_string('workbooks', filter, sort, self.fields)
+        if records is None:
+            records, self.from_cache = _cached_records(cache if not query else False, server, site_id, 'workbooks', WorkbookRecord, lambda: _query_all_pages(self._url + query, token, xmlns, 'workbook', WorkbookRecord, client, page_size, max_workers, self.response_format))
+        self.workbooks = list(records)
+        self._set_records()
+
+    def _set_records(self):
         self.workbook_names= [workbook.get('name') for workbook in self.workbooks]
         self.workbook_ids= [workbook.get('id') for workbook in self.workbooks]
+        self._workbooks_by_name = _index_by(self.workbooks, 'name')
+        self._workbooks_by_id = _index_by(self.workbooks, 'id')
+        self._workbook_names_by_project_id = {}
+        for workbook in self.workbooks:
+            self._workbook_names_by_project_id.setdefault(workbook.project_id, []).append(workbook.name)
+
+    def refresh(self, token):
+        """
+        updates the workbooks in place with only the workbooks changed since the newest updatedAt already held, plus an id-only
+        listing to find deleted workbooks. returns {'added': [workbook ids], 'updated': [workbook ids], 'deleted': [workbook ids]}
+        """
+        if self.fields:
+            raise ValueError("refresh needs complete records; create the object without fields")
+        self.workbooks[:], report = _refresh_records(self.workbooks, self._url, token, self.xmlns, 'workbooks', 'workbook', WorkbookRecord, 'updatedAt', self.client, self.page_size, self.max_workers, None, self.filter, self.sort, self.response_format)
+        self._set_records()
+        if not self.filter and not self.sort:
+            _store_snapshot(self._cache, self.server, self.site_id, 'workbooks', self.workbooks)
+        return report
 
     def workbook_id_from_name(self, workbook_name):
-        _check_user_input(workbook_name, self.workbook_names)
-        if workbook_name in self.workbook_names:
-            workbook_id = [workbook.get('id') for workbook in self.workbooks if workbook.get('name') == workbook_name]
-        return workbook_id[0]
+        _check_user_input(workbook_name, self._workbooks_by_name)
+        return self._workbooks_by_name[workbook_name].get('id')
 
     def workbook_name_from_id(self, workbook_id):
-        _check_user_input(workbook_id, self.workbook_ids)
-        if workbook_id in self.workbook_ids:
-            workbook_name = [workbook.get('name') for workbook in self.workbooks if workbook.get('id') == workbook_id]
-        return workbook_name[0]
+        _check_user_input(workbook_id, self._workbooks_by_id)
+        return self._workbooks_by_id[workbook_id].get('name')
     
-    def workbooks_from_projectid(self, project_id, xmlns):
-        workbook_names = [workbook.get('name') for workbook in self.workbooks if workbook.find('.//t:project', namespaces = xmlns).get('id') == project_id]
-        return workbook_names
+    def ids_from_names(self, workbook_names):
+        """
+        returns a list of workbook ids for a list of workbook names (same order), resolved in one pass
+        """
+        return _bulk_lookup(self._workbooks_by_name, workbook_names, 'id')
+
+    def names_from_ids(self, workbook_ids):
+        """
+        returns a list of workbook names for a list of workbook ids (same order), resolved in one pass
+        """
+        return _bulk_lookup(self._workbooks_by_id, workbook_ids, 'name')
+
+    def workbooks_from_projectid(self, project_id, xmlns=None):
+        # xmlns is no longer needed (the project index is built when the object is created), kept for compatibility
+        return list(self._workbook_names_by_project_id.get(project_id, []))
 
-def download_workbook(VERSION, site_id, token, xmlns, workbook_id, server, include_extract = False):
+def iter_workbooks(VERSION, site_id, token, server, xmlns, client=None, page_size=1000, filter=None, sort=None, fields=None, response_format=None):
+    """
+    yields a WorkbookRecord for every workbook on the site, one at a time. pages are requested one after another and parsed
+    incrementally, so memory stays flat regardless of site size (use QueryWorkbooks when you need lookups across all workbooks)
+    filter, sort, fields: see Filter
+    response_format: see TableauClient
+    """
+    # GET /api/api-version/sites/site-id/workbooks?pageSize=page-size&pageNumber=page-number
+    url = server + "/api/{0}/sites/{1}/workbooks".format(VERSION, site_id) + _query_string('workbooks', filter, sort, fields)
+    return _iter_records(WorkbookRecord, url, token, xmlns, 'workbook', client, page_size, response_format)
+
+_download_chunk_size = 1024 * 1024
+
+def _download_target(path, workbook_id):
+    # returns (final path or None when it comes from the server filename, directory, partial file path)
+    if path is None or os.path.isdir(path):
+        directory = path or '.'
+        return None, directory, os.path.join(directory, workbook_id + '.part')
+    return path, os.path.dirname(path) or '.', path + '.part'
+
+def _stream_to_file(server_response, f, chunk_size):
+    written = 0
+    for chunk in server_response.iter_content(chunk_size=chunk_size):
+        f.write(chunk)
+        written += len(chunk)
+    return written
+
+def download_workbook(VERSION, site_id, token, xmlns, workbook_id, server, include_extract = False, client=None, path=None, chunk_size=_download_chunk_size, retries=3):
+    """
+    streams the workbook to disk chunk_size bytes at a time, so memory use doesn't grow with the size of the workbook
+    path: None (server filename in the current directory), a directory (server filename in that directory), a file path, or a
+          writable binary file object
+    the download is written to a .part file next to the target and renamed once complete. if the transfer is interrupted it is
+    resumed from the bytes already on disk with an HTTP Range request, up to retries times; a .part file left by an earlier
+    failed call is resumed the same way. returns the path written (or the file object)
+    """
     #GET /api/api-version/sites/site-id/workbooks/workbook-id/content
     # GET /api/api-version/sites/site-id/workbooks/workbook-id/content?includeExtract=extract-value
     url = server + "/api/{0}/sites/{1}/workbooks/{2}/content?includeExtract={3}".format(VERSION, site_id, workbook_id, include_extract)
-    # xml_request = 'none'
-    server_response = requests.get(url, headers={'x-tableau-auth': token}, verify=False)
-    _check_status(server_response, 200, xmlns)
-    # Header format: Content-Disposition: name="tableau_workbook"; filename="workbook-filename"
-    filename = re.findall(r'filename="(.*)"', server_response.headers['Content-Disposition'])[0]
-    with open(filename, 'wb') as f:
-        f.write(server_response.content)
-    return filename
+    if hasattr(path, 'write'):
+        # file objects can't be renamed or reopened, so they are written in a single pass
+        with _get_client(client).get(url, token, stream=True) as server_response:
+            _check_status(server_response, 200, xmlns)
+            _stream_to_file(server_response, path, chunk_size)
+        return path
+    final_path, directory, part_path = _download_target(path, workbook_id)
+    attempt = 0
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': 'bytes={0}-'.format(offset)} if offset else None
+        try:
+            with _get_client(client).get(url, token, stream=True, headers=headers) as server_response:
+                if offset and server_response.status_code == 416:
+                    # the partial file doesn't match what the server has now; start over
+                    os.remove(part_path)
+                    continue
+                if server_response.status_code != 206:
+                    _check_status(server_response, 200, xmlns)
+                    # the server ignored the Range header and is sending the whole file
+                    offset = 0
+                # Header format: Content-Disposition: name="tableau_workbook"; filename="workbook-filename"
+                if final_path is None:
+                    filename = re.findall(r'filename="(.*)"', server_response.headers['Content-Disposition'])[0]
+                    final_path = os.path.join(directory, os.path.basename(filename)) if directory != '.' else os.path.basename(filename)
+                expected = server_response.headers.get('Content-Length')
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    written = _stream_to_file(server_response, f, chunk_size)
+                if expected is not None and written != int(expected):
+                    raise requests.exceptions.ChunkedEncodingError("workbook {0}: received {1} of {2} bytes".format(workbook_id, written, expected))
+        except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            attempt += 1
+            if attempt > retries:
+                raise
+            continue
+        os.replace(part_path, final_path)
+        return final_path
+
+def download_workbooks(VERSION, site_id, token, xmlns, workbook_ids, server, include_extract = False, directory='.', max_workers=4, client=None, chunk_size=_download_chunk_size, retries=3):
+    """
+    downloads many workbooks into directory concurrently (at most max_workers at a time), each streamed and resumable as in
+    download_workbook. a failed download doesn't stop the others
+    returns {'downloaded': {workbook id: path}, 'failed': {workbook id: error message}}
+    """
+    def download(workbook_id):
+        try:
+            return download_workbook(VERSION, site_id, token, xmlns, workbook_id, server, include_extract, client, directory, chunk_size, retries), None
+        except (ApiCallError, requests.RequestException, OSError) as error:
+            return None, str(error)
+
+    workbook_ids = list(workbook_ids)
+    report = {'downloaded': {}, 'failed': {}}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for workbook_id, (path, error) in zip(workbook_ids, executor.map(download, workbook_ids)):
+            if error is None:
+                report['downloaded'][workbook_id] = path
+            else:
+                report['failed'][workbook_id] = error
+    return report
 
 
 class QueryWorkbookViews():
     """
     performs single API call that returns xml data for workbooks. xml is parsed using associated methods
+    lookups by name use the first view returned by the server when several share a name
+    records: list of ViewRecord; when given (e.g fetched by tableau_rest_async) no API calls are made
+    response_format: see TableauClient
     """
-    def __init__(self, VERSION, site_id, token, server, xmlns, workbook_id):
+    _records_attribute = 'views'
+
+    def __init__(self, VERSION, site_id, token, server, xmlns, workbook_id, client=None, records=None, response_format=None):
         self.VERSION = VERSION
         self.site_id = site_id
         self.server = server
-        # GET /api/api-version/sites/site-id/workbooks/workbook-id/views
-        url = server + "/api/{0}/sites/{1}/workbooks/{2}/views".format(VERSION, site_id, workbook_id)
-        server_response = requests.get(url, headers={'x-tableau-auth': token}, verify=False)
-        _check_status(server_response, 200, xmlns)
-        server_response = _encode_for_display(server_response.text)
-        parsed_response = ET.fromstring(server_response)
-        self.views = parsed_response.findall('.//t:view', namespaces=xmlns)
+        if records is None:
+            # GET /api/api-version/sites/site-id/workbooks/workbook-id/views
+            url = server + "/api/{0}/sites/{1}/workbooks/{2}/views".format(VERSION, site_id, workbook_id)
+            response_format = _client_response_format(client, response_format)
+            server_response = _get_client(client).get(url, token, headers=_format_headers(response_format))
+            _check_status(server_response, 200, xmlns)
+            records = _workbook_view_records(server_response, xmlns, workbook_id, response_format)
+        self.views = list(records)
         self.view_names= [view.get('name') for view in self.views]
         self.view_ids= [view.get('id') for view in self.views]
+        self._views_by_name = _index_by(self.views, 'name')
+        self._views_by_id = _index_by(self.views, 'id')
 
     def view_id_from_name(self, view_name):
-        _check_user_input(view_name, self.view_names)
-        if view_name in self.view_names:
-            view_id = [view.get('id') for view in self.views if view.get('name') == view_name]
-        return view_id[0]
+        _check_user_input(view_name, self._views_by_name)
+        return self._views_by_name[view_name].get('id')
 
     def view_name_from_id(self, view_id):
-        _check_user_input(view_id, self.view_ids)
-        if view_id in self.view_ids:
-            view_name = [view.get('name') for view in self.views if view.get('id') == view_id]
-        return view_name[0]
+        _check_user_input(view_id, self._views_by_id)
+        return self._views_by_id[view_id].get('name')
+
+    def ids_from_names(self, view_names):
+        """
+        returns a list of view ids for a list of view names (same order), resolved in one pass
+        """
+        return _bulk_lookup(self._views_by_name, view_names, 'id')
+
+    def names_from_ids(self, view_ids):
+        """
+        returns a list of view names for a list of view ids (same order), resolved in one pass
+        """
+        return _bulk_lookup(self._views_by_id, view_ids, 'name')
 
     def view_contenturl_from_id(self, view_id):
-        _check_user_input(view_id, self.view_ids)
-        if view_id in self.view_ids:
-            view_contenturl = [view.get('contentUrl') for view in self.views if view.get('id') == view_id]
-        return view_contenturl[0]
+        _check_user_input(view_id, self._views_by_id)
+        return self._views_by_id[view_id].get('contentUrl')
 
-def query_view_data(VERSION, site_id, token, xmlns, view_id, server):
-    # GET /api/api-version/sites/site-id/views/view-id/data
+def _workbook_view_records(server_response, xmlns, workbook_id, response_format='xml'):
+    # this endpoint doesn't nest a workbook element in each view, so the workbook id is filled in from the request
+    return [view._replace(workbook_id=workbook_id) for view in _response_records(server_response, xmlns, 'view', ViewRecord, response_format)[0]]
+
+class ViewIndex():
+    """
+    every view on the site from the paginated site-level views listing (pages after the first are fetched concurrently), so a full
+    view catalog costs a few calls instead of one QueryWorkbookViews call per workbook
+    views: list of ViewRecord in server order
+    views_by_workbook_id: dictionary of workbook id -> list of ViewRecord
+    views_by_id: dictionary of view id -> ViewRecord
+    views_by_content_url: dictionary of view contentUrl (e.g 'Superstore/sheets/Overview') -> ViewRecord
+    page_size: views per API call (max 1000), max_workers: maximum concurrent page requests
+    records: list of ViewRecord; when given (e.g fetched by tableau_rest_async) no API calls are made
+    cache: see SnapshotCache
+    filter, sort: see Filter
+    response_format: see TableauClient
+    """
+    _records_attribute = 'views'
+
+    def __init__(self, VERSION, site_id, token, server, xmlns, client=None, page_size=1000, max_workers=8, records=None, cache=None, filter=None, sort=None, response_format=None):
+        self.VERSION = VERSION
+        self.site_id = site_id
+        self.server = server
+        self.xmlns = xmlns
+        self.client = client
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.response_format = response_format
+        self._cache = cache
+        self.from_cache = False
+        # GET /api/api-version/sites/site-id/views?pageSize=page-size&pageNumber=page-number
+        self._url = server + "/api/{0}/sites/{1}/views".format(VERSION, site_id)
+        self.filter = filter
+        self.sort = sort
+        query = _query_string('views', filter, sort)
+        if records is None:
+            records, self.from_cache = _cached_records(cache if not query else False, server, site_id, 'views', ViewRecord, lambda: _query_all_pages(self._url + query, token, xmlns, 'view', ViewRecord, client, page_size, max_workers, self.response_format))
+        self.views = list(records)
+        self._set_records()
+
+    def _set_records(self):
+        self.views_by_id = _index_by(self.views, 'id')
+        self.views_by_content_url = _index_by(self.views, 'contentUrl')
+        self.views_by_workbook_id = {}
+        for view in self.views:
+            self.views_by_workbook_id.setdefault(view.workbook_id, []).append(view)
+
+    def refresh(self, token):
+        """
+        updates the index in place with only the views changed since the newest updatedAt already held, plus an id-only listing to
+        find deleted views. returns {'added': [view ids], 'updated': [view ids], 'deleted': [view ids]}
+        """
+        self.views[:], report = _refresh_records(self.views, self._url, token, self.xmlns, 'views', 'view', ViewRecord, 'updatedAt', self.client, self.page_size, self.max_workers, None, self.filter, self.sort, self.response_format)
+        self._set_records()
+        if not self.filter and not self.sort:
+            _store_snapshot(self._cache, self.server, self.site_id, 'views', self.views)
+        return report
+
+    def views_for_workbook(self, workbook_id):
+        # returns the list of ViewRecord of one workbook (empty when it has none)
+        return list(self.views_by_workbook_id.get(workbook_id, []))
+
+    def workbook_views(self, workbook_id):
+        # returns the QueryWorkbookViews object of one workbook, without an API call
+        return QueryWorkbookViews(self.VERSION, self.site_id, None, self.server, self.xmlns, workbook_id, records=self.views_for_workbook(workbook_id))
+
+    def view_name_from_id(self, view_id):
+        _check_user_input(view_id, self.views_by_id)
+        return self.views_by_id[view_id].get('name')
+
+    def view_contenturl_from_id(self, view_id):
+        _check_user_input(view_id, self.views_by_id)
+        return self.views_by_id[view_id].get('contentUrl')
+
+    def view_id_from_contenturl(self, content_url):
+        _check_user_input(content_url, self.views_by_content_url)
+        return self.views_by_content_url[content_url].get('id')
+
+    def names_from_ids(self, view_ids):
+        """
+        returns a list of view names for a list of view ids (same order), resolved in one pass
+        """
+        return _bulk_lookup(self.views_by_id, view_ids, 'name')
+
+def iter_views(VERSION, site_id, token, server, xmlns, client=None, page_size=1000, filter=None, sort=None, fields=None, response_format=None):
+    """
+    yields a ViewRecord for every view on the site, one at a time. pages are requested one after another and parsed
+    incrementally, so memory stays flat regardless of site size (use ViewIndex when you need lookups across all views)
+    filter, sort, fields: see Filter
+    response_format: see TableauClient
+    """
+    # GET /api/api-version/sites/site-id/views?pageSize=page-size&pageNumber=page-number
+    url = server + "/api/{0}/sites/{1}/views".format(VERSION, site_id) + _query_string('views', filter, sort, fields)
+    return _iter_records(ViewRecord, url, token, xmlns, 'view', client, page_size, response_format)
+
+def _view_data_url(VERSION, site_id, server, view_id, filters=None):
+    # filters: dictionary of field name -> value or list of values, sent as vf_field-name=value1,value2
     url = server + "/api/{0}/sites/{1}/views/{2}/data".format(VERSION, site_id, view_id)
+    if filters:
+        params = []
+        for field, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                value = ",".join(str(v) for v in value)
+            field = field if field.startswith('vf_') else 'vf_' + field
+            params.append(urllib.parse.quote(field) + "=" + urllib.parse.quote(str(value), safe=','))
+        url += "?" + "&".join(params)
+    return url
+
+def query_view_data(VERSION, site_id, token, xmlns, view_id, server, client=None, filters=None):
+    # GET /api/api-version/sites/site-id/views/view-id/data
+    url = _view_data_url(VERSION, site_id, server, view_id, filters)
     # xml_request = 'none'
-    server_response = requests.get(url, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).get(url, token)
     _check_status(server_response, 200, xmlns)
-    server_response = _encode_for_display(server_response.text)
-    # parsed_response = ET.fromstring(server_response)
+    return server_response.content.decode(_csv_encoding(server_response.headers), errors='replace')
+
+def _open_view_data(VERSION, site_id, token, xmlns, view_id, server, filters=None, client=None):
+    # returns the streamed response for the view csv; close it when done
+    server_response = _get_client(client).get(_view_data_url(VERSION, site_id, server, view_id, filters), token, stream=True)
+    if server_response.status_code != 200:
+        with server_response:
+            _check_status(server_response, 200, xmlns)
+    server_response.raw.decode_content = True
+    # keeps the raw stream readable at the end of the body so io.TextIOWrapper can wrap it
+    server_response.raw.auto_close = False
     return server_response
 
+def _csv_encoding(headers):
+    # the charset of the Content-Type header, otherwise utf-8 (requests would read text/csv without one as ISO-8859-1);
+    # utf-8-sig drops the byte order mark tableau puts at the start of the csv
+    encoding = 'utf-8'
+    for parameter in headers.get('Content-Type', '').split(';')[1:]:
+        name, _, value = parameter.partition('=')
+        if name.strip().lower() == 'charset' and value.strip():
+            encoding = value.strip().strip('"\'')
+    if encoding.lower().replace('_', '-') in ('utf-8', 'utf8'):
+        encoding = 'utf-8-sig'
+    return encoding
+
+def _csv_text(server_response):
+    # decodes the body while it streams
+    return io.TextIOWrapper(server_response.raw, encoding=_csv_encoding(server_response.headers), newline='')
+
+def iter_view_data(VERSION, site_id, token, xmlns, view_id, server, filters=None, batch_size=10000, client=None):
+    """
+    streams the view data csv and yields (column names, rows) with at most batch_size rows per batch, so memory use depends
+    on batch_size rather than the size of the view. rows are lists of strings, decoded as unicode (not display-encoded)
+    filters: optional dictionary of field name -> value or list of values (vf_ parameters)
+    """
+    with _open_view_data(VERSION, site_id, token, xmlns, view_id, server, filters, client) as server_response:
+        reader = csv.reader(_csv_text(server_response))
+        columns = next(reader, None)
+        if columns is None:
+            return
+        columns = tuple(columns)
+        while True:
+            rows = list(itertools.islice(reader, batch_size))
+            if not rows:
+                return
+            yield columns, rows
+
+def _numpy_column(values, dtype=None):
+    import numpy as np
+    if dtype is not None:
+        return np.array(values, dtype=dtype)
+    try:
+        return np.array(values, dtype=np.int64)
+    except (ValueError, OverflowError):
+        # not integers, or integers too large for int64
+        pass
+    try:
+        # empty cells become nan
+        return np.array([value or 'nan' for value in values], dtype=np.float64)
+    except ValueError:
+        return np.array(values, dtype=object)
+
+def view_data_columns(VERSION, site_id, token, xmlns, view_id, server, filters=None, output='numpy', dtypes=None, batch_size=10000, client=None):
+    """
+    reads the view data csv into typed columns
+    output: 'numpy' returns a dictionary of column name -> numpy array (int64, float64 or object); 'pandas' returns a DataFrame and
+            'arrow' returns a pyarrow Table, both parsed by their C csv readers straight from the response stream
+    dtypes: optional dictionary of column name -> dtype. for 'numpy', columns with a dtype are converted batch by batch; the others are
+            inferred (int64, then float64, then object) once the whole column is read
+    """
+    if output not in ('numpy', 'pandas', 'arrow'):
+        raise ValueError("invalid argument output: must be numpy, pandas or arrow")
+    if output != 'numpy':
+        with _open_view_data(VERSION, site_id, token, xmlns, view_id, server, filters, client) as server_response:
+            if output == 'pandas':
+                import pandas
+                return pandas.read_csv(_csv_text(server_response), dtype=dtypes)
+            import pyarrow.csv
+            convert_options = pyarrow.csv.ConvertOptions(column_types=dtypes) if dtypes else None
+            # quoted values in tableau csv can contain line breaks
+            parse_options = pyarrow.csv.ParseOptions(newlines_in_values=True)
+            return pyarrow.csv.read_csv(server_response.raw, parse_options=parse_options, convert_options=convert_options)
+    import numpy as np
+    dtypes = dtypes or {}
+    columns, typed_batches, raw_values = (), {}, {}
+    for columns, rows in iter_view_data(VERSION, site_id, token, xmlns, view_id, server, filters, batch_size, client):
+        for name, values in zip(columns, zip(*rows)):
+            if name in dtypes:
+                typed_batches.setdefault(name, []).append(_numpy_column(values, dtypes[name]))
+            else:
+                raw_values.setdefault(name, []).extend(values)
+    data = {}
+    for name in columns:
+        if name in dtypes:
+            data[name] = np.concatenate(typed_batches[name]) if name in typed_batches else np.array([], dtype=dtypes[name])
+        else:
+            data[name] = _numpy_column(raw_values.get(name, []))
+    return data
+
+def export_view_data(VERSION, site_id, token, xmlns, view_ids, server, filters=None, directory=None, output='numpy', dtypes=None, max_workers=8, client=None):
+    """
+    reads the data of many views concurrently, at most max_workers at a time. a failed view doesn't stop the others
+    directory: when given, each csv is streamed unparsed to directory/view-id.csv; otherwise each view is read with view_data_columns
+    returns {'data': {view id: path or columns}, 'failed': {view id: error message}}
+    """
+    def export(view_id):
+        try:
+            if directory is None:
+                return view_data_columns(VERSION, site_id, token, xmlns, view_id, server, filters, output, dtypes, client=client), None
+            path = os.path.join(directory, view_id + '.csv')
+            with _open_view_data(VERSION, site_id, token, xmlns, view_id, server, filters, client) as server_response:
+                with open(path + '.part', 'wb') as f:
+                    for chunk in server_response.iter_content(chunk_size=_download_chunk_size):
+                        f.write(chunk)
+            os.replace(path + '.part', path)
+            return path, None
+        except (ApiCallError, requests.RequestException, OSError, ValueError) as error:
+            return None, str(error)
+
+    view_ids = list(view_ids)
+    report = {'data': {}, 'failed': {}}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for view_id, (data, error) in zip(view_ids, executor.map(export, view_ids)):
+            if error is None:
+                report['data'][view_id] = data
+            else:
+                report['failed'][view_id] = error
+    return report
+
 class QueryGroups():
     """
-    performs single API call that returns xml data for groups. xml is parsed using associated methods
+    queries every page of groups on the site (pages after the first are fetched concurrently). xml is parsed using associated methods
+    page_size: groups per API call (max 1000), max_workers: maximum concurrent page requests
+    lookups by name use the first group returned by the server when several share a name
+    records: list of GroupRecord; when given (e.g fetched by tableau_rest_async) no API calls are made
+    cache: see SnapshotCache
+    filter, sort, fields: see Filter
+    response_format: see TableauClient
     """
-    def __init__(self, VERSION, site_id, token, server, xmlns):
+    _records_attribute = 'groups'
+
+    def __init__(self, VERSION, site_id, token, server, xmlns, client=None, page_size=1000, max_workers=8, records=None, cache=None, filter=None, sort=None, fields=None, response_format=None):
         self.VERSION = VERSION
         self.site_id = site_id
         self.server = server
         self.xmlns = xmlns
-        # GET /api/api-version/sites/site-id/groups/
-        url = server + "/api/{0}/sites/{1}/groups".format(VERSION, site_id)
-        # xml_request = 'none'
-        server_response = requests.get(url, headers={'x-tableau-auth': token}, verify=False)
-        _check_status(server_response, 200, xmlns)
-        server_response = _encode_for_display(server_response.text)
-        parsed_response = ET.fromstring(server_response)
-        self.groups = parsed_response.findall('.//t:group', namespaces=xmlns)
+        self.from_cache = False
+        if records is None:
+            # GET /api/api-version/sites/site-id/groups?pageSize=page-size&pageNumber=page-number
+            query = _query_string('groups', filter, sort, _listing_fields(fields))
+            url = server + "/api/{0}/sites/{1}/groups".format(VERSION, site_id) + query
+            records, self.from_cache = _cached_records(cache if not query else False, server, site_id, 'groups', GroupRecord, lambda: _query_all_pages(url, token, xmlns, 'group', GroupRecord, client, page_size, max_workers, response_format))
+        self.groups = list(records)
 
         self.group_names= [group.get('name') for group in self.groups]
         self.group_ids= [group.get('id') for group in self.groups]
+        self._groups_by_name = _index_by(self.groups, 'name')
+        self._groups_by_id = _index_by(self.groups, 'id')
 
     def group_id_from_name(self, group_name):
-        _check_user_input(group_name, self.group_names)
-        if group_name in self.group_names:
-            group_id = [group.get('id') for group in self.groups if group.get('name') == group_name]
-        return group_id[0]
+        _check_user_input(group_name, self._groups_by_name)
+        return self._groups_by_name[group_name].get('id')
 
     def group_name_from_id(self, group_id):
-        _check_user_input(group_id, self.group_ids)
-        if group_id in self.group_ids:
-            group_name = [group.get('name') for group in self.groups if group.get('id') == group_id]
-        return group_name[0]
+        _check_user_input(group_id, self._groups_by_id)
+        return self._groups_by_id[group_id].get('name')
 
 
+    def ids_from_names(self, group_names):
+        """
+        returns a list of group ids for a list of group names (same order), resolved in one pass
+        """
+        return _bulk_lookup(self._groups_by_name, group_names, 'id')
+
+    def names_from_ids(self, group_ids):
+        """
+        returns a list of group names for a list of group ids (same order), resolved in one pass
+        """
+        return _bulk_lookup(self._groups_by_id, group_ids, 'name')
+
+def iter_groups(VERSION, site_id, token, server, xmlns, client=None, page_size=1000, filter=None, sort=None, fields=None, response_format=None):
+    """
+    yields a GroupRecord for every group on the site, one at a time. pages are requested one after another and parsed
+    incrementally, so memory stays flat regardless of site size (use QueryGroups when you need lookups across all groups)
+    filter, sort, fields: see Filter
+    response_format: see TableauClient
+    """
+    # GET /api/api-version/sites/site-id/groups?pageSize=page-size&pageNumber=page-number
+    url = server + "/api/{0}/sites/{1}/groups".format(VERSION, site_id) + _query_string('groups', filter, sort, fields)
+    return _iter_records(GroupRecord, url, token, xmlns, 'group', client, page_size, response_format)
+
 class QueryUsers():
     """
-    performs single API call that returns xml data for users. xml is parsed using associated methods
+    queries every page of users on the site (pages after the first are fetched concurrently). xml is parsed using associated methods
+    page_size: users per API call (max 1000), max_workers: maximum concurrent page requests
+    lookups by name use the first user returned by the server when several share a name
+    records: list of UserRecord; when given (e.g fetched by tableau_rest_async) no API calls are made
+    cache: see SnapshotCache
+    filter, sort, fields: see Filter
+    response_format: see TableauClient
     """
-    def __init__(self, VERSION, site_id, token, server, xmlns):
+    _records_attribute = 'users'
+
+    def __init__(self, VERSION, site_id, token, server, xmlns, client=None, page_size=1000, max_workers=8, records=None, cache=None, filter=None, sort=None, fields=None, response_format=None):
         self.VERSION = VERSION
         self.site_id = site_id
         self.server = server
         self.xmlns = xmlns
-        # GET /api/api-version/sites/site-id/users
-        ## if pagniation needed, use the url below. Defualt is 100
-        #GET /api/api-version/sites/site-id/users?pageSize=page-size&pageNumber=page-number
-        url = server + "/api/{0}/sites/{1}/users?pageSize=200".format(VERSION, site_id)
-        # xml_request = 'none'
-        server_response = requests.get(url, headers={'x-tableau-auth': token}, verify=False)
-        _check_status(server_response, 200, xmlns)
-        server_response = _encode_for_display(server_response.text)
-        parsed_response = ET.fromstring(server_response)
-        self.users = parsed_response.findall('.//t:user', namespaces=xmlns)
+        self.client = client
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.response_format = response_format
+        self._cache = cache
+        self.from_cache = False
+        # GET /api/api-version/sites/site-id/users?pageSize=page-size&pageNumber=page-number
+        self._url = server + "/api/{0}/sites/{1}/users".format(VERSION, site_id)
+        self.filter = filter
+        self.sort = sort
+        self.fields = _listing_fields(fields)
+        query = _query_string('users', filter, sort, self.fields)
+        if records is None:
+            records, self.from_cache = _cached_records(cache if not query else False, server, site_id, 'users', UserRecord, lambda: _query_all_pages(self._url + query, token, xmlns, 'user', UserRecord, client, page_size, max_workers, self.response_format))
+        self.users = list(records)
+        self._set_records()
+
+    def _set_records(self):
         self.user_names= [user.get('name') for user in self.users]
         self.user_ids= [user.get('id') for user in self.users]
+        self._users_by_name = _index_by(self.users, 'name')
+        self._users_by_id = _index_by(self.users, 'id')
+
+    def refresh(self, token):
+        """
+        updates the users in place with only the users who signed in since the newest lastLogin already held, plus an id-only
+        listing to find deleted users. new users (who usually haven't signed in yet) are read one by one
+        users have no updatedAt, so changes to the name or site role of a user who hasn't signed in since are not picked up
+        returns {'added': [user ids], 'updated': [user ids], 'deleted': [user ids]}
+        """
+        if self.fields:
+            raise ValueError("refresh needs complete records; create the object without fields")
+        def fetch_missing(user_ids):
+            # GET /api/api-version/sites/site-id/users/user-id
+            def fetch(user_id):
+                response_format = _client_response_format(self.client, self.response_format)
+                server_response = _get_client(self.client).get(self._url + "/" + user_id, token, headers=_format_headers(response_format))
+                _check_status(server_response, 200, self.xmlns)
+                return _response_records(server_response, self.xmlns, 'user', UserRecord, response_format)[0][0]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                return list(executor.map(fetch, user_ids))
+
+        self.users[:], report = _refresh_records(self.users, self._url, token, self.xmlns, 'users', 'user', UserRecord, 'lastLogin', self.client, self.page_size, self.max_workers, fetch_missing, self.filter, self.sort, self.response_format)
+        self._set_records()
+        if not self.filter and not self.sort:
+            _store_snapshot(self._cache, self.server, self.site_id, 'users', self.users)
+        return report
 
     def user_id_from_name(self, user_name):
-        _check_user_input(user_name, self.user_names)
-        if user_name in self.user_names:
-            user_id = [user.get('id') for user in self.users if user.get('name') == user_name]
-        return user_id[0]
+        _check_user_input(user_name, self._users_by_name)
+        return self._users_by_name[user_name].get('id')
 
     def user_name_from_id(self, user_id):
-        _check_user_input(user_id, self.user_ids)
-        if user_id in self.user_ids:
-            user_name = [user.get('name') for user in self.users if user.get('id') == user_id]
-            return user_name[0]
+        _check_user_input(user_id, self._users_by_id)
+        return self._users_by_id[user_id].get('name')
     
+    def ids_from_names(self, user_names):
+        """
+        returns a list of user ids for a list of user names (same order), resolved in one pass
+        """
+        return _bulk_lookup(self._users_by_name, user_names, 'id')
+
+    def names_from_ids(self, user_ids):
+        """
+        returns a list of user names for a list of user ids (same order), resolved in one pass
+        """
+        return _bulk_lookup(self._users_by_id, user_ids, 'name')
+
     def user_siterole_from_name(self, user_name):
-        _check_user_input(user_name, self.user_names)
-        if user_name in self.user_names:
-            user_siterole = [user.get('siteRole') for user in self.users if user.get('name') == user_name]
-            return user_siterole[0]
+        _check_user_input(user_name, self._users_by_name)
+        return self._users_by_name[user_name].get('siteRole')
 
     def user_lastlogin_from_name(self, user_name):
-        _check_user_input(user_name, self.user_names)
-        if user_name in self.user_names:
-            user_lastlogin = [user.get('lastLogin') for user in self.users if user.get('name') == user_name]
-            return user_lastlogin[0]
+        _check_user_input(user_name, self._users_by_name)
+        return self._users_by_name[user_name].get('lastLogin')
 
     def user_exauthid_from_name(self, user_name):
-        _check_user_input(user_name, self.user_names)
-        if user_name in self.user_names:
-            user_exauthid = [user.get('externalAuthUserId') for user in self.users if user.get('name') == user_name]
-            return user_exauthid[0]
+        _check_user_input(user_name, self._users_by_name)
+        return self._users_by_name[user_name].get('externalAuthUserId')
 
     def user_langcode_from_name(self, user_name):
-        _check_user_input(user_name, self.user_names)
-        if user_name in self.user_names:
-            user_langcode = [user.get('language') for user in self.users if user.get('name') == user_name]
-            return user_langcode[0]
+        _check_user_input(user_name, self._users_by_name)
+        return self._users_by_name[user_name].get('language')
 
     def user_localecode_from_name(self, user_name):
-        _check_user_input(user_name, self.user_names)
-        if user_name in self.user_names:
-            user_localecode = [user.get('locale') for user in self.users if user.get('name') == user_name]
-            return user_localecode[0]
+        _check_user_input(user_name, self._users_by_name)
+        return self._users_by_name[user_name].get('locale')
 
-def users_in_group(VERSION, site_id, token, group_id, server, xmlns):
-    #GET /api/api-version/sites/site-id/groups/group-id/users
+def iter_users(VERSION, site_id, token, server, xmlns, client=None, page_size=1000, filter=None, sort=None, fields=None, response_format=None):
+    """
+    yields a UserRecord for every user on the site, one at a time. pages are requested one after another and parsed
+    incrementally, so memory stays flat regardless of site size (use QueryUsers when you need lookups across all users)
+    filter, sort, fields: see Filter
+    response_format: see TableauClient
+    """
+    # GET /api/api-version/sites/site-id/users?pageSize=page-size&pageNumber=page-number
+    url = server + "/api/{0}/sites/{1}/users".format(VERSION, site_id) + _query_string('users', filter, sort, fields)
+    return _iter_records(UserRecord, url, token, xmlns, 'user', client, page_size, response_format)
+
+def _query_group_users(VERSION, site_id, token, group_id, server, xmlns, client=None, page_size=1000, max_workers=8):
+    # GET /api/api-version/sites/site-id/groups/group-id/users?pageSize=page-size&pageNumber=page-number
     url = server + "/api/{0}/sites/{1}/groups/{2}/users".format(VERSION, site_id, group_id)
-    # xml_request = 'none'
-    server_response = requests.get(url, headers={'x-tableau-auth': token}, verify=False)
-    _check_status(server_response, 200, xmlns)
-    server_response = _encode_for_display(server_response.text)
-    parsed_response = ET.fromstring(server_response)
-    users = parsed_response.findall('.//t:user', namespaces=xmlns)
-    group_users=[]
-    for user in users:
-        group_users.append(user.get('name'))
-    return group_users
-
-def groups_for_user(VERSION, site_id, token, user_id, server, xmlns):
-    # GET /api/api-version/sites/site-id/users/user-id/groups
+    return _query_all_pages(url, token, xmlns, 'user', UserRecord, client, page_size, max_workers)
+
+def users_in_group(VERSION, site_id, token, group_id, server, xmlns, client=None):
+    # returns the names of every user in the group (all pages)
+    return [user.name for user in _query_group_users(VERSION, site_id, token, group_id, server, xmlns, client)]
+
+def user_ids_in_group(VERSION, site_id, token, group_id, server, xmlns, client=None):
+    # returns the ids of every user in the group (all pages)
+    return [user.id for user in _query_group_users(VERSION, site_id, token, group_id, server, xmlns, client)]
+
+def groups_for_user(VERSION, site_id, token, user_id, server, xmlns, client=None):
+    # returns the names of the user's groups (all pages), excluding All Users
+    # GET /api/api-version/sites/site-id/users/user-id/groups?pageSize=page-size&pageNumber=page-number
     url = server + "/api/{0}/sites/{1}/users/{2}/groups".format(VERSION, site_id, user_id)
-    # # xml_request = 'none'
-    server_response = requests.get(url, headers={'x-tableau-auth': token}, verify=False)
-    _check_status(server_response, 200, xmlns)
-    server_response = _encode_for_display(server_response.text)
-    parsed_response = ET.fromstring(server_response)
-    groups = parsed_response.findall('.//t:group', namespaces=xmlns)
+    groups = _query_all_pages(url, token, xmlns, 'group', GroupRecord, client)
     user_groups=[]
     for group in groups:
         if group.get('name') != 'All Users':
             user_groups.append(group.get('name'))
     return user_groups
 
-def add_group(VERSION, site_id, token, server, xmlns, group_name, min_site_role = 'Viewer'):
+def _post_group(VERSION, site_id, token, server, xmlns, group_name, min_site_role='Viewer', client=None):
     # POST /api/api-version/sites/site-id/groups
     url = server + "/api/{0}/sites/{1}/groups".format(VERSION, site_id)
     xml_request = ET.Element('tsRequest')
     group_element = ET.SubElement(xml_request, 'group', name=group_name, minimumSiteRole=min_site_role)
     xml_request=ET.tostring(xml_request)
-    server_response = requests.post(url, data=xml_request, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).post(url, token, data=xml_request)
     _check_status(server_response, 201, xmlns)
-    server_response = _encode_for_display(server_response.text)
-    parsed_response = ET.fromstring(server_response)
+    _invalidate_snapshots(server, site_id, 'groups')
+    return server_response
+
+def add_group(VERSION, site_id, token, server, xmlns, group_name, min_site_role = 'Viewer', client=None):
+    server_response = _post_group(VERSION, site_id, token, server, xmlns, group_name, min_site_role, client)
+    parsed_response = _parse_xml(server_response.content)
     new_group = parsed_response.findall('.//t:group', namespaces=xmlns)
     for x in new_group:
         group_name= x.get('name')
         group_id= x.get('id')
         minsiterole= x.get('minimumSiteRole')
-        print(group_name, group_id, minsiterole) 
+        print(_encode_for_display(group_name), group_id, minsiterole) 
     return group_name, group_id, minsiterole
 
-def add_user(VERSION, site_id, token, server, xmlns, user_name, site_role):
+def _post_user(VERSION, site_id, token, server, xmlns, user_name, site_role, client=None):
     # POST /api/api-version/sites/site-id/users
     url = server + "/api/{0}/sites/{1}/users".format(VERSION, site_id)
     xml_request = ET.Element('tsRequest')
     user_element = ET.SubElement(xml_request, 'user', name=user_name, siteRole=site_role)
     xml_request=ET.tostring(xml_request)
-    server_response = requests.post(url, data=xml_request, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).post(url, token, data=xml_request)
     _check_status(server_response, 201, xmlns)
-    server_response = _encode_for_display(server_response.text)
-    parsed_response = ET.fromstring(server_response)
+    _invalidate_snapshots(server, site_id, 'users')
+    return server_response
+
+def add_user(VERSION, site_id, token, server, xmlns, user_name, site_role, client=None):
+    server_response = _post_user(VERSION, site_id, token, server, xmlns, user_name, site_role, client)
+    parsed_response = _parse_xml(server_response.content)
     new_user = parsed_response.findall('.//t:user', namespaces=xmlns)
     for x in new_user:
         user_name= x.get('name')
         site_role= x.get('SiteRole')
-        print(user_name, site_role) 
+        print(_encode_for_display(user_name), site_role) 
     return user_name, site_role
     
-def add_user_to_group(VERSION, site_id, token, server, xmlns, group_id, user_id):
+def _post_user_to_group(VERSION, site_id, token, server, xmlns, group_id, user_id, client=None):
     # /api/api-version/sites/site-id/groups/group-id/users
     url = server + "/api/{0}/sites/{1}/groups/{2}/users".format(VERSION, site_id, group_id)
     xml_request = ET.Element('tsRequest')
     user_element = ET.SubElement(xml_request, 'user', id=user_id)
     xml_request=ET.tostring(xml_request)
-    server_response = requests.post(url, data=xml_request, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).post(url, token, data=xml_request)
     _check_status(server_response, 200, xmlns)
-    server_response = _encode_for_display(server_response.text)
-    parsed_response = ET.fromstring(server_response)
+    return server_response
+
+def add_user_to_group(VERSION, site_id, token, server, xmlns, group_id, user_id, client=None):
+    server_response = _post_user_to_group(VERSION, site_id, token, server, xmlns, group_id, user_id, client)
+    parsed_response = _parse_xml(server_response.content)
     new_user = parsed_response.findall('.//t:user', namespaces=xmlns)
     for x in new_user:
         user_name= x.get('name')
         user_id= x.get('id')
-        print(user_name, user_id) 
+        print(_encode_for_display(user_name), user_id) 
     return user_name, user_id
 
-def create_project(VERSION, site_id, token, server, xmlns, in_project_name, in_description, in_contentpermissions= 'LockedToProject'):
+def _post_project(VERSION, site_id, token, server, xmlns, project_name, description, content_permissions='LockedToProject', parent_project_id=None, client=None):
     # POST /api/api-version/sites/site-id/projects
     url = server + "/api/{0}/sites/{1}/projects".format(VERSION, site_id)
     xml_request = ET.Element('tsRequest')
-    project_element = ET.SubElement(xml_request, 'project', name = in_project_name, description = in_description, contentPermissions = in_contentpermissions)
+    project_element = ET.SubElement(xml_request, 'project', name = project_name, description = description, contentPermissions = content_permissions)
+    if parent_project_id is not None:
+        project_element.set('parentProjectId', parent_project_id)
     xml_request=ET.tostring(xml_request)
-    server_response = requests.post(url, data=xml_request, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).post(url, token, data=xml_request)
     _check_status(server_response, 201, xmlns)
-    server_response = _encode_for_display(server_response.text)
-    parsed_response = ET.fromstring(server_response)
+    _invalidate_snapshots(server, site_id, 'projects')
+    return server_response
+
+def create_project(VERSION, site_id, token, server, xmlns, in_project_name, in_description, in_contentpermissions= 'LockedToProject', client=None):
+    server_response = _post_project(VERSION, site_id, token, server, xmlns, in_project_name, in_description, in_contentpermissions, client=client)
+    parsed_response = _parse_xml(server_response.content)
     new_project = parsed_response.findall('.//t:project', namespaces=xmlns)
     for x in new_project:
         id= x.get('id')
@@ -461,25 +2136,25 @@ def create_project(VERSION, site_id, token, server, xmlns, in_project_name, in_d
         new_description= x.get('description')
         new_contentpermissions= x.get('contentPermissions')
         controlling_perm_projectid= x.get('controllingPermissionsProjectId')
-    print(id, parent_project_id, new_project_name, new_description, new_contentpermissions, controlling_perm_projectid)
+    print(id, parent_project_id, _encode_for_display(new_project_name), _encode_for_display(new_description or ''), new_contentpermissions, controlling_perm_projectid)
 
-def update_project_name(VERSION, site_id, token, server, xmlns, project_id, new_proj_name):
+def update_project_name(VERSION, site_id, token, server, xmlns, project_id, new_proj_name, client=None):
     # PUT /api/api-version/sites/site-id/projects/project-id
     url = server + "/api/{0}/sites/{1}/projects/{2}".format(VERSION, site_id, project_id)
     xml_request = ET.Element('tsRequest')
     #project_element = ET.SubElement(xml_request, 'project', contentPermissions = new_content_permissions, parentProjectId = parent_proj_id, name = new_proj_name, description = new_description)
     project_element = ET.SubElement(xml_request, 'project', name = new_proj_name)
     xml_request=ET.tostring(xml_request)
-    server_response = requests.put(url, data=xml_request, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).put(url, token, data=xml_request)
     _check_status(server_response, 200, xmlns)
+    _invalidate_snapshots(server, site_id, 'projects', 'workbooks')
     print(server_response.status_code)
-    server_response = _encode_for_display(server_response.text)
-    parsed_response = ET.fromstring(server_response)
+    parsed_response = _parse_xml(server_response.content)
     new_project = parsed_response.findall('.//t:project', namespaces=xmlns)
     updated_name=  new_project.get('name')
-    print(updated_name + " updated")
+    print(_encode_for_display(updated_name) + " updated")
 
-def update_project_contentpermissions(VERSION, site_id, token, project_id, server, xmlns, new_content_permissions):
+def update_project_contentpermissions(VERSION, site_id, token, project_id, server, xmlns, new_content_permissions, client=None):
     # PUT /api/api-version/sites/site-id/projects/project-id
     if new_content_permissions not in {"LockedToProject", "ManagedByOwner", "LockedToProjectWithoutNested"}:
         raise ValueError("invalid argument content permissions: must be LockedToProject, ManagedByOwner, or LockedToProjectWithoutNested")
@@ -488,63 +2163,408 @@ def update_project_contentpermissions(VERSION, site_id, token, project_id, serve
     #project_element = ET.SubElement(xml_request, 'project', contentPermissions = new_content_permissions, parentProjectId = parent_proj_id, name = new_proj_name, description = new_description)
     project_element = ET.SubElement(xml_request, 'project', contentPermissions = new_content_permissions)
     xml_request=ET.tostring(xml_request)
-    server_response = requests.put(url, data=xml_request, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).put(url, token, data=xml_request)
     _check_status(server_response, 200, xmlns)
-    server_response = _encode_for_display(server_response.text)
-    parsed_response = ET.fromstring(server_response)
+    _invalidate_snapshots(server, site_id, 'projects')
+    parsed_response = _parse_xml(server_response.content)
     new_project = parsed_response.findall('.//t:project', namespaces=xmlns)
     for x in new_project:
         updated_contentpermissions = x.get('contentPermissions')
     print(" updated to " + updated_contentpermissions)
 
-def delete_project(VERSION, site_id, token, server, xmlns, project_id): 
+def delete_project(VERSION, site_id, token, server, xmlns, project_id, client=None):
     # DELETE /api/api-version/sites/site-id/projects/project-id
     url = server + "/api/{0}/sites/{1}/projects/{2}".format(VERSION, site_id, project_id)
     # xml_request = none
-    server_response = requests.delete(url, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).delete(url, token)
     _check_status(server_response, 204, xmlns)
-    server_response = _encode_for_display(server_response.text)
+    # the project's workbooks and their views are deleted with it
+    _invalidate_snapshots(server, site_id, 'projects', 'workbooks', 'views')
 
-def delete_group(VERSION, site_id, token, server, xmlns, group_id): 
+def delete_group(VERSION, site_id, token, server, xmlns, group_id, client=None):
     # DELETE /api/api-version/sites/site-id/groups/group-id
     url = server + "/api/{0}/sites/{1}/groups/{2}".format(VERSION, site_id, group_id)
     # xml_request = none
-    server_response = requests.delete(url, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).delete(url, token)
     _check_status(server_response, 204, xmlns)
-    server_response = _encode_for_display(server_response.text)
+    _invalidate_snapshots(server, site_id, 'groups')
 
-def delete_user(VERSION, site_id, token, server, xmlns, user_id): 
+def delete_user(VERSION, site_id, token, server, xmlns, user_id, client=None):
     # DELETE /api/api-version/sites/site-id/users/user-id
     url = server + "/api/{0}/sites/{1}/users/{2}".format(VERSION, site_id, user_id)
     # xml_request = none
-    server_response = requests.delete(url, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).delete(url, token)
     _check_status(server_response, 204, xmlns)
-    server_response = _encode_for_display(server_response.text)
+    _invalidate_snapshots(server, site_id, 'users')
 
-def remove_user_from_group(VERSION, site_id, token, server, xmlns, group_id, user_id): 
+def remove_user_from_group(VERSION, site_id, token, server, xmlns, group_id, user_id, client=None):
     # DELETE /api/api-version/sites/site-id/groups/group-id/users/user-id
     url = server + "/api/{0}/sites/{1}/groups/{2}/users/{3}".format(VERSION, site_id, group_id, user_id)
     # xml_request = none
-    server_response = requests.delete(url, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).delete(url, token)
     _check_status(server_response, 204, xmlns)
-    server_response = _encode_for_display(server_response.text)
 
-def update_user(VERSION, site_id, token, server, xmlns, user_id, new_name, new_email, new_password, new_siterole):
+def update_user(VERSION, site_id, token, server, xmlns, user_id, new_name, new_email, new_password, new_siterole, client=None):
     # PUT /api/api-version/sites/site-id/users/user-id
     url = server + "/api/{0}/sites/{1}/users/{2}".format(VERSION, site_id, user_id)
     xml_request = ET.Element('tsRequest')
     user_element = ET.SubElement(xml_request, 'user', fullName = new_name, email = new_email, password = new_password, siteRole = new_siterole)  
     xml_request=ET.tostring(xml_request)
-    server_response = requests.put(url, data=xml_request, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).put(url, token, data=xml_request)
     _check_status(server_response, 200, xmlns)
+    _invalidate_snapshots(server, site_id, 'users')
+
+class MembershipGraph():
+    """
+    site-wide user <-> group membership index, built with one paginated members read per group
+    (G calls instead of one groups_for_user call per user). groups are read concurrently, at most max_workers at a time
+    group_ids: the groups to read, by default every group from QueryGroups (including All Users)
+    user_groups: dictionary of user id -> set of group ids
+    group_users: dictionary of group id -> set of user ids
+    group_names / user_names: dictionaries of id -> name
+    save the graph with save(path) and reuse it in a later job with MembershipGraph.load(path)
+    """
+    def __init__(self, VERSION, site_id, token, server, xmlns, group_ids=None, max_workers=8, client=None):
+        self.VERSION = VERSION
+        self.site_id = site_id
+        if group_ids is None:
+            groups = QueryGroups(VERSION, site_id, token, server, xmlns, client, max_workers=max_workers).groups
+        else:
+            groups = [GroupRecord(group_id, None, None, None) for group_id in group_ids]
+        # each group's pages are read one after another so at most max_workers requests are in flight overall
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            members = executor.map(lambda group: _query_group_users(VERSION, site_id, token, group.id, server, xmlns, client, max_workers=1), groups)
+            self._build({group.id: (group.name, group_members) for group, group_members in zip(groups, members)})
+
+    def _build(self, groups):
+        # groups: dictionary of group id -> (group name, list of UserRecord or (user id, user name) pairs)
+        self.group_names = {}
+        self.user_names = {}
+        self.group_users = {}
+        self.user_groups = {}
+        for group_id, (group_name, group_members) in groups.items():
+            self.group_names[group_id] = group_name
+            self.group_users[group_id] = set()
+            for member in group_members:
+                # UserRecord and (id, name) pairs both start with id, name
+                user_id, user_name = member[0], member[1]
+                self.user_names[user_id] = user_name
+                self.group_users[group_id].add(user_id)
+                self.user_groups.setdefault(user_id, set()).add(group_id)
+
+    def groups_for_user(self, user_id):
+        # returns the set of group ids the user belongs to
+        _check_user_input(user_id, self.user_groups)
+        return set(self.user_groups[user_id])
+
+    def users_in_group(self, group_id):
+        # returns the set of user ids in the group
+        _check_user_input(group_id, self.group_users)
+        return set(self.group_users[group_id])
+
+    def users_in_any(self, group_ids):
+        # returns the user ids in at least one of the groups
+        return set().union(*[self.users_in_group(group_id) for group_id in group_ids])
+
+    def users_in_all(self, group_ids):
+        # returns the user ids in every one of the groups
+        user_sets = [self.users_in_group(group_id) for group_id in group_ids]
+        return set.intersection(*user_sets) if user_sets else set()
+
+    def users_in_a_not_b(self, group_id_a, group_id_b):
+        # returns the user ids in group a that are not in group b
+        return self.users_in_group(group_id_a) - self.users_in_group(group_id_b)
+
+    def to_dict(self):
+        return {'site_id': self.site_id,
+                'groups': {group_id: {'name': self.group_names[group_id], 'users': sorted(user_ids)} for group_id, user_ids in self.group_users.items()},
+                'users': self.user_names}
+
+    def save(self, path):
+        # writes the graph to a json file
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def from_dict(cls, data):
+        graph = cls.__new__(cls)
+        graph.VERSION = None
+        graph.site_id = data.get('site_id')
+        user_names = data['users']
+        graph._build({group_id: (group['name'], [(user_id, user_names.get(user_id)) for user_id in group['users']]) for group_id, group in data['groups'].items()})
+        return graph
+
+    @classmethod
+    def load(cls, path):
+        # reads a graph written by save()
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+class _RateLimiter():
+    """
+    spaces out calls so that at most calls_per_second start each second; shared safely between threads
+    """
+    def __init__(self, calls_per_second):
+        self.interval = 1.0 / calls_per_second
+        self.next_call = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+def sync_groups_members(VERSION, site_id, token, server, xmlns, desired_members, max_workers=8, calls_per_second=None, dry_run=False, client=None):
+    """
+    makes the membership of several groups match desired_members, a dictionary of group id -> list of user ids
+    each group's current members are read once (all pages, groups read concurrently), then every add and remove
+    across all groups goes through one pool of at most max_workers concurrent requests, started no faster than
+    calls_per_second (no limit when None). nothing is printed per call and a failed call doesn't stop the others
+    dry_run: work out the changes without sending them
+    returns a dictionary of group id -> report, each report is
+    {'add': [user ids], 'remove': [user ids], 'unchanged': count, 'failed': {user id: error message}, 'dry_run': dry_run}
+    users in add/remove that are not in failed were added/removed
+    """
+    group_ids = list(desired_members.keys())
+    # each group's pages are read one after another, so max_workers caps the reads in flight across all groups
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        member_lists = executor.map(lambda group_id: _query_group_users(VERSION, site_id, token, group_id, server, xmlns, client, max_workers=1), group_ids)
+        current_members = {group_id: {user.id for user in members} for group_id, members in zip(group_ids, member_lists)}
+    reports = {}
+    changes = []
+    for group_id in group_ids:
+        desired = set(desired_members[group_id])
+        additions = sorted(desired - current_members[group_id])
+        removals = sorted(current_members[group_id] - desired)
+        reports[group_id] = {'add': additions, 'remove': removals, 'unchanged': len(desired & current_members[group_id]), 'failed': {}, 'dry_run': dry_run}
+        changes.extend((group_id, 'add', user_id) for user_id in additions)
+        changes.extend((group_id, 'remove', user_id) for user_id in removals)
+    if dry_run or not changes:
+        return reports
+    rate_limiter = _RateLimiter(calls_per_second) if calls_per_second else None
+
+    def apply_change(change):
+        group_id, action, user_id = change
+        if rate_limiter is not None:
+            rate_limiter.wait()
+        try:
+            if action == 'add':
+                _post_user_to_group(VERSION, site_id, token, server, xmlns, group_id, user_id, client)
+            else:
+                remove_user_from_group(VERSION, site_id, token, server, xmlns, group_id, user_id, client)
+        except (ApiCallError, requests.RequestException) as error:
+            return str(error)
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for (group_id, action, user_id), error in zip(changes, executor.map(apply_change, changes)):
+            if error is not None:
+                reports[group_id]['failed'][user_id] = error
+    return reports
+
+def sync_group_members(VERSION, site_id, token, server, xmlns, group_id, desired_user_ids, max_workers=8, calls_per_second=None, dry_run=False, client=None):
+    """
+    makes the membership of one group match desired_user_ids (list of user ids), see sync_groups_members
+    returns {'add': [user ids], 'remove': [user ids], 'unchanged': count, 'failed': {user id: error message}, 'dry_run': dry_run}
+    """
+    return sync_groups_members(VERSION, site_id, token, server, xmlns, {group_id: desired_user_ids}, max_workers, calls_per_second, dry_run, client)[group_id]
 
 from collections import defaultdict
 
 def nested_dict():
    return defaultdict(nested_dict)
 
+# permissions content types, in the order they are queried
+_permissions_objects = ("project", "workbook", "datasource", "flow", "metric")
+
+def _permissions_url(VERSION, site_id, server, project_id, permissions_obj):
+    if permissions_obj == "project":
+        #  /api/api-version/sites/site-id/projects/project-id/permissions
+        return server + "/api/{0}/sites/{1}/projects/{2}/permissions".format(VERSION, site_id, project_id)
+    #  /api/api-version/sites/site-id/projects/project-id/default-permissions/{permissions_obj}s
+    return server + "/api/{0}/sites/{1}/projects/{2}/default-permissions/{3}s".format(VERSION, site_id, project_id, permissions_obj)
+
+def _permission_delete_url(VERSION, site_id, server, project_id, permissions_obj, deletion):
+    # deletion: (users_or_groups, grantee id, capability name, capability mode)
+    # DELETE /api/api-version/sites/site-id/projects/project-id/permissions/users/user-id/capability-name/capability-mode
+    # DELETE /api/api-version/sites/site-id/projects/project-id/default-permissions/workbooks/groups/group-id/capability-name/capability-mode
+    return _permissions_url(VERSION, site_id, server, project_id, permissions_obj) + "/{0}/{1}/{2}/{3}".format(*deletion)
+
+def _permissions_request(perm_dict, permissions_obj):
+    """
+    builds the xml request body granting every permissions_obj capability in perm_dict
+    """
+    xml_request = ET.Element('tsRequest')
+    permissions_element= ET.SubElement(xml_request, 'permissions')
+    if "users" in perm_dict.keys():
+        for user_id in perm_dict['users'].keys():
+            grantee_element= ET.SubElement(permissions_element, 'granteeCapabilities')
+            user_element = ET.SubElement(grantee_element, 'user', id=user_id)
+            capabilities_element= ET.SubElement(grantee_element, 'capabilities')
+            for cap_name in perm_dict['users'][user_id][permissions_obj].keys():
+                ET.SubElement(capabilities_element, 'capability', name=cap_name, mode=perm_dict['users'][user_id][permissions_obj][cap_name])
+    if "groups" in perm_dict.keys():
+        for group_id in perm_dict['groups'].keys():
+            grantee_element= ET.SubElement(permissions_element, 'granteeCapabilities')
+            group_element = ET.SubElement(grantee_element, 'group', id=group_id)
+            capabilities_element= ET.SubElement(grantee_element, 'capabilities')
+            for cap_name in perm_dict['groups'][group_id][permissions_obj].keys():
+                ET.SubElement(capabilities_element, 'capability', name=cap_name, mode=perm_dict['groups'][group_id][permissions_obj][cap_name])
+    return ET.tostring(xml_request)
+
+def _query_permission_grants(VERSION, site_id, token, server, xmlns, project_id, permissions_obj, client=None, response_format=None):
+    """
+    queries the project permissions (permissions_obj 'project') or one type of default permissions for a project
+    returns a list of (users_or_groups, grantee id, permissions_obj, capability name, capability mode) tuples
+    """
+    #  GET /api/api-version/sites/site-id/projects/project-id/permissions
+    #  GET /api/api-version/sites/site-id/projects/project-id/default-permissions/{permissions_obj}s
+    url = _permissions_url(VERSION, site_id, server, project_id, permissions_obj)
+    # xml_request = 'none'
+    response_format = _client_response_format(client, response_format)
+    server_response = _get_client(client).get(url, token, headers=_format_headers(response_format))
+    _check_status(server_response, 200, xmlns)
+    with _parse_timer(client, 'GET', url):
+        return _response_permission_grants(server_response, xmlns, permissions_obj, response_format)
+
+def _response_permission_grants(server_response, xmlns, permissions_obj, response_format='xml'):
+    if response_format == 'json':
+        return _json_permission_grants(json.loads(server_response.content), permissions_obj)
+    return _parse_permission_grants(_parse_xml(server_response.content), xmlns, permissions_obj)
+
+def _parse_permission_grants(parsed_response, xmlns, permissions_obj):
+    grants = []
+    namespace = '{' + xmlns['t'] + '}'
+    for gr_cap in parsed_response.iter(namespace + 'granteeCapabilities'):
+        capabilities = list(gr_cap.iter(namespace + 'capability'))
+        for users_or_groups, grantee_tag in (('users', namespace + 'user'), ('groups', namespace + 'group')):
+            for grantee in gr_cap.iter(grantee_tag):
+                for cap in capabilities:
+                    grants.append((users_or_groups, grantee.get("id"), permissions_obj, cap.get('name'), cap.get('mode')))
+    return grants
+
+def _json_permission_grants(parsed_response, permissions_obj):
+    # {"permissions": {"granteeCapabilities": [{"user": {"id": ...}, "capabilities": {"capability": [{"name": ..., "mode": ...}]}}]}}
+    grants = []
+    for gr_cap in _json_list((parsed_response.get('permissions') or {}).get('granteeCapabilities')):
+        capabilities = _json_list((gr_cap.get('capabilities') or {}).get('capability'))
+        for users_or_groups, grantee_key in (('users', 'user'), ('groups', 'group')):
+            if grantee_key in gr_cap:
+                for cap in capabilities:
+                    grants.append((users_or_groups, gr_cap[grantee_key].get('id'), permissions_obj, cap.get('name'), cap.get('mode')))
+    return grants
+
+# capabilities documented for each permissions content type. every (content type, capability, mode) gets a fixed bit
+# in this order; capabilities the server returns that aren't listed here (e.g for metrics) get the next free bit
+_capability_names = {
+    "project": ('Read', 'Write'),
+    "workbook": ('AddComment', 'ChangeHierarchy', 'ChangePermissions', 'Delete', 'ExportData', 'ExportImage', 'ExportXml', 'Filter', 'Read', 'ShareView', 'ViewComments', 'ViewUnderlyingData', 'WebAuthoring', 'Write'),
+    "datasource": ('ChangePermissions', 'Connect', 'Delete', 'ExportXml', 'Read', 'Write'),
+    "flow": ('ChangeHierarchy', 'ChangePermissions', 'Delete', 'Execute', 'ExportXml', 'Read', 'Write'),
+    "metric": ('View',),
+}
+_permission_bits = {(permissions_obj, cap_name, cap_mode): None for permissions_obj in _permissions_objects for cap_name in _capability_names[permissions_obj] for cap_mode in ('Allow', 'Deny')}
+_permission_bits = {key: position for position, key in enumerate(_permission_bits)}
+_permission_bits_lock = threading.Lock()
+
+def _permission_bit(permissions_obj, cap_name, cap_mode):
+    key = (permissions_obj, cap_name, cap_mode)
+    if key not in _permission_bits:
+        with _permission_bits_lock:
+            _permission_bits.setdefault(key, len(_permission_bits))
+    return _permission_bits[key]
+
+class PermissionMatrix():
+    """
+    bitset encoding of permissions grants. every (content type, capability, mode) combination is one bit and each
+    user or group is a row holding a single integer mask, so questions about the grants are answered with one
+    integer operation per grantee instead of walking nested dictionaries. the bit layout is shared by every matrix,
+    so masks can be reused across projects
+    rows: {'users': {user id: mask}, 'groups': {group id: mask}}
+    for example, all groups with Deny on any workbook capability:
+        matrix.grantees_with_any(matrix.mask("workbook", cap_mode="Deny"), "groups")
+    """
+    def __init__(self, grants=()):
+        self.rows = {'users': {}, 'groups': {}}
+        for grant in grants:
+            self.add(*grant)
+
+    def add(self, users_or_groups, grantee_id, permissions_obj, cap_name, cap_mode):
+        grantee_rows = self.rows[users_or_groups]
+        # a capability has one mode per grantee, so a new mode replaces the other one
+        for mode in ('Allow', 'Deny'):
+            if mode != cap_mode and (permissions_obj, cap_name, mode) in _permission_bits:
+                grantee_rows[grantee_id] = grantee_rows.get(grantee_id, 0) & ~(1 << _permission_bits[(permissions_obj, cap_name, mode)])
+        grantee_rows[grantee_id] = grantee_rows.get(grantee_id, 0) | (1 << _permission_bit(permissions_obj, cap_name, cap_mode))
+
+    def mask(self, permissions_obj=None, cap_names=None, cap_mode=None):
+        """
+        returns the mask of every bit matching the arguments; None matches anything
+        e.g mask("workbook", ["ExportData", "ExportXml"], "Allow") or mask(cap_mode="Deny")
+        """
+        if permissions_obj is not None and permissions_obj not in _permissions_objects:
+            raise ValueError("invalid argument: must be one of %r." % set(_permissions_objects))
+        if isinstance(cap_names, str):
+            cap_names = [cap_names]
+        mask = 0
+        for (bit_obj, bit_cap_name, bit_cap_mode), position in list(_permission_bits.items()):
+            if permissions_obj is not None and bit_obj != permissions_obj:
+                continue
+            if cap_names is not None and bit_cap_name not in cap_names:
+                continue
+            if cap_mode is not None and bit_cap_mode != cap_mode:
+                continue
+            mask |= 1 << position
+        return mask
+
+    def mask_from_dict(self, grantee_perm_dict):
+        """
+        returns the mask for one grantee's permissions written as {content type: {capability name: mode}},
+        i.e perm_dict['users'][user_id]
+        """
+        mask = 0
+        for permissions_obj, capabilities in grantee_perm_dict.items():
+            for cap_name, cap_mode in capabilities.items():
+                mask |= 1 << _permission_bit(permissions_obj, cap_name, cap_mode)
+        return mask
+
+    def row(self, users_or_groups, grantee_id):
+        return self.rows[users_or_groups].get(grantee_id, 0)
+
+    def grantees_with_any(self, mask, users_or_groups):
+        # users or groups holding at least one of the bits in mask
+        return {grantee_id for grantee_id, row in self.rows[users_or_groups].items() if row & mask}
+
+    def grantees_with_all(self, mask, users_or_groups):
+        # users or groups holding every bit in mask (and possibly others)
+        return {grantee_id for grantee_id, row in self.rows[users_or_groups].items() if row & mask == mask}
+
+    def grantees_with_exactly(self, mask, users_or_groups):
+        # users or groups whose grants are exactly the bits in mask
+        return {grantee_id for grantee_id, row in self.rows[users_or_groups].items() if row == mask}
+
+    def perm_dict(self):
+        """
+        derives the nested permissions dictionary (QueryDefaultPermissions.perm_dict format) from the matrix;
+        every grantee gets an entry for every content type, empty if it has no grants of that type
+        """
+        perm_dict = nested_dict()
+        bits = sorted((position, key) for key, position in _permission_bits.items())
+        for users_or_groups in ('users', 'groups'):
+            perm_dict[users_or_groups]
+            for grantee_id, row in self.rows[users_or_groups].items():
+                for permissions_obj in _permissions_objects:
+                    perm_dict[users_or_groups][grantee_id][permissions_obj]
+                for position, (permissions_obj, cap_name, cap_mode) in bits:
+                    if row >> position & 1:
+                        perm_dict[users_or_groups][grantee_id][permissions_obj][cap_name] = cap_mode
+        return perm_dict
+
 class QueryDefaultPermissions():
-    def __init__(self, VERSION, site_id, token, server, xmlns, project_id):
+    def __init__(self, VERSION, site_id, token, server, xmlns, project_id, client=None, max_workers=5, grants=None, response_format=None):
         """
         creates nested dictionary of default permissions for project (project, workbook, datasource, flow, metric)
         nested dict can be queried via associated methods for example:
@@ -590,69 +2610,73 @@ class QueryDefaultPermissions():
                 "WebAuthoring": "Allow"
             }
         }
+
+        the five permissions requests (project permissions plus the four default-permissions types) are sent concurrently,
+        max_workers limits how many are in flight at once
+        grants: list of grants from _query_permission_grants for every content type; when given (e.g by
+        BulkQueryDefaultPermissions) no API calls are made
+        response_format: see TableauClient
         """
         self.VERSION = VERSION
         self.site_id = site_id
         self.project_id = project_id
         self.server = server
         self.xmlns = xmlns
-        perm_dict = nested_dict()
-        for permissions_obj in {"project", "workbook", "datasource", "flow", "metric"}:
-            if permissions_obj == "project":
-                #  GET /api/api-version/sites/site-id/projects/project-id/permissions
-                url = server + "/api/{0}/sites/{1}/projects/{2}/permissions".format(VERSION, site_id, project_id)
-            else:
-                #  GET /api/api-version/sites/site-id/projects/project-id/default-permissions/{permissions_obj}s
-                url = server + "/api/{0}/sites/{1}/projects/{2}/default-permissions/{3}s".format(VERSION, site_id, project_id, permissions_obj)
-            # xml_request = 'none'
-            server_response = requests.get(url, headers={'x-tableau-auth': token}, verify=False)
-            _check_status(server_response, 200, xmlns)
-            server_response = _encode_for_display(server_response.text)
-            parsed_response = ET.fromstring(server_response)
-            grantee_capabilities = parsed_response.findall('.//t:granteeCapabilities', namespaces=xmlns)
-            for gr_cap in grantee_capabilities:
-                users = gr_cap.findall('.//t:user', namespaces=xmlns)
-                if users is not None:
-                    for user in users:
-                        userid=user.get("id")
-                        capabilities=gr_cap.findall('.//t:capability', namespaces=xmlns)
-                        for cap in capabilities:
-                            cap_name=cap.get('name')
-                            cap_mode=cap.get('mode')
-                            perm_dict['users'][userid][permissions_obj][cap_name]=cap_mode
-                groups = gr_cap.findall('.//t:group', namespaces=xmlns)
-                if groups is not None:
-                    for group in groups:
-                        groupid=group.get("id")
-                        capabilities=gr_cap.findall('.//t:capability', namespaces=xmlns)
-                        for cap in capabilities:
-                            cap_name=cap.get('name')
-                            cap_mode=cap.get('mode')
-                            perm_dict['groups'][groupid][permissions_obj][cap_name]=cap_mode
-        self.perm_dict= perm_dict
-
-        all_allow_users=set()
-        for user in self.perm_dict['users'].keys():
-            for permissions_obj in {"project", "workbook", "datasource", "flow", "metric"}:
-                all_allow_users.update(set([user for cap_name in self.perm_dict['users'][user][permissions_obj].keys() if self.perm_dict['users'][user][permissions_obj][cap_name] == 'Allow']))
-        self.all_allow_users=all_allow_users
-
-        all_allow_groups=set()
-        for group in self.perm_dict['groups'].keys():
-            for permissions_obj in {"project", "workbook", "datasource", "flow", "metric"}:
-                all_allow_groups.update(set([group for cap_name in self.perm_dict['groups'][group][permissions_obj].keys() if self.perm_dict['groups'][group][permissions_obj][cap_name] == 'Allow']))
-        self.all_allow_groups=all_allow_groups
+        if grants is None:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                grant_lists = executor.map(lambda permissions_obj: _query_permission_grants(VERSION, site_id, token, server, xmlns, project_id, permissions_obj, client, response_format), _permissions_objects)
+                grants = [grant for grant_list in grant_lists for grant in grant_list]
+        # grants are stored as a PermissionMatrix; perm_dict is derived from it
+        self.matrix = PermissionMatrix(grants)
+        self.perm_dict = self.matrix.perm_dict()
+        allow_mask = self.matrix.mask(cap_mode='Allow')
+        self.all_allow_users = self.matrix.grantees_with_any(allow_mask, 'users')
+        self.all_allow_groups = self.matrix.grantees_with_any(allow_mask, 'groups')
 
     def query_permissions(self, permissions_obj, users_or_groups, capability_mode): 
-        allow_groups_or_users=set()
         if permissions_obj not in {"project", "workbook", "datasource", "flow", "metric"}:
             raise ValueError("invalid argument: must be one of %r." % {"project", "workbook", "datasource", "flow", "metric"})
-        else:
-            for user_or_group in self.perm_dict[users_or_groups].keys():
-                allow_groups_or_users.update(set([user_or_group for cap_name in self.perm_dict[users_or_groups][user_or_group][permissions_obj].keys() if self.perm_dict[users_or_groups][user_or_group][permissions_obj][cap_name] == capability_mode]))
-        return allow_groups_or_users
+        if users_or_groups not in self.matrix.rows:
+            return set()
+        return self.matrix.grantees_with_any(self.matrix.mask(permissions_obj, cap_mode=capability_mode), users_or_groups)
 
 
+class BulkQueryDefaultPermissions():
+    """
+    queries the project and default permissions for many projects at once
+    every (project, permissions content type) request goes into one shared pool, so at most max_workers requests
+    are in flight across all projects
+    project_permissions: dictionary of project id -> QueryDefaultPermissions object for that project
+    response_format: see TableauClient
+    """
+    def __init__(self, VERSION, site_id, token, server, xmlns, project_ids, max_workers=8, client=None, response_format=None):
+        self.VERSION = VERSION
+        self.site_id = site_id
+        self.server = server
+        self.xmlns = xmlns
+        self.project_ids = list(project_ids)
+        requests_to_send = [(project_id, permissions_obj) for project_id in self.project_ids for permissions_obj in _permissions_objects]
+        grants = {project_id: [] for project_id in self.project_ids}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            grant_lists = executor.map(lambda request: _query_permission_grants(VERSION, site_id, token, server, xmlns, request[0], request[1], client, response_format), requests_to_send)
+            for (project_id, permissions_obj), grant_list in zip(requests_to_send, grant_lists):
+                grants[project_id].extend(grant_list)
+        self.project_permissions = {project_id: QueryDefaultPermissions(VERSION, site_id, token, server, xmlns, project_id, grants=grants[project_id]) for project_id in self.project_ids}
+
+    def perm_dict(self, project_id):
+        """
+        returns the nested permissions dictionary for one project (same format as QueryDefaultPermissions.perm_dict)
+        """
+        _check_user_input(project_id, self.project_permissions)
+        return self.project_permissions[project_id].perm_dict
+
+    def query_permissions(self, permissions_obj, users_or_groups, capability_mode):
+        """
+        runs QueryDefaultPermissions.query_permissions for every project
+        returns a dictionary of project id -> set of users or groups
+        """
+        return {project_id: project_perms.query_permissions(permissions_obj, users_or_groups, capability_mode) for project_id, project_perms in self.project_permissions.items()}
+
 
 class WriteDefaultPermissions():
     """
@@ -661,7 +2685,7 @@ class WriteDefaultPermissions():
     can add permissions via a dictionary
     dictionary can be queried from a master permissions object, or can be created using the helper function create_permisions_dict
     """
-    def __init__(self, VERSION, site_id, token, server, xmlns, permissions_obj, proj_id):
+    def __init__(self, VERSION, site_id, token, server, xmlns, permissions_obj, proj_id, client=None):
         if permissions_obj not in {"project", "workbook", "datasource", "flow", "metric"}:
             raise ValueError("invalid argument: must be one of %r." % {"project", "workbook", "datasource", "flow", "metric"})
         else:
@@ -672,6 +2696,7 @@ class WriteDefaultPermissions():
             self.proj_id = proj_id
             self.server = server
             self.xmlns = xmlns
+            self.client = client
     
     def create_permissions_dict(self, user_id_list=[], user_cap_name_list=[], user_cap_mode_list=[], group_id_list=[], group_cap_name_list=[], group_cap_mode_list=[]):
         perm_dict = nested_dict()
@@ -685,34 +2710,20 @@ class WriteDefaultPermissions():
                 perm_dict['groups'][group_id][self.permissions_obj][group_cap_name]=group_cap_mode
         return perm_dict
 
-    def add_permissions(self, perm_dict):
-        if self.permissions_obj == "project":
-            # PUT /api/api-version/sites/site-id/projects/project-id/permissions
-            url = self.server + "/api/{0}/sites/{1}/projects/{2}/permissions".format(self.VERSION, self.site_id, self.proj_id)
-        else:
-            # PUT /api/api-version/sites/site-id/projects/project-id/default-permissions/workbooks
-            url = self.server + "/api/{0}/sites/{1}/projects/{2}/default-permissions/{3}s".format(self.VERSION, self.site_id, self.proj_id, self.permissions_obj)
-        xml_request = ET.Element('tsRequest')
-        permissions_element= ET.SubElement(xml_request, 'permissions')
-        if "users" in perm_dict.keys():
-            for user_id in perm_dict['users'].keys():
-                grantee_element= ET.SubElement(permissions_element, 'granteeCapabilities')
-                user_element = ET.SubElement(grantee_element, 'user', id=user_id)
-                capabilities_element= ET.SubElement(grantee_element, 'capabilities')
-                for cap_name in perm_dict['users'][user_id][self.permissions_obj].keys():
-                    ET.SubElement(capabilities_element, 'capability', name=cap_name, mode=perm_dict['users'][user_id][self.permissions_obj][cap_name])
-        if "groups" in perm_dict.keys():
-            for group_id in perm_dict['groups'].keys():
-                grantee_element= ET.SubElement(permissions_element, 'granteeCapabilities')
-                group_element = ET.SubElement(grantee_element, 'group', id=group_id)
-                capabilities_element= ET.SubElement(grantee_element, 'capabilities')
-                for cap_name in perm_dict['groups'][group_id][self.permissions_obj].keys():
-                    ET.SubElement(capabilities_element, 'capability', name=cap_name, mode=perm_dict['groups'][group_id][self.permissions_obj][cap_name])
-        xml_request=ET.tostring(xml_request)
-        server_response = requests.put(url, data=xml_request, headers={'x-tableau-auth': self.token}, verify=False)
+    def _put_permissions(self, perm_dict):
+        """
+        sends every grant of this content type in perm_dict in a single PUT, returns the parsed response
+        """
+        # PUT /api/api-version/sites/site-id/projects/project-id/permissions
+        # PUT /api/api-version/sites/site-id/projects/project-id/default-permissions/workbooks
+        url = _permissions_url(self.VERSION, self.site_id, self.server, self.proj_id, self.permissions_obj)
+        xml_request = _permissions_request(perm_dict, self.permissions_obj)
+        server_response = _get_client(self.client).put(url, self.token, data=xml_request)
         _check_status(server_response, 200, self.xmlns)
-        server_response = _encode_for_display(server_response.text)
-        parsed_response = ET.fromstring(server_response)
+        return _parse_xml(server_response.content)
+
+    def add_permissions(self, perm_dict):
+        parsed_response = self._put_permissions(perm_dict)
         users = parsed_response.findall('.//t:user', namespaces=self.xmlns)
         if users is not None:
             for user in users:
@@ -732,24 +2743,83 @@ class WriteDefaultPermissions():
                     cap_mode=cap.get('mode')
                 print("New group " + self.permissions_obj + " permissions: " + groupid + ' ' + cap_name + ' ' + cap_mode)
     
-    def delete_permissions(self, perm_dict):
+    def _delete_permission(self, deletion):
+        """
+        deletion: (users_or_groups, grantee id, capability name, capability mode). returns deletion once it is done
+        """
+        url = _permission_delete_url(self.VERSION, self.site_id, self.server, self.proj_id, self.permissions_obj, deletion)
+        # xml_request = none
+        server_response = _get_client(self.client).delete(url, self.token)
+        _check_status(server_response, 204, self.xmlns)
+        return deletion
+
+    def delete_permissions(self, perm_dict, max_workers=8):
+        """
+        deletes every grant of this content type in perm_dict, with at most max_workers DELETE requests in flight
+        """
+        deletions = []
         for group_or_user in perm_dict.keys():
             for id in perm_dict[group_or_user].keys():
                 for cap_name in perm_dict[group_or_user][id][self.permissions_obj].keys():
-                    cap_mode = perm_dict[group_or_user][id][self.permissions_obj][cap_name]
-                    if self.permissions_obj != "project":
-                        # DELETE /api/api-version/sites/site-id/projects/project-id/default-permissions/workbooks/groups/group-id/capability-name/capability-mode
-                        url = self.server + "/api/{0}/sites/{1}/projects/{2}/default-permissions/{3}s/{4}/{5}/{6}/{7}".format(self.VERSION, self.site_id, self.proj_id, self.permissions_obj, group_or_user, id, cap_name, cap_mode)
-                    elif self.permissions_obj == "project":
-                        # DELETE /api/api-version/sites/site-id/projects/project-id/permissions/users/user-id/capability-name/capability-mode
-                        url = self.server + "/api/{0}/sites/{1}/projects/{2}/permissions/{3}/{4}/{5}/{6}".format(self.VERSION, self.site_id, self.proj_id, group_or_user, id, cap_name, cap_mode)
-                    # xml_request = none
-                    server_response = requests.delete(url, headers={'x-tableau-auth': self.token}, verify=False)
-                    _check_status(server_response, 204, self.xmlns)
-                    print(group_or_user + ' ' + id + " permission deleted from " + self.proj_id)
-
-
-def add_user_permission_to_project(VERSION, site_id, token, server, xmlns, project_id, user_id, cap_name, cap_mode):
+                    deletions.append((group_or_user, id, cap_name, perm_dict[group_or_user][id][self.permissions_obj][cap_name]))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for group_or_user, id, cap_name, cap_mode in executor.map(self._delete_permission, deletions):
+                print(group_or_user + ' ' + id + " permission deleted from " + self.proj_id)
+
+    def sync_permissions(self, desired_perm_dict, dry_run=False, max_workers=8):
+        """
+        makes this content type's permissions on the server match desired_perm_dict (same format as perm_dict),
+        sending only the difference. the current permissions are read once; users and groups missing from
+        desired_perm_dict lose their permissions of this type
+        grants to remove (and grants whose mode changes) are deleted first, with at most max_workers DELETE requests
+        in flight; every grant to add is then sent in a single PUT. an unchanged sync costs one GET and no writes
+        a failed DELETE doesn't stop the other deletions or the PUT; a failed PUT fails every grant it carried
+        dry_run: print the plan without changing anything on the server
+        returns a report dictionary: {'add': [...], 'delete': [...], 'unchanged': count, 'failed': {grant: error message}, 'dry_run': dry_run}
+        where add and delete are lists of grants, (users_or_groups, id, capability name, capability mode) tuples;
+        grants in add/delete that are not in failed were added/deleted
+        """
+        current_grants = {}
+        for users_or_groups, grantee_id, permissions_obj, cap_name, cap_mode in _query_permission_grants(self.VERSION, self.site_id, self.token, self.server, self.xmlns, self.proj_id, self.permissions_obj, self.client):
+            current_grants[(users_or_groups, grantee_id, cap_name)] = cap_mode
+        desired_grants = {}
+        for users_or_groups in desired_perm_dict.keys():
+            for grantee_id in desired_perm_dict[users_or_groups].keys():
+                for cap_name, cap_mode in desired_perm_dict[users_or_groups][grantee_id].get(self.permissions_obj, {}).items():
+                    desired_grants[(users_or_groups, grantee_id, cap_name)] = cap_mode
+        deletions = sorted(key + (cap_mode,) for key, cap_mode in current_grants.items() if desired_grants.get(key) != cap_mode)
+        additions = sorted(key + (cap_mode,) for key, cap_mode in desired_grants.items() if current_grants.get(key) != cap_mode)
+        report = {'add': additions, 'delete': deletions, 'unchanged': len(desired_grants) - len(additions), 'failed': {}, 'dry_run': dry_run}
+        if dry_run:
+            for group_or_user, id, cap_name, cap_mode in deletions:
+                print("delete " + self.permissions_obj + " permission: " + group_or_user + ' ' + id + ' ' + cap_name + ' ' + cap_mode)
+            for group_or_user, id, cap_name, cap_mode in additions:
+                print("add " + self.permissions_obj + " permission: " + group_or_user + ' ' + id + ' ' + cap_name + ' ' + cap_mode)
+            return report
+        def delete(deletion):
+            try:
+                self._delete_permission(deletion)
+            except (ApiCallError, requests.RequestException) as error:
+                return str(error)
+            return None
+
+        if deletions:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for deletion, error in zip(deletions, executor.map(delete, deletions)):
+                    if error is not None:
+                        report['failed'][deletion] = error
+        if additions:
+            perm_dict = nested_dict()
+            for group_or_user, id, cap_name, cap_mode in additions:
+                perm_dict[group_or_user][id][self.permissions_obj][cap_name] = cap_mode
+            try:
+                self._put_permissions(perm_dict)
+            except (ApiCallError, requests.RequestException) as error:
+                report['failed'].update(dict.fromkeys(additions, str(error)))
+        return report
+
+
+def add_user_permission_to_project(VERSION, site_id, token, server, xmlns, project_id, user_id, cap_name, cap_mode, client=None):
     # PUT /api/api-version/sites/site-id/projects/project-id/permissions
     url = server + "/api/{0}/sites/{1}/projects/{2}/permissions".format(VERSION, site_id, project_id)
     xml_request = ET.Element('tsRequest')
@@ -761,10 +2831,9 @@ def add_user_permission_to_project(VERSION, site_id, token, server, xmlns, proje
     ET.SubElement(capabilities_element, 'capability', name=cap_name, mode=cap_mode)
     xml_request=ET.tostring(xml_request)
     print(xml_request)
-    server_response = requests.put(url, data=xml_request, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).put(url, token, data=xml_request)
     _check_status(server_response, 200, xmlns)
-    server_response = _encode_for_display(server_response.text)
-    parsed_response = ET.fromstring(server_response)
+    parsed_response = _parse_xml(server_response.content)
     user = parsed_response.findall('.//t:user', namespaces=xmlns)
     for x in user:
         user=x.get("id")
@@ -775,13 +2844,349 @@ def add_user_permission_to_project(VERSION, site_id, token, server, xmlns, proje
         print(new_cap, new_mode, user) 
     return new_cap, new_mode, user
 
-def delete_user_permission_from_project(VERSION, site_id, token, server, xmlns, project_id, user_id, cap_name, cap_mode):
+def delete_user_permission_from_project(VERSION, site_id, token, server, xmlns, project_id, user_id, cap_name, cap_mode, client=None):
     # DELETE /api/api-version/sites/site-id/projects/project-id/permissions/users/user-id/capability-name/capability-mode
     url = server + "/api/{0}/sites/{1}/projects/{2}/permissions/users/{3}/{4}/{5}".format(VERSION, site_id, project_id, user_id, cap_name, cap_mode)
     # xml_request = none
-    server_response = requests.delete(url, headers={'x-tableau-auth': token}, verify=False)
+    server_response = _get_client(client).delete(url, token)
     _check_status(server_response, 204, xmlns)
     return print(user_id + " permission deleted from " + project_id)
 
 
 
+
+
+class ProvisioningPlan():
+    """
+    projects, groups, users, group memberships and default permissions to create, described by name in one dictionary
+    (or a json/yaml file, see load):
+    {
+    "projects": [{"name": "Finance", "description": "Finance workbooks", "content_permissions": "LockedToProject", "parent": "Departments"}],
+    "groups": [{"name": "Finance Analysts", "minimum_site_role": "Viewer"}],
+    "users": [{"name": "jdoe", "site_role": "Explorer"}],
+    "memberships": {"Finance Analysts": ["jdoe"]},
+    "permissions": {"Finance": {"project": {"groups": {"Finance Analysts": {"Read": "Allow"}}},
+                                "workbook": {"groups": {"Finance Analysts": {"Read": "Allow", "ExportData": "Allow"}}, "users": {"jdoe": {"Write": "Allow"}}}}}
+    }
+    description, content_permissions (default LockedToProject), parent, minimum_site_role (default Viewer) and every section are
+    optional. names that the plan does not create (e.g an existing parent project or user) must already exist on the site, and
+    be the only one of their kind with that name
+    the plan is split into steps, one per project, group, user, membership and (project, permissions_obj); each step depends on
+    the steps that create the objects it names, e.g a membership on its group and user. steps is a dictionary of step key ->
+    step, keys are tuples: ('project', name), ('group', name), ('user', name), ('membership', group name, user name) and
+    ('permissions', project name, permissions_obj). dependencies is a dictionary of step key -> set of step keys
+    """
+    def __init__(self, plan):
+        self.plan = plan
+        self.steps = {}
+        self.dependencies = {}
+        for project in plan.get('projects', []):
+            self._add(('project', project['name']), project, [('project', project['parent'])] if project.get('parent') else [])
+        for group in plan.get('groups', []):
+            self._add(('group', group['name']), group, [])
+        for user in plan.get('users', []):
+            if not user.get('site_role'):
+                raise ValueError("user {0} has no site_role".format(user['name']))
+            self._add(('user', user['name']), user, [])
+        for group_name, user_names in plan.get('memberships', {}).items():
+            for user_name in user_names:
+                self._add(('membership', group_name, user_name), None, [('group', group_name), ('user', user_name)])
+        for project_name, permissions in plan.get('permissions', {}).items():
+            for permissions_obj, perm_dict in permissions.items():
+                if permissions_obj not in _permissions_objects:
+                    raise ValueError("invalid argument: must be one of %r." % (_permissions_objects,))
+                grantees = [(users_or_groups[:-1], name) for users_or_groups in ('users', 'groups') for name in perm_dict.get(users_or_groups, {})]
+                self._add(('permissions', project_name, permissions_obj), perm_dict, [('project', project_name)] + grantees)
+        # only dependencies on steps of this plan count, objects the plan doesn't create are looked up on the site instead
+        self.dependencies = {key: {required for required in requires if required in self.steps} for key, requires in self.dependencies.items()}
+        self.stages()
+
+    def _add(self, key, step, requires):
+        if key in self.steps:
+            raise ValueError("{0} {1} is in the plan more than once".format(key[0], '/'.join(key[1:])))
+        self.steps[key] = step
+        self.dependencies[key] = requires
+
+    def stages(self):
+        """
+        returns the steps as a list of stages (lists of step keys); every step only depends on steps of earlier stages, so the
+        steps of a stage can run concurrently. raises ValueError if projects are their own ancestors
+        """
+        stages = []
+        done = set()
+        remaining = dict(self.dependencies)
+        while remaining:
+            stage = sorted(key for key, requires in remaining.items() if requires <= done)
+            if not stage:
+                raise ValueError("the plan has a dependency cycle between: " + ', '.join('/'.join(key[1:]) for key in sorted(remaining)))
+            stages.append(stage)
+            done.update(stage)
+            for key in stage:
+                del remaining[key]
+        return stages
+
+    @classmethod
+    def load(cls, path):
+        # reads a plan from a json file, or a .yaml/.yml file (needs PyYAML)
+        with open(path) as f:
+            if path.endswith(('.yaml', '.yml')):
+                import yaml
+                return cls(yaml.safe_load(f))
+            return cls(json.load(f))
+
+def _read_checkpoint(path):
+    # returns a dictionary of completed step key -> id of the object it created (None for memberships and permissions)
+    try:
+        with open(path) as f:
+            return {tuple(key): object_id for key, object_id in json.load(f)['completed']}
+    except FileNotFoundError:
+        return {}
+
+def _write_checkpoint(path, completed):
+    part_path = path + '.part'
+    with open(part_path, 'w') as f:
+        json.dump({'completed': [[list(key), object_id] for key, object_id in completed.items()]}, f)
+    os.replace(part_path, path)
+
+# the kinds of object each kind of plan step refers to by name
+_step_references = {'project': ('project',), 'group': ('group',), 'user': ('user',), 'membership': ('group', 'user'), 'permissions': ('project', 'group', 'user')}
+
+def _site_ids(VERSION, site_id, token, server, xmlns, plan, client=None):
+    """
+    returns (ids, ambiguous, projects) for the projects, groups and users already on the site: ids is a dictionary of kind ->
+    {name: id}, ambiguous a dictionary of kind -> names that several objects share (left out of ids, so a reference to one of
+    them fails instead of picking one) and projects a dictionary of (parent project id, name) -> id, the key a project name is
+    unique under. only the listings the plan refers to are read, concurrently
+    """
+    listings = {'project': lambda: QueryProjects(VERSION, site_id, token, server, xmlns, client, cache=False).projects,
+                'group': lambda: QueryGroups(VERSION, site_id, token, server, xmlns, client, cache=False).groups,
+                'user': lambda: QueryUsers(VERSION, site_id, token, server, xmlns, client, cache=False).users}
+    kinds = sorted({kind for key in plan.steps for kind in _step_references[key[0]]})
+    ids = {kind: {} for kind in listings}
+    ambiguous = {kind: set() for kind in listings}
+    projects = {}
+    with ThreadPoolExecutor(max_workers=len(listings)) as executor:
+        for kind, records in zip(kinds, executor.map(lambda kind: listings[kind](), kinds)):
+            for record in records:
+                if record.name in ids[kind] or record.name in ambiguous[kind]:
+                    ids[kind].pop(record.name, None)
+                    ambiguous[kind].add(record.name)
+                else:
+                    ids[kind][record.name] = record.id
+            if kind == 'project':
+                projects = {(record.parent_project_id, record.name): record.id for record in records}
+    return ids, ambiguous, projects
+
+def _object_id(ids, ambiguous, kind, name):
+    # names the plan creates or found existing are in ids, and take precedence over site objects sharing the name
+    if name in ids[kind]:
+        return ids[kind][name]
+    if name in ambiguous[kind]:
+        raise ValueError("{0} {1} is ambiguous: more than one {0} on the site has that name".format(kind, name))
+    raise ValueError("{0} {1} not found".format(kind, name))
+
+def _run_step(VERSION, site_id, token, server, xmlns, key, step, ids, ambiguous, client=None):
+    # sends the request(s) of one plan step, returns the id of the object it created (None for memberships and permissions)
+    kind = key[0]
+    if kind == 'project':
+        parent_project_id = _object_id(ids, ambiguous, 'project', step['parent']) if step.get('parent') else None
+        server_response = _post_project(VERSION, site_id, token, server, xmlns, step['name'], step.get('description', ''), step.get('content_permissions', 'LockedToProject'), parent_project_id, client)
+        return _response_records(server_response, xmlns, 'project', ProjectRecord)[0][0].id
+    if kind == 'group':
+        server_response = _post_group(VERSION, site_id, token, server, xmlns, step['name'], step.get('minimum_site_role', 'Viewer'), client)
+        return _response_records(server_response, xmlns, 'group', GroupRecord)[0][0].id
+    if kind == 'user':
+        server_response = _post_user(VERSION, site_id, token, server, xmlns, step['name'], step['site_role'], client)
+        return _response_records(server_response, xmlns, 'user', UserRecord)[0][0].id
+    if kind == 'membership':
+        try:
+            _post_user_to_group(VERSION, site_id, token, server, xmlns, _object_id(ids, ambiguous, 'group', key[1]), _object_id(ids, ambiguous, 'user', key[2]), client)
+        except ApiCallError as error:
+            # 409011: the user is already in the group, e.g when an interrupted run is repeated without its checkpoint
+            if not str(error).startswith('409011'):
+                raise
+        return None
+    project_name, permissions_obj = key[1], key[2]
+    perm_dict = nested_dict()
+    for users_or_groups in ('users', 'groups'):
+        for name, capabilities in step.get(users_or_groups, {}).items():
+            perm_dict[users_or_groups][_object_id(ids, ambiguous, users_or_groups[:-1], name)][permissions_obj] = capabilities
+    WriteDefaultPermissions(VERSION, site_id, token, server, xmlns, permissions_obj, _object_id(ids, ambiguous, 'project', project_name), client)._put_permissions(perm_dict)
+    return None
+
+def execute_plan(VERSION, site_id, token, server, xmlns, plan, checkpoint=None, max_workers=8, dry_run=False, client=None):
+    """
+    creates everything in plan (a ProvisioningPlan, or a plan dictionary) that is not on the site yet
+    the site's projects, groups and users are read first: objects of the plan that already exist (groups and users by name,
+    projects by name under the same parent) are reused, not created. a name the plan refers to but doesn't create must belong
+    to exactly one object on the site; a step naming one that several projects share fails. every step then starts as soon as the steps it depends on are done, with at most max_workers requests in flight,
+    so independent users, groups, memberships and permissions are sent concurrently. nothing is printed per step and a failed
+    step doesn't stop the others, only the steps that depend on it (they are skipped)
+    checkpoint: path of a json file recording the steps done so far; steps it lists are not sent again, so a run that failed
+    or was interrupted picks up where it stopped when repeated with the same checkpoint
+    dry_run: work out the stages and which objects exist without changing anything on the server
+    returns a report dictionary: {'steps': {step key: {'status', 'seconds', 'id' or 'error'}}, 'stages': plan.stages(),
+    'done': count, 'failed': count, 'skipped': count, 'seconds': wall time, 'dry_run': dry_run}
+    status is 'done', 'exists' (already on the site), 'resumed' (done in an earlier run), 'failed', 'skipped' or, for a dry
+    run, 'planned'. seconds is the time the step took, id the id of the project, group or user it created
+    """
+    started = time.monotonic()
+    plan = plan if isinstance(plan, ProvisioningPlan) else ProvisioningPlan(plan)
+    stages = plan.stages()
+    completed = _read_checkpoint(checkpoint) if checkpoint else {}
+    ids, ambiguous, projects = _site_ids(VERSION, site_id, token, server, xmlns, plan, client)
+    steps = {}
+    # in stage order, so a project's parent is resolved before the project is looked for under it
+    for key in (key for stage in stages for key in stage):
+        if key in completed:
+            steps[key] = {'status': 'resumed', 'seconds': 0.0, 'id': completed[key]}
+        elif key[0] == 'project':
+            parent = plan.steps[key].get('parent')
+            parent_project_id = ids['project'].get(parent) if parent else None
+            if (parent_project_id is not None or not parent) and (parent_project_id, key[1]) in projects:
+                steps[key] = {'status': 'exists', 'seconds': 0.0, 'id': projects[(parent_project_id, key[1])]}
+        elif key[0] in ('group', 'user') and key[1] in ids[key[0]]:
+            steps[key] = {'status': 'exists', 'seconds': 0.0, 'id': ids[key[0]][key[1]]}
+        if key in steps and steps[key]['id'] is not None:
+            ids[key[0]][key[1]] = steps[key]['id']
+    report = {'steps': steps, 'stages': stages, 'done': 0, 'failed': 0, 'skipped': 0, 'seconds': 0.0, 'dry_run': dry_run}
+    if dry_run:
+        for key in plan.steps:
+            steps.setdefault(key, {'status': 'planned', 'seconds': 0.0, 'id': None})
+        report['seconds'] = time.monotonic() - started
+        return report
+    dependents = {key: [] for key in plan.steps}
+    waiting_on = {}
+    for key, requires in plan.dependencies.items():
+        if key not in steps:
+            waiting_on[key] = {required for required in requires if required not in steps}
+            for required in waiting_on[key]:
+                dependents[required].append(key)
+
+    def run(key):
+        step_started = time.monotonic()
+        try:
+            return key, _run_step(VERSION, site_id, token, server, xmlns, key, plan.steps[key], ids, ambiguous, client), None, time.monotonic() - step_started
+        except (ApiCallError, ValueError, requests.RequestException) as error:
+            return key, None, str(error), time.monotonic() - step_started
+
+    def skip(key, failed_key):
+        for dependent in dependents[key]:
+            if dependent not in steps:
+                steps[dependent] = {'status': 'skipped', 'seconds': 0.0, 'error': 'depends on failed step ' + '/'.join(failed_key)}
+                report['skipped'] += 1
+                skip(dependent, failed_key)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, key) for key, requires in waiting_on.items() if not requires}
+        while futures:
+            finished, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key, object_id, error, seconds = future.result()
+                if error is not None:
+                    steps[key] = {'status': 'failed', 'seconds': seconds, 'error': error}
+                    report['failed'] += 1
+                    skip(key, key)
+                    continue
+                steps[key] = {'status': 'done', 'seconds': seconds, 'id': object_id}
+                report['done'] += 1
+                if object_id is not None:
+                    ids[key[0]][key[1]] = object_id
+                if checkpoint:
+                    completed[key] = object_id
+                    _write_checkpoint(checkpoint, completed)
+                for dependent in dependents[key]:
+                    waiting_on[dependent].discard(key)
+                    if not waiting_on[dependent] and dependent not in steps:
+                        futures.add(executor.submit(run, dependent))
+    report['seconds'] = time.monotonic() - started
+    return report
+
+
+class SiteInventory():
+    """
+    results of fan_out, merged across sites
+    sites: dictionary of site content url -> SiteRecord, in the order the sites were queried
+    results: dictionary of query name -> {site content url: what the query returned for that site}
+    errors: dictionary of (site content url, query name) -> repr of the error, for the sites that couldn't be signed in to and the
+            queries that raised
+    seconds: wall time of the whole fan out
+    """
+    def __init__(self, sites, results, errors, seconds):
+        self.sites = sites
+        self.results = results
+        self.errors = errors
+        self.seconds = seconds
+
+    def records(self, name):
+        """
+        returns the records of query name on every site as one list of (site content url, record) pairs, in site order
+        the records of a Query* or ViewIndex object are the listing its class names in _records_attribute (QueryUsers -> users,
+        ViewIndex -> views...), a list or tuple result is used as it is and any other result gives one pair per site
+        """
+        rows = []
+        site_results = self.results.get(name, {})
+        for content_url in self.sites:
+            if content_url not in site_results:
+                continue
+            result = site_results[content_url]
+            records_attribute = getattr(type(result), '_records_attribute', None)
+            if records_attribute is not None:
+                result = getattr(result, records_attribute)
+            elif not isinstance(result, (list, tuple)):
+                result = [result]
+            rows.extend((content_url, record) for record in result)
+        return rows
+
+    def counts(self, name, attribute):
+        """
+        returns a dictionary of site content url -> {value: number of records} counting the records of query name by one attribute
+        (xml attribute name, as record.get takes it), e.g counts('users', 'siteRole') for a license audit
+        """
+        counts = {content_url: {} for content_url in self.sites if content_url in self.results.get(name, {})}
+        for content_url, record in self.records(name):
+            value = record.get(attribute)
+            counts[content_url][value] = counts[content_url].get(value, 0) + 1
+        return counts
+
+def fan_out(pool, queries, sites=None, max_workers=16):
+    """
+    runs every query on every site concurrently and returns the results as one site-tagged SiteInventory
+    pool: a SessionPool; each site is signed in to once and its session (with its open connections) is used for all of that
+          site's queries. create the pool with max_concurrency to cap the calls in flight across all sites together
+    queries: dictionary of name -> callable taking (VERSION, site_id, token, server, xmlns, client=session), e.g
+             {'users': QueryUsers, 'workbooks': functools.partial(QueryWorkbooks, page_size=100)}
+    sites: content urls of the sites to query, by default every site on the server (pool.query_sites(), which needs a server
+           administrator)
+    max_workers: how many (site, query) pairs run at once
+    a site that can't be signed in to or a query that fails is recorded in errors and doesn't stop the others
+    """
+    started = time.monotonic()
+    if sites is None:
+        site_records = {site.content_url or "": site for site in pool.query_sites()}
+    else:
+        site_records = {content_url: SiteRecord(None, None, content_url, None, None) for content_url in sites}
+    results = {name: {} for name in queries}
+    errors = {}
+
+    def run(task):
+        content_url, name = task
+        try:
+            session = pool.session(content_url)
+            return task, queries[name](session.VERSION, session.site_id, session.token, session.server, session.xmlns, client=session), None
+        except Exception as error:
+            # a query is any callable, so any error it raises is recorded instead of ending the whole fan out
+            return task, None, repr(error)
+
+    # site by site, so each site's sign in comes before most of the other sites' queries
+    tasks = [(content_url, name) for content_url in site_records for name in queries]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for (content_url, name), result, error in executor.map(run, tasks):
+            if error is not None:
+                errors[(content_url, name)] = error
+            else:
+                results[name][content_url] = result
+    for content_url, site in site_records.items():
+        if site.id is None and content_url in pool.sessions:
+            site_records[content_url] = site._replace(id=pool.sessions[content_url].site_id)
+    return SiteInventory(site_records, results, errors, time.monotonic() - started)
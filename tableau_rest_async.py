@@ -0,0 +1,570 @@
+import asyncio
+import contextlib
+import time
+import xml.etree.ElementTree as ET
+
+import aiohttp
+
+from tableau_rest import (ApiCallError, RequestScheduler, QueryProjects, QueryWorkbooks, QueryWorkbookViews, QueryGroups,
+                          QueryUsers, QueryDefaultPermissions, ViewIndex, UserRecord, GroupRecord, ProjectRecord, WorkbookRecord, ViewRecord,
+                          _check_status, _parse_xml, _response_records, _check_response_format, _format_headers, _response_permission_grants,
+                          _paged_url, _record_from_element, _workbook_view_records, _view_data_url, _csv_encoding,
+                          _permissions_objects, _permissions_url, _permission_delete_url, _permissions_request,
+                          _parse_permission_grants, _invalidate_snapshots, _query_string, _listing_fields)
+
+
+### asyncio counterpart of tableau_rest.py
+#### functions have the same names and arguments as in tableau_rest.py and are awaited instead of called, e.g.
+##       token, site_id, user_id = await tableau_rest_async.sign_in(server, username, password, VERSION, xmlns, site)
+##       users_obj = await tableau_rest_async.query_users(VERSION, site_id, token, server, xmlns)
+#### listings and permissions return the same Query*/QueryDefaultPermissions objects as tableau_rest.py, built from
+#### responses fetched here. write functions return their results instead of printing them.
+#### every call goes through one AsyncTableauClient: a single pooled aiohttp session plus the RequestScheduler policy of
+#### tableau_rest.py (retries, per-endpoint timeouts, a cap on the requests in flight), so thousands of calls can be
+#### gathered on one event loop. AsyncTableauSession also signs in again when its token expires
+
+
+class _Response():
+    """
+    body and status of a finished request, with the attributes tableau_rest._check_status reads
+    """
+    def __init__(self, status_code, content, headers, encoding):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+
+class _AsyncAdaptiveLimit():
+    """
+    asyncio counterpart of tableau_rest._AdaptiveLimit, with the same AIMD rules; minimum == maximum gives a fixed limit
+    """
+    def __init__(self, initial, minimum, maximum):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters = []
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started, pressure):
+        # synchronous, so it also runs when the call is cancelled
+        self.in_flight -= 1
+        if pressure:
+            if started > self._last_decrease:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = time.monotonic()
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+def _client_timeout(timeout):
+    # RequestScheduler timeouts are seconds or (connect, read) tuples
+    if isinstance(timeout, tuple):
+        return aiohttp.ClientTimeout(total=None, sock_connect=timeout[0], sock_read=timeout[1])
+    return aiohttp.ClientTimeout(total=timeout)
+
+# failures after which a call may be sent again (a payload error is a body cut off mid-transfer)
+_connection_errors = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+class AsyncTableauClient():
+    """
+    holds one pooled, keep-alive aiohttp session for every tableau_rest_async call
+    max_concurrency: maximum requests in flight at once across everything using this client
+    pool_size: maximum open connections
+    timeout: seconds allowed for each request, either a single number or a (connect, read) tuple
+    token: optional default x-tableau-auth header; a token passed to an individual call takes precedence
+    verify: verify the server TLS certificate (off by default, matching tableau_rest.py)
+    instrumentation: optional tableau_rest.Instrumentation recording calls, bytes and timings per endpoint
+    response_format: 'xml' (default) or 'json', the format read endpoints are asked to answer in; records are identical either way
+    scheduler: optional tableau_rest.RequestScheduler; calls follow the same policy as in tableau_rest (retries with backoff and
+               Retry-After, per-endpoint timeouts, and its AIMD limit instead of max_concurrency when it has one), waiting with
+               asyncio.sleep. a default RequestScheduler() is used when none is given
+    the session is created on first use inside the running event loop and belongs to that loop: close it with await client.close()
+    (or use the client as an async context manager) before using the client from another loop
+    """
+    def __init__(self, max_concurrency=20, pool_size=100, timeout=15, token=None, verify=False, instrumentation=None, response_format='xml', scheduler=None):
+        self.instrumentation = instrumentation
+        self.response_format = _check_response_format(response_format)
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.token = token
+        self.verify = verify
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.session = None
+        self.limit = None
+        self._loop = None
+
+    def set_token(self, token):
+        self.token = token
+
+    def _open(self):
+        loop = asyncio.get_running_loop()
+        if self.session is not None and self._loop is not loop:
+            raise RuntimeError("this AsyncTableauClient's session belongs to another event loop; await client.close() in that loop first, or use one client per loop")
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ssl=None if self.verify else False)
+            self.session = aiohttp.ClientSession(connector=connector)
+            limit = self.scheduler.limit
+            if limit is not None:
+                self.limit = _AsyncAdaptiveLimit(limit.limit, limit.minimum, limit.maximum)
+            else:
+                self.limit = _AsyncAdaptiveLimit(self.max_concurrency, self.max_concurrency, self.max_concurrency)
+            self._loop = loop
+
+    async def request(self, method, url, token=None, data=None, headers=None):
+        """
+        sends the call with the scheduler's retries and concurrency limit; returns the last response, or raises the last
+        connection error once retries run out
+        """
+        self._open()
+        headers = dict(headers or {})
+        token = token if token is not None else self.token
+        if token is not None:
+            headers['x-tableau-auth'] = token
+        scheduler = self.scheduler
+        timeout = _client_timeout(scheduler.timeout_for(url, self.timeout))
+        attempt = 0
+        while True:
+            started = await self.limit.acquire()
+            server_response, error, pressure = None, None, True
+            try:
+                server_response = await self._send(method, url, headers, data, timeout)
+                pressure = server_response.status_code in scheduler.pressure_statuses
+            except _connection_errors as raised:
+                error = raised
+            finally:
+                self.limit.release(started, pressure)
+            status_code = server_response.status_code if server_response is not None else None
+            # a refused connection never reached the server, so even a POST can be sent again
+            retryable = scheduler._retryable(method, url, status_code, error) or isinstance(error, aiohttp.ClientConnectorError)
+            if attempt >= scheduler.retries or not (error is not None or status_code in scheduler.retry_statuses) or not retryable:
+                if error is not None:
+                    raise error
+                return server_response
+            await asyncio.sleep(scheduler._delay(attempt, server_response))
+            attempt += 1
+
+    async def _send(self, method, url, headers, data, timeout):
+        # one attempt
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            async with self.session.request(method, url, data=data, headers=headers, timeout=timeout) as response:
+                content = await response.read()
+                return _Response(response.status, content, response.headers, response.charset)
+        bytes_sent = len(data) if isinstance(data, (bytes, str)) else 0
+        instrumentation.before_call(method, url)
+        started = time.perf_counter()
+        try:
+            async with self.session.request(method, url, data=data, headers=headers, timeout=timeout) as response:
+                content = await response.read()
+        except _connection_errors + (aiohttp.ClientError,) as error:
+            instrumentation.after_call(method, url, None, 0, bytes_sent, time.perf_counter() - started, error)
+            raise
+        instrumentation.after_call(method, url, response.status, len(content), bytes_sent, time.perf_counter() - started)
+        return _Response(response.status, content, response.headers, response.charset)
+
+    async def get(self, url, token=None, **kwargs):
+        return await self.request('GET', url, token, **kwargs)
+
+    async def post(self, url, token=None, **kwargs):
+        return await self.request('POST', url, token, **kwargs)
+
+    async def put(self, url, token=None, **kwargs):
+        return await self.request('PUT', url, token, **kwargs)
+
+    async def delete(self, url, token=None, **kwargs):
+        return await self.request('DELETE', url, token, **kwargs)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+            self._loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncTableauSession(AsyncTableauClient):
+    """
+    asyncio counterpart of tableau_rest.TableauSession: an AsyncTableauClient that signs itself in (when entered with async with,
+    or on its first call) and, when the server answers 401 (e.g the token expired), signs in again once for all the calls that hit
+    the same expired token and retries them
+    token, site_id and user_id hold the current values; calls made with a token this session has replaced are sent with the
+    current one, so session.token can be read once and passed to every function as usual
+    client_options are passed to AsyncTableauClient (max_concurrency, pool_size, timeout, verify, instrumentation, response_format,
+    scheduler)
+    """
+    def __init__(self, server, username, password, VERSION, xmlns, site="", **client_options):
+        AsyncTableauClient.__init__(self, **client_options)
+        self.server = server
+        self.username = username
+        self.password = password
+        self.VERSION = VERSION
+        self.xmlns = xmlns
+        self.site = site
+        self.site_id = None
+        self.user_id = None
+        self._replaced_tokens = set()
+        self._auth_lock = None
+
+    async def _sign_in(self):
+        # sign_in stores the new token as this client's default header
+        token, self.site_id, self.user_id = await sign_in(self.server, self.username, self.password, self.VERSION, self.xmlns, self.site, client=self)
+
+    async def _reauthenticate(self, failed_token):
+        # the lock is created lazily so it belongs to the loop the session is used from
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        async with self._auth_lock:
+            if self.token != failed_token:
+                # another call already signed in again
+                return
+            if failed_token is not None:
+                self._replaced_tokens.add(failed_token)
+            await self._sign_in()
+
+    async def request(self, method, url, token=None, **kwargs):
+        if url.endswith(('/auth/signin', '/auth/signout')):
+            return await AsyncTableauClient.request(self, method, url, token, **kwargs)
+        if self.token is None:
+            await self._reauthenticate(None)
+        if token is None or token in self._replaced_tokens:
+            token = self.token
+        server_response = await AsyncTableauClient.request(self, method, url, token, **kwargs)
+        if server_response.status_code == 401:
+            await self._reauthenticate(token)
+            server_response = await AsyncTableauClient.request(self, method, url, self.token, **kwargs)
+        return server_response
+
+    async def sign_out(self):
+        # signs out on the server
+        if self.token is not None:
+            await sign_out(self.server, self.VERSION, self.xmlns, client=self, token=self.token)
+        self.set_token(None)
+
+    async def __aenter__(self):
+        if self.token is None:
+            await self._reauthenticate(None)
+        return self
+
+
+_default_client = None
+_loop_default_clients = {}
+
+def get_default_client():
+    """
+    returns the AsyncTableauClient used when no client is passed to a function: the one set with set_default_client, otherwise a
+    shared client for the running event loop, created on first use
+    """
+    if _default_client is not None:
+        return _default_client
+    loop = asyncio.get_running_loop()
+    for closed_loop in [other for other in _loop_default_clients if other.is_closed()]:
+        del _loop_default_clients[closed_loop]
+    if loop not in _loop_default_clients:
+        _loop_default_clients[loop] = AsyncTableauClient()
+    return _loop_default_clients[loop]
+
+def set_default_client(client):
+    """
+    replaces the AsyncTableauClient used when no client is passed to a function (None goes back to one shared client per loop)
+    """
+    global _default_client
+    _default_client = client
+
+def _get_client(client=None):
+    return client if client is not None else get_default_client()
+
+def _client_response_format(client=None, response_format=None):
+    return _check_response_format(response_format or _get_client(client).response_format)
+
+def _parse(server_response):
+    return _parse_xml(server_response.content)
+
+def _parse_timer(client, method, url):
+    instrumentation = _get_client(client).instrumentation
+    return instrumentation.parse_timer(method, url) if instrumentation is not None else contextlib.nullcontext()
+
+async def _get_page_records(url, token, xmlns, element_name, record_type, page_size, page_number, client=None, response_format=None):
+    # returns the page's records and the totalAvailable of the listing
+    response_format = _client_response_format(client, response_format)
+    paged_url = _paged_url(url, page_size, page_number)
+    server_response = await _get_client(client).get(paged_url, token, headers=_format_headers(response_format))
+    _check_status(server_response, 200, xmlns)
+    with _parse_timer(client, 'GET', paged_url):
+        records, total_available = _response_records(server_response, xmlns, element_name, record_type, response_format)
+    return records, total_available if total_available is not None else len(records)
+
+async def _query_all_pages(url, token, xmlns, element_name, record_type, client=None, page_size=1000, response_format=None):
+    """
+    async version of tableau_rest._query_all_pages: reads the first page for totalAvailable, then gathers the
+    remaining pages (the client's concurrency limit bounds how many are in flight) and returns the records in page order
+    """
+    records, total_available = await _get_page_records(url, token, xmlns, element_name, record_type, page_size, 1, client, response_format)
+    page_count = -(-total_available // page_size)
+    pages = await asyncio.gather(*[_get_page_records(url, token, xmlns, element_name, record_type, page_size, page_number, client, response_format) for page_number in range(2, page_count + 1)])
+    for page_records, _ in pages:
+        records.extend(page_records)
+    return records
+
+async def sign_in(server, username, password, VERSION, xmlns, site="", client=None):
+    """
+    same as tableau_rest.sign_in; returns token, site_id and user_id
+    client: optional AsyncTableauClient; the token is also stored on it as the default x-tableau-auth header
+    """
+    url = server + "/api/{0}/auth/signin".format(VERSION)
+    xml_request = ET.Element('tsRequest')
+    credentials_element = ET.SubElement(xml_request, 'credentials', name=username, password=password)
+    ET.SubElement(credentials_element, 'site', contentUrl=site)
+    xml_request = ET.tostring(xml_request)
+    server_response = await _get_client(client).post(url, data=xml_request)
+    _check_status(server_response, 200, xmlns)
+    parsed_response = _parse(server_response)
+    token = parsed_response.find('t:credentials', namespaces = xmlns).get('token')
+    site_id = parsed_response.find('.//t:site', namespaces = xmlns).get('id')
+    user_id = parsed_response.find('.//t:user', namespaces = xmlns).get('id')
+    if client is not None:
+        client.set_token(token)
+    return token, site_id, user_id
+
+async def sign_out(server, VERSION, xmlns, client=None, token=None):
+    # token: the token to invalidate; when omitted the client's default token is sent
+    ### POST /api/api-version/auth/signout
+    url = server + "/api/{0}/auth/signout".format(VERSION)
+    server_response = await _get_client(client).post(url, token)
+    _check_status(server_response, 204, xmlns)
+
+async def query_projects(VERSION, site_id, token, server, xmlns, client=None, page_size=1000, filter=None, sort=None, fields=None, response_format=None):
+    # returns a tableau_rest.QueryProjects object
+    url = server + "/api/{0}/sites/{1}/projects".format(VERSION, site_id) + _query_string('projects', filter, sort, _listing_fields(fields))
+    records = await _query_all_pages(url, token, xmlns, 'project', ProjectRecord, client, page_size, response_format)
+    return QueryProjects(VERSION, site_id, token, server, xmlns, records=records, filter=filter, sort=sort, fields=fields)
+
+async def query_workbooks(VERSION, site_id, token, server, xmlns, client=None, page_size=1000, filter=None, sort=None, fields=None, response_format=None):
+    # returns a tableau_rest.QueryWorkbooks object
+    url = server + "/api/{0}/sites/{1}/workbooks".format(VERSION, site_id) + _query_string('workbooks', filter, sort, _listing_fields(fields))
+    records = await _query_all_pages(url, token, xmlns, 'workbook', WorkbookRecord, client, page_size, response_format)
+    return QueryWorkbooks(VERSION, site_id, token, server, xmlns, records=records, filter=filter, sort=sort, fields=fields)
+
+async def query_workbook_views(VERSION, site_id, token, server, xmlns, workbook_id, client=None, response_format=None):
+    # returns a tableau_rest.QueryWorkbookViews object
+    response_format = _client_response_format(client, response_format)
+    url = server + "/api/{0}/sites/{1}/workbooks/{2}/views".format(VERSION, site_id, workbook_id)
+    server_response = await _get_client(client).get(url, token, headers=_format_headers(response_format))
+    _check_status(server_response, 200, xmlns)
+    records = _workbook_view_records(server_response, xmlns, workbook_id, response_format)
+    return QueryWorkbookViews(VERSION, site_id, token, server, xmlns, workbook_id, records=records)
+
+async def view_index(VERSION, site_id, token, server, xmlns, client=None, page_size=1000, filter=None, sort=None, response_format=None):
+    # returns a tableau_rest.ViewIndex object
+    url = server + "/api/{0}/sites/{1}/views".format(VERSION, site_id) + _query_string('views', filter, sort)
+    records = await _query_all_pages(url, token, xmlns, 'view', ViewRecord, client, page_size, response_format)
+    return ViewIndex(VERSION, site_id, token, server, xmlns, records=records, filter=filter, sort=sort)
+
+async def query_groups(VERSION, site_id, token, server, xmlns, client=None, page_size=1000, filter=None, sort=None, fields=None, response_format=None):
+    # returns a tableau_rest.QueryGroups object
+    url = server + "/api/{0}/sites/{1}/groups".format(VERSION, site_id) + _query_string('groups', filter, sort, _listing_fields(fields))
+    records = await _query_all_pages(url, token, xmlns, 'group', GroupRecord, client, page_size, response_format)
+    return QueryGroups(VERSION, site_id, token, server, xmlns, records=records, filter=filter, sort=sort, fields=fields)
+
+async def query_users(VERSION, site_id, token, server, xmlns, client=None, page_size=1000, filter=None, sort=None, fields=None, response_format=None):
+    # returns a tableau_rest.QueryUsers object
+    url = server + "/api/{0}/sites/{1}/users".format(VERSION, site_id) + _query_string('users', filter, sort, _listing_fields(fields))
+    records = await _query_all_pages(url, token, xmlns, 'user', UserRecord, client, page_size, response_format)
+    return QueryUsers(VERSION, site_id, token, server, xmlns, records=records, filter=filter, sort=sort, fields=fields)
+
+async def query_view_data(VERSION, site_id, token, xmlns, view_id, server, client=None, filters=None):
+    # GET /api/api-version/sites/site-id/views/view-id/data
+    url = _view_data_url(VERSION, site_id, server, view_id, filters)
+    server_response = await _get_client(client).get(url, token)
+    _check_status(server_response, 200, xmlns)
+    return server_response.content.decode(_csv_encoding(server_response.headers), errors='replace')
+
+async def _query_group_users(VERSION, site_id, token, group_id, server, xmlns, client=None, page_size=1000):
+    # GET /api/api-version/sites/site-id/groups/group-id/users?pageSize=page-size&pageNumber=page-number
+    url = server + "/api/{0}/sites/{1}/groups/{2}/users".format(VERSION, site_id, group_id)
+    return await _query_all_pages(url, token, xmlns, 'user', UserRecord, client, page_size)
+
+async def users_in_group(VERSION, site_id, token, group_id, server, xmlns, client=None):
+    # returns the names of every user in the group
+    return [user.name for user in await _query_group_users(VERSION, site_id, token, group_id, server, xmlns, client)]
+
+async def user_ids_in_group(VERSION, site_id, token, group_id, server, xmlns, client=None):
+    # returns the ids of every user in the group
+    return [user.id for user in await _query_group_users(VERSION, site_id, token, group_id, server, xmlns, client)]
+
+async def groups_for_user(VERSION, site_id, token, user_id, server, xmlns, client=None):
+    # returns the names of the user's groups, excluding All Users
+    url = server + "/api/{0}/sites/{1}/users/{2}/groups".format(VERSION, site_id, user_id)
+    groups = await _query_all_pages(url, token, xmlns, 'group', GroupRecord, client)
+    return [group.name for group in groups if group.name != 'All Users']
+
+async def _query_permission_grants(VERSION, site_id, token, server, xmlns, project_id, permissions_obj, client=None, response_format=None):
+    response_format = _client_response_format(client, response_format)
+    server_response = await _get_client(client).get(_permissions_url(VERSION, site_id, server, project_id, permissions_obj), token, headers=_format_headers(response_format))
+    _check_status(server_response, 200, xmlns)
+    return _response_permission_grants(server_response, xmlns, permissions_obj, response_format)
+
+async def query_default_permissions(VERSION, site_id, token, server, xmlns, project_id, client=None, response_format=None):
+    # returns a tableau_rest.QueryDefaultPermissions object; the five permissions requests are sent concurrently
+    grant_lists = await asyncio.gather(*[_query_permission_grants(VERSION, site_id, token, server, xmlns, project_id, permissions_obj, client, response_format) for permissions_obj in _permissions_objects])
+    return QueryDefaultPermissions(VERSION, site_id, token, server, xmlns, project_id, grants=[grant for grant_list in grant_lists for grant in grant_list])
+
+async def bulk_query_default_permissions(VERSION, site_id, token, server, xmlns, project_ids, client=None, response_format=None):
+    # returns a dictionary of project id -> tableau_rest.QueryDefaultPermissions object
+    project_ids = list(project_ids)
+    permissions = await asyncio.gather(*[query_default_permissions(VERSION, site_id, token, server, xmlns, project_id, client, response_format) for project_id in project_ids])
+    return dict(zip(project_ids, permissions))
+
+async def add_permissions(VERSION, site_id, token, server, xmlns, permissions_obj, proj_id, perm_dict, client=None):
+    # same as tableau_rest.WriteDefaultPermissions(...).add_permissions(perm_dict); returns the granted (users_or_groups, id, permissions_obj, capability name, mode) tuples
+    if permissions_obj not in _permissions_objects:
+        raise ValueError("invalid argument: must be one of %r." % set(_permissions_objects))
+    url = _permissions_url(VERSION, site_id, server, proj_id, permissions_obj)
+    server_response = await _get_client(client).put(url, token, data=_permissions_request(perm_dict, permissions_obj))
+    _check_status(server_response, 200, xmlns)
+    return _parse_permission_grants(_parse(server_response), xmlns, permissions_obj)
+
+async def delete_permissions(VERSION, site_id, token, server, xmlns, permissions_obj, proj_id, perm_dict, client=None):
+    # same as tableau_rest.WriteDefaultPermissions(...).delete_permissions(perm_dict); every DELETE is sent concurrently
+    if permissions_obj not in _permissions_objects:
+        raise ValueError("invalid argument: must be one of %r." % set(_permissions_objects))
+    deletions = []
+    for group_or_user in perm_dict.keys():
+        for id in perm_dict[group_or_user].keys():
+            for cap_name, cap_mode in perm_dict[group_or_user][id][permissions_obj].items():
+                deletions.append((group_or_user, id, cap_name, cap_mode))
+
+    async def delete(deletion):
+        server_response = await _get_client(client).delete(_permission_delete_url(VERSION, site_id, server, proj_id, permissions_obj, deletion), token)
+        _check_status(server_response, 204, xmlns)
+
+    await asyncio.gather(*[delete(deletion) for deletion in deletions])
+
+async def add_group(VERSION, site_id, token, server, xmlns, group_name, min_site_role = 'Viewer', client=None):
+    # POST /api/api-version/sites/site-id/groups; returns group name, group id and minimum site role
+    url = server + "/api/{0}/sites/{1}/groups".format(VERSION, site_id)
+    xml_request = ET.Element('tsRequest')
+    ET.SubElement(xml_request, 'group', name=group_name, minimumSiteRole=min_site_role)
+    server_response = await _get_client(client).post(url, token, data=ET.tostring(xml_request))
+    _check_status(server_response, 201, xmlns)
+    _invalidate_snapshots(server, site_id, 'groups')
+    new_group = _parse(server_response).find('.//t:group', namespaces=xmlns)
+    return new_group.get('name'), new_group.get('id'), new_group.get('minimumSiteRole')
+
+async def add_user(VERSION, site_id, token, server, xmlns, user_name, site_role, client=None):
+    # POST /api/api-version/sites/site-id/users; returns user name and site role
+    url = server + "/api/{0}/sites/{1}/users".format(VERSION, site_id)
+    xml_request = ET.Element('tsRequest')
+    ET.SubElement(xml_request, 'user', name=user_name, siteRole=site_role)
+    server_response = await _get_client(client).post(url, token, data=ET.tostring(xml_request))
+    _check_status(server_response, 201, xmlns)
+    _invalidate_snapshots(server, site_id, 'users')
+    new_user = _parse(server_response).find('.//t:user', namespaces=xmlns)
+    return new_user.get('name'), new_user.get('siteRole')
+
+async def add_user_to_group(VERSION, site_id, token, server, xmlns, group_id, user_id, client=None):
+    # POST /api/api-version/sites/site-id/groups/group-id/users; returns user name and user id
+    url = server + "/api/{0}/sites/{1}/groups/{2}/users".format(VERSION, site_id, group_id)
+    xml_request = ET.Element('tsRequest')
+    ET.SubElement(xml_request, 'user', id=user_id)
+    server_response = await _get_client(client).post(url, token, data=ET.tostring(xml_request))
+    _check_status(server_response, 200, xmlns)
+    new_user = _parse(server_response).find('.//t:user', namespaces=xmlns)
+    return new_user.get('name'), new_user.get('id')
+
+async def create_project(VERSION, site_id, token, server, xmlns, in_project_name, in_description, in_contentpermissions= 'LockedToProject', client=None):
+    # POST /api/api-version/sites/site-id/projects; returns a ProjectRecord for the new project
+    url = server + "/api/{0}/sites/{1}/projects".format(VERSION, site_id)
+    xml_request = ET.Element('tsRequest')
+    ET.SubElement(xml_request, 'project', name = in_project_name, description = in_description, contentPermissions = in_contentpermissions)
+    server_response = await _get_client(client).post(url, token, data=ET.tostring(xml_request))
+    _check_status(server_response, 201, xmlns)
+    _invalidate_snapshots(server, site_id, 'projects')
+    return _record_from_element(ProjectRecord, _parse(server_response).find('.//t:project', namespaces=xmlns), xmlns)
+
+async def _update_project(VERSION, site_id, token, server, xmlns, project_id, client=None, **project_attributes):
+    # PUT /api/api-version/sites/site-id/projects/project-id; returns a ProjectRecord for the updated project
+    url = server + "/api/{0}/sites/{1}/projects/{2}".format(VERSION, site_id, project_id)
+    xml_request = ET.Element('tsRequest')
+    ET.SubElement(xml_request, 'project', **project_attributes)
+    server_response = await _get_client(client).put(url, token, data=ET.tostring(xml_request))
+    _check_status(server_response, 200, xmlns)
+    _invalidate_snapshots(server, site_id, 'projects', 'workbooks')
+    return _record_from_element(ProjectRecord, _parse(server_response).find('.//t:project', namespaces=xmlns), xmlns)
+
+async def update_project_name(VERSION, site_id, token, server, xmlns, project_id, new_proj_name, client=None):
+    return await _update_project(VERSION, site_id, token, server, xmlns, project_id, client, name = new_proj_name)
+
+async def update_project_contentpermissions(VERSION, site_id, token, project_id, server, xmlns, new_content_permissions, client=None):
+    if new_content_permissions not in {"LockedToProject", "ManagedByOwner", "LockedToProjectWithoutNested"}:
+        raise ValueError("invalid argument content permissions: must be LockedToProject, ManagedByOwner, or LockedToProjectWithoutNested")
+    return await _update_project(VERSION, site_id, token, server, xmlns, project_id, client, contentPermissions = new_content_permissions)
+
+async def _delete(url, token, xmlns, client=None):
+    server_response = await _get_client(client).delete(url, token)
+    _check_status(server_response, 204, xmlns)
+
+async def delete_project(VERSION, site_id, token, server, xmlns, project_id, client=None):
+    # DELETE /api/api-version/sites/site-id/projects/project-id
+    await _delete(server + "/api/{0}/sites/{1}/projects/{2}".format(VERSION, site_id, project_id), token, xmlns, client)
+    # the project's workbooks and their views are deleted with it
+    _invalidate_snapshots(server, site_id, 'projects', 'workbooks', 'views')
+
+async def delete_group(VERSION, site_id, token, server, xmlns, group_id, client=None):
+    # DELETE /api/api-version/sites/site-id/groups/group-id
+    await _delete(server + "/api/{0}/sites/{1}/groups/{2}".format(VERSION, site_id, group_id), token, xmlns, client)
+    _invalidate_snapshots(server, site_id, 'groups')
+
+async def delete_user(VERSION, site_id, token, server, xmlns, user_id, client=None):
+    # DELETE /api/api-version/sites/site-id/users/user-id
+    await _delete(server + "/api/{0}/sites/{1}/users/{2}".format(VERSION, site_id, user_id), token, xmlns, client)
+    _invalidate_snapshots(server, site_id, 'users')
+
+async def remove_user_from_group(VERSION, site_id, token, server, xmlns, group_id, user_id, client=None):
+    # DELETE /api/api-version/sites/site-id/groups/group-id/users/user-id
+    await _delete(server + "/api/{0}/sites/{1}/groups/{2}/users/{3}".format(VERSION, site_id, group_id, user_id), token, xmlns, client)
+
+async def update_user(VERSION, site_id, token, server, xmlns, user_id, new_name, new_email, new_password, new_siterole, client=None):
+    # PUT /api/api-version/sites/site-id/users/user-id
+    url = server + "/api/{0}/sites/{1}/users/{2}".format(VERSION, site_id, user_id)
+    xml_request = ET.Element('tsRequest')
+    ET.SubElement(xml_request, 'user', fullName = new_name, email = new_email, password = new_password, siteRole = new_siterole)
+    server_response = await _get_client(client).put(url, token, data=ET.tostring(xml_request))
+    _check_status(server_response, 200, xmlns)
+    _invalidate_snapshots(server, site_id, 'users')
+
+async def add_user_permission_to_project(VERSION, site_id, token, server, xmlns, project_id, user_id, cap_name, cap_mode, client=None):
+    # PUT /api/api-version/sites/site-id/projects/project-id/permissions; returns capability name, capability mode and user id
+    perm_dict = {'users': {user_id: {"project": {cap_name: cap_mode}}}}
+    await add_permissions(VERSION, site_id, token, server, xmlns, "project", project_id, perm_dict, client)
+    return cap_name, cap_mode, user_id
+
+async def delete_user_permission_from_project(VERSION, site_id, token, server, xmlns, project_id, user_id, cap_name, cap_mode, client=None):
+    # DELETE /api/api-version/sites/site-id/projects/project-id/permissions/users/user-id/capability-name/capability-mode
+    await _delete(_permission_delete_url(VERSION, site_id, server, project_id, "project", ('users', user_id, cap_name, cap_mode)), token, xmlns, client)
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tableau_rest
+from tableau_mock_server import MockTableauServer, SyntheticSite, XMLNS
+
+VERSION = '3.11'
+xmlns = {'t': XMLNS}
+
+
+@pytest.fixture
+def site():
+    return SyntheticSite.generate(users=250, groups=10, projects=8, workbooks=60, views_per_workbook=2, seed=1)
+
+@pytest.fixture
+def server(site):
+    with MockTableauServer(site) as server:
+        yield server
+
+@pytest.fixture
+def client():
+    with tableau_rest.TableauClient(scheduler=tableau_rest.RequestScheduler(backoff=0)) as client:
+        yield client
+
+@pytest.fixture
+def args(server, client):
+    # (VERSION, site_id, token, server, xmlns), the arguments every listing and write function starts with
+    token, site_id, user_id = tableau_rest.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+    return VERSION, site_id, token, server.url, xmlns
+
+@pytest.fixture(autouse=True)
+def restore_module_defaults():
+    yield
+    tableau_rest.set_xml_parser('expat')
+    tableau_rest.set_default_cache(None)
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+import tableau_rest
+import tableau_rest_async
+from conftest import VERSION, xmlns
+
+
+def _client(**options):
+    return tableau_rest_async.AsyncTableauClient(scheduler=tableau_rest.RequestScheduler(backoff=0), **options)
+
+
+def test_transient_failures_are_retried(server):
+    async def run():
+        async with _client() as client:
+            token, site_id, user_id = await tableau_rest_async.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+            server.fail_next([503, 429])
+            return await tableau_rest_async.query_users(VERSION, site_id, token, server.url, xmlns, client=client)
+    assert len(asyncio.run(run()).users) == 250
+    assert [status for method, path, status in server.calls if '/users' in path] == [503, 429, 200]
+
+def test_post_is_not_retried_after_server_error(server):
+    async def run():
+        async with _client() as client:
+            token, site_id, user_id = await tableau_rest_async.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+            server.fail_next([500])
+            await tableau_rest_async.add_group(VERSION, site_id, token, server.url, xmlns, 'new group', client=client)
+    with pytest.raises(tableau_rest.ApiCallError):
+        asyncio.run(run())
+    assert [status for method, path, status in server.calls if method == 'POST' and path.endswith('/groups')] == [500]
+
+def test_adaptive_limit_follows_the_scheduler(server):
+    scheduler = tableau_rest.RequestScheduler(backoff=0, max_concurrency=8, min_concurrency=1, initial_concurrency=4)
+
+    async def run():
+        async with tableau_rest_async.AsyncTableauClient(scheduler=scheduler) as client:
+            token, site_id, user_id = await tableau_rest_async.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+            assert client.limit.limit > 4
+            server.fail_next([503])
+            await tableau_rest_async.query_groups(VERSION, site_id, token, server.url, xmlns, client=client)
+            return client.limit
+    limit = asyncio.run(run())
+    assert limit.in_flight == 0
+    assert limit.limit < 4
+
+def test_client_refuses_another_event_loop(server):
+    client = _client()
+
+    async def sign_in():
+        await tableau_rest_async.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+    asyncio.run(sign_in())
+    with pytest.raises(RuntimeError):
+        asyncio.run(sign_in())
+
+def test_default_client_is_per_event_loop():
+    async def default_client():
+        return tableau_rest_async.get_default_client()
+    assert asyncio.run(default_client()) is not asyncio.run(default_client())
+
+def test_groups_for_user_matches_the_sync_function(server, site, client, args):
+    user_id = site.users[3]['id']
+
+    async def run():
+        async with _client() as client:
+            token, site_id, _ = await tableau_rest_async.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+            return await tableau_rest_async.groups_for_user(VERSION, site_id, token, user_id, server.url, xmlns, client=client)
+    group_names = tableau_rest.groups_for_user(args[0], args[1], args[2], user_id, server.url, xmlns, client)
+    assert asyncio.run(run()) == group_names
+    assert sorted(group_names) == sorted(group['name'] for group in site.groups if user_id in site.members[group['id']] and group['name'] != 'All Users')
+
+def test_query_view_data_sends_filters(server, site, client, args):
+    view_id = site.views[0]['id']
+    filters = {'Region': ['East', 'West'], 'Year': 2021}
+
+    async def run():
+        async with _client() as client:
+            token, site_id, _ = await tableau_rest_async.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+            return await tableau_rest_async.query_view_data(VERSION, site_id, token, xmlns, view_id, server.url, client=client, filters=filters)
+    assert asyncio.run(run()) == tableau_rest.query_view_data(args[0], args[1], args[2], xmlns, view_id, server.url, client, filters=filters)
+    assert [path.split('?')[1] for method, path, status in server.calls if '/data' in path] == ['vf_Region=East,West&vf_Year=2021'] * 2
+
+def test_session_signs_in_again_after_tokens_expire(server):
+    async def run():
+        async with tableau_rest_async.AsyncTableauSession(server.url, 'admin', 'password', VERSION, xmlns, scheduler=tableau_rest.RequestScheduler(backoff=0)) as session:
+            token = session.token
+            server.expire_tokens()
+            # gathered calls hit the same expired token; only one of them signs in again
+            results = await asyncio.gather(*[tableau_rest_async.query_groups(VERSION, session.site_id, token, server.url, xmlns, client=session) for _ in range(5)])
+            assert session.token != token
+            await session.sign_out()
+            await session.close()
+            return results
+    # ten groups plus All Users
+    assert all(len(groups_obj.groups) == 11 for groups_obj in asyncio.run(run()))
+    assert len([path for method, path, status in server.calls if path.endswith('/auth/signin')]) == 2
+
+def test_query_view_data_drops_the_byte_order_mark(server, site):
+    async def run():
+        async with _client() as client:
+            token, site_id, user_id = await tableau_rest_async.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+            return await tableau_rest_async.query_view_data(VERSION, site_id, token, xmlns, site.views[0]['id'], server.url, client=client)
+    assert asyncio.run(run()).startswith('Region,')
+
+def test_delete_project_invalidates_cached_views(server, tmp_path):
+    cache = tableau_rest.SnapshotCache(str(tmp_path / 'snapshots'))
+
+    async def run():
+        async with _client() as client:
+            token, site_id, user_id = await tableau_rest_async.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+            view_index = await tableau_rest_async.view_index(VERSION, site_id, token, server.url, xmlns, client=client)
+            cache.put(server.url, site_id, 'views', view_index.views)
+            project_id = view_index.views[0].project_id
+            await tableau_rest_async.delete_project(VERSION, site_id, token, server.url, xmlns, project_id, client=client)
+            return site_id
+    site_id = asyncio.run(run())
+    assert cache.get(server.url, site_id, 'views', tableau_rest.ViewRecord) is None
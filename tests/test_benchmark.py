@@ -0,0 +1,51 @@
+import io
+import json
+
+import requests
+
+import tableau_benchmark
+import tableau_rest
+from tableau_mock_server import MockTableauServer, SyntheticSite
+from conftest import VERSION, xmlns
+
+
+_small_site = ['--users', '60', '--groups', '4', '--projects', '4', '--workbooks', '6', '--views-per-workbook', '2', '--repeat', '1', '--lookups', '10']
+
+def test_synthetic_sites_are_reproducible():
+    first, second = (SyntheticSite.generate(users=50, groups=3, projects=3, workbooks=5, seed=7) for _ in range(2))
+    assert first.users == second.users and first.workbooks == second.workbooks and first.members == second.members
+    assert SyntheticSite.generate(users=50, groups=3, projects=3, workbooks=5, seed=8).users != first.users
+    # every user is in All Users plus memberships_per_user other groups
+    assert all(sum(user['id'] in members for members in first.members.values()) == 4 for user in first.users)
+
+def test_mock_server_enforces_auth_and_page_size(site, client):
+    with MockTableauServer(site, max_page_size=100) as server:
+        token, site_id, user_id = tableau_rest.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+        url = server.url + '/api/{0}/sites/{1}/users'.format(VERSION, site_id)
+        assert requests.get(url + '?pageSize=100').status_code == 401
+        assert requests.get(url + '?pageSize=101', headers={'x-tableau-auth': token}).status_code == 400
+        assert len(tableau_rest.QueryUsers(VERSION, site_id, token, server.url, xmlns, client=client, page_size=100, cache=False).users) == 250
+
+def test_mock_server_injects_errors_at_the_given_rate(site):
+    with MockTableauServer(site, error_rate=0.5, error_statuses=(503, 502), require_auth=False, seed=3) as server:
+        statuses = [requests.get(server.url + '/api/{0}/sites/{1}/groups'.format(VERSION, site.id)).status_code for _ in range(40)]
+    assert set(statuses) == {200, 502, 503}
+    assert 10 < statuses.count(200) < 30
+
+def test_every_scenario_runs_and_compares_with_a_baseline(tmp_path):
+    results_path = str(tmp_path / 'results.json')
+    tableau_benchmark.main(_small_site + ['--json', results_path])
+    with open(results_path) as f:
+        results = json.load(f)
+    assert list(results['scenarios']) == [name for name, group, function in tableau_benchmark._scenarios]
+    assert all(result['calls'] > 0 for result in results['scenarios'].values() if result['group'] != 'lookup')
+    assert all(result['calls'] == 0 for result in results['scenarios'].values() if result['group'] == 'lookup')
+    out = io.StringIO()
+    tableau_benchmark.report(results, baseline=results, out=out)
+    assert '1.00x' in out.getvalue().splitlines()[1]
+
+def test_only_runs_the_named_scenarios(site, server):
+    results = tableau_benchmark.run(server, site, repeat=1, lookups=10, only=['QueryUsers', 'user_id_from_name'])
+    assert list(results['scenarios']) == ['QueryUsers', 'user_id_from_name']
+    assert results['scenarios']['QueryUsers']['calls'] == 1
+    assert 'GET /api/{0}/sites/{{id}}/users'.format(VERSION) in results['instrumentation']['QueryUsers']
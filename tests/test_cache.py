@@ -0,0 +1,39 @@
+import pytest
+
+import tableau_rest
+from conftest import xmlns
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = tableau_rest.SnapshotCache(str(tmp_path / 'snapshots.sqlite'))
+    tableau_rest.set_default_cache(cache)
+    return cache
+
+def _listing_calls(server, resource):
+    return len([path for method, path, status in server.calls if method == 'GET' and path.split('?')[0].endswith('/' + resource)])
+
+def test_listings_are_read_from_a_fresh_snapshot(server, client, args, cache):
+    groups_obj = tableau_rest.QueryGroups(*args, client=client)
+    cached = tableau_rest.QueryGroups(*args, client=client)
+    assert (groups_obj.from_cache, cached.from_cache) == (False, True)
+    assert cached.groups == groups_obj.groups
+    assert _listing_calls(server, 'groups') == 1
+
+def test_writes_invalidate_the_snapshots_they_change(client, args, cache):
+    tableau_rest.QueryGroups(*args, client=client)
+    tableau_rest.QueryUsers(*args, client=client)
+    tableau_rest.add_group(*args, 'New Group', client=client)
+    groups_obj = tableau_rest.QueryGroups(*args, client=client)
+    assert not groups_obj.from_cache
+    assert 'New Group' in [group.name for group in groups_obj.groups]
+    # other resources keep their snapshot
+    assert tableau_rest.QueryUsers(*args, client=client).from_cache
+
+def test_delete_project_invalidates_workbooks_and_views(client, args, cache):
+    project_id = tableau_rest.QueryWorkbooks(*args, client=client).workbooks[0].project_id
+    tableau_rest.QueryProjects(*args, client=client)
+    tableau_rest.ViewIndex(*args, client=client)
+    tableau_rest.delete_project(*args, project_id, client=client)
+    for listing in (tableau_rest.QueryProjects, tableau_rest.QueryWorkbooks, tableau_rest.ViewIndex):
+        assert not listing(*args, client=client).from_cache, listing.__name__
@@ -0,0 +1,28 @@
+import tableau_rest
+from conftest import VERSION, xmlns
+
+
+def _connections(client, url):
+    # connections the client's pool has opened so far (the tests only talk to one host)
+    pools = client.session.get_adapter(url).poolmanager.pools
+    return sum(pools[key].num_connections for key in pools.keys())
+
+def test_calls_reuse_one_keep_alive_connection(server, client, args):
+    for _ in range(5):
+        tableau_rest.QueryGroups(*args, client=client, cache=False)
+    assert len(server.calls) == 6
+    assert _connections(client, server.url) == 1
+
+def test_token_passed_to_a_call_takes_precedence(server, args):
+    with tableau_rest.TableauClient(token='expired', scheduler=tableau_rest.RequestScheduler(backoff=0)) as client:
+        assert client.session.headers['x-tableau-auth'] == 'expired'
+        assert len(tableau_rest.QueryGroups(*args, client=client, cache=False).groups) == 11
+        client.set_token(None)
+        assert 'x-tableau-auth' not in client.session.headers
+
+def test_functions_fall_back_to_the_default_client(server, client, monkeypatch):
+    monkeypatch.setattr(tableau_rest, '_default_client', None)
+    assert tableau_rest.get_default_client() is tableau_rest.get_default_client()
+    tableau_rest.set_default_client(client)
+    tableau_rest.sign_in(server.url, 'admin', 'password', VERSION, xmlns)
+    assert _connections(client, server.url) == 1
@@ -0,0 +1,67 @@
+import io
+import os
+
+import requests
+
+import tableau_rest
+
+
+def _content(server, workbook):
+    # what the mock server serves for a workbook
+    return (workbook['id'].encode() * (server.workbook_size // 36 + 1))[:server.workbook_size]
+
+def _download(args, workbook_id, path, client, **options):
+    VERSION, site_id, token, url, xmlns = args
+    return tableau_rest.download_workbook(VERSION, site_id, token, xmlns, workbook_id, url, client=client, path=path, **options)
+
+def _content_calls(server):
+    return [status for method, path, status in server.calls if '/content' in path]
+
+def test_download_resumes_from_a_part_file(site, server, client, args, tmp_path):
+    workbook = site.workbooks[0]
+    content = _content(server, workbook)
+    (tmp_path / (workbook['id'] + '.part')).write_bytes(content[:300000])
+    path = _download(args, workbook['id'], str(tmp_path), client)
+    assert path == str(tmp_path / (workbook['contentUrl'] + '.twbx'))
+    assert open(path, 'rb').read() == content
+    assert _content_calls(server) == [206]
+    assert os.listdir(str(tmp_path)) == [workbook['contentUrl'] + '.twbx']
+
+def test_part_file_the_server_cannot_resume_is_replaced(site, server, client, args, tmp_path):
+    workbook = site.workbooks[0]
+    target = tmp_path / 'workbook.twbx'
+    (tmp_path / 'workbook.twbx.part').write_bytes(b'x' * (server.workbook_size + 10))
+    assert _download(args, workbook['id'], str(target), client) == str(target)
+    assert target.read_bytes() == _content(server, workbook)
+    assert _content_calls(server) == [416, 200]
+
+def test_interrupted_transfer_is_resumed(site, server, client, args, tmp_path, monkeypatch):
+    stream_to_file = tableau_rest._stream_to_file
+    interruptions = [requests.exceptions.ChunkedEncodingError('connection dropped')]
+
+    def interrupted(server_response, f, chunk_size):
+        if not interruptions:
+            return stream_to_file(server_response, f, chunk_size)
+        # writes the first chunk, then loses the connection
+        f.write(next(server_response.iter_content(chunk_size=chunk_size)))
+        raise interruptions.pop()
+    monkeypatch.setattr(tableau_rest, '_stream_to_file', interrupted)
+    workbook = site.workbooks[1]
+    target = tmp_path / 'workbook.twbx'
+    _download(args, workbook['id'], str(target), client, chunk_size=65536)
+    assert target.read_bytes() == _content(server, workbook)
+    assert _content_calls(server) == [200, 206]
+
+def test_file_objects_are_written_in_one_pass(site, server, client, args):
+    workbook = site.workbooks[0]
+    buffer = io.BytesIO()
+    assert _download(args, workbook['id'], buffer, client) is buffer
+    assert buffer.getvalue() == _content(server, workbook)
+
+def test_failed_downloads_do_not_stop_the_others(site, server, client, args, tmp_path):
+    VERSION, site_id, token, url, xmlns = args
+    workbook_ids = [workbook['id'] for workbook in site.workbooks[:3]] + ['missing']
+    report = tableau_rest.download_workbooks(VERSION, site_id, token, xmlns, workbook_ids, url, directory=str(tmp_path), max_workers=4, client=client)
+    assert sorted(report['downloaded']) == sorted(workbook_ids[:3])
+    assert list(report['failed']) == ['missing']
+    assert all(os.path.getsize(path) == server.workbook_size for path in report['downloaded'].values())
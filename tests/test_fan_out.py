@@ -0,0 +1,31 @@
+import tableau_rest
+from tableau_mock_server import MockTableauServer, SyntheticSite
+from conftest import VERSION, xmlns
+
+
+def test_records_are_taken_from_every_listing_class():
+    sites = {content_url: SyntheticSite.generate(users=20, groups=3, projects=2, workbooks=4, views_per_workbook=2, seed=seed) for seed, content_url in enumerate(['', 'finance'])}
+    with MockTableauServer(sites) as server:
+        pool = tableau_rest.SessionPool(server.url, 'admin', 'password', VERSION, xmlns, scheduler=tableau_rest.RequestScheduler(backoff=0))
+        inventory = tableau_rest.fan_out(pool, {'users': tableau_rest.QueryUsers, 'views': tableau_rest.ViewIndex}, sites=['', 'finance'])
+        pool.close()
+    assert inventory.errors == {}
+    for name, records in (('users', 'users'), ('views', 'views')):
+        rows = inventory.records(name)
+        assert len(rows) == sum(len(getattr(sites[content_url], records)) for content_url in sites)
+        assert {content_url for content_url, record in rows} == {'', 'finance'}
+
+def test_a_failing_query_does_not_stop_the_others():
+    sites = {content_url: SyntheticSite.generate(users=5, groups=1, projects=1, workbooks=1, seed=seed) for seed, content_url in enumerate(['', 'finance'])}
+
+    def broken(VERSION, site_id, token, server, xmlns, client=None):
+        if site_id == sites['finance'].id:
+            raise KeyError('owner')
+        return []
+    with MockTableauServer(sites) as server:
+        pool = tableau_rest.SessionPool(server.url, 'admin', 'password', VERSION, xmlns, scheduler=tableau_rest.RequestScheduler(backoff=0))
+        inventory = tableau_rest.fan_out(pool, {'groups': tableau_rest.QueryGroups, 'broken': broken}, sites=['', 'finance'])
+        pool.close()
+    assert inventory.errors == {('finance', 'broken'): "KeyError('owner')"}
+    assert set(inventory.results['groups']) == {'', 'finance'}
+    assert inventory.results['broken'] == {'': []}
@@ -0,0 +1,42 @@
+import pytest
+
+import tableau_rest
+
+
+def test_filter_expressions_are_combined_and_encoded():
+    combined = tableau_rest.Filter('projectName', 'eq', 'Sales & Ops') & tableau_rest.Filter('updatedAt', 'gte', '2021-01-01T00:00:00Z')
+    assert str(combined) == 'projectName:eq:Sales & Ops,updatedAt:gte:2021-01-01T00:00:00Z'
+    assert tableau_rest._query_string('workbooks', combined, ['name:desc', 'createdAt'], ['id', 'name']) == \
+        '?filter=projectName:eq:Sales%20%26%20Ops,updatedAt:gte:2021-01-01T00:00:00Z&sort=name:desc,createdAt:asc&fields=id,name'
+    assert tableau_rest._query_string('users', tableau_rest.Filter('siteRole', 'in', ['Viewer', 'Creator'])) == '?filter=siteRole:in:[Viewer,Creator]'
+    assert tableau_rest._query_string('users') == ''
+
+@pytest.mark.parametrize('field, operator, value', [('name', 'like', 'a'), ('name', 'in', 'a'), ('name', 'in', []), ('name', 'eq', 'a,b')])
+def test_invalid_filters_are_rejected(field, operator, value):
+    with pytest.raises(ValueError):
+        tableau_rest.Filter(field, operator, value)
+
+@pytest.mark.parametrize('resource, filter, sort, fields', [('groups', tableau_rest.Filter('siteRole', 'eq', 'Viewer'), None, None),
+                                                            ('users', tableau_rest.Filter('name', 'gt', 'b'), None, None),
+                                                            ('projects', None, 'size', None), ('projects', None, 'name:up', None),
+                                                            ('views', None, None, ['id', 'name&x=1'])])
+def test_fields_and_operators_are_checked_against_the_listing(resource, filter, sort, fields):
+    with pytest.raises(ValueError):
+        tableau_rest._query_string(resource, filter, sort, fields)
+
+def test_listings_are_filtered_and_sorted_by_the_server(site, client, args):
+    viewers = tableau_rest.QueryUsers(*args, client=client, filter=tableau_rest.Filter('siteRole', 'eq', 'Viewer'), sort='name:desc')
+    expected = sorted((user['name'] for user in site.users if user['siteRole'] == 'Viewer'), reverse=True)
+    assert viewers.user_names == expected
+    project_names = [project['name'] for project in site.projects[:2]]
+    workbooks_obj = tableau_rest.QueryWorkbooks(*args, client=client, filter=tableau_rest.Filter('projectName', 'in', project_names))
+    assert sorted(workbooks_obj.workbook_ids) == sorted(workbook['id'] for workbook in site.workbooks if workbook['projectName'] in project_names)
+
+def test_fields_trim_the_records_but_keep_id_and_name(site, server, client, args):
+    projects_obj = tableau_rest.QueryProjects(*args, client=client, fields=['createdAt'])
+    assert [path.split('fields=')[1].split('&')[0] for method, path, status in server.calls if '/projects?' in path] == ['id,name,createdAt']
+    project = projects_obj.projects[0]
+    assert (project.id, project.name, project.created_at) == tuple(site.projects[0][key] for key in ('id', 'name', 'createdAt'))
+    assert project.description is None
+    with pytest.raises(ValueError):
+        projects_obj.refresh(args[2])
@@ -0,0 +1,18 @@
+import tableau_rest
+
+
+def test_sync_groups_members_reads_each_group_one_page_at_a_time(site, client, args, monkeypatch):
+    query_group_users = tableau_rest._query_group_users
+    inner_workers = []
+
+    def spy(*arguments, **options):
+        inner_workers.append(options.get('max_workers'))
+        return query_group_users(*arguments, **options)
+    monkeypatch.setattr(tableau_rest, '_query_group_users', spy)
+    groups = [group for group in site.groups if group['name'] != 'All Users'][:3]
+    users = [user['id'] for user in site.users[:5]]
+    reports = tableau_rest.sync_groups_members(*args, {group['id']: users for group in groups}, max_workers=4, client=client)
+    assert inner_workers == [1, 1, 1]
+    for group in groups:
+        assert sorted(tableau_rest.user_ids_in_group(args[0], args[1], args[2], group['id'], args[3], args[4], client)) == sorted(users)
+        assert reports[group['id']]['failed'] == {}
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+import tableau_rest
+from conftest import VERSION, xmlns
+
+
+@pytest.fixture
+def instrumentation(client):
+    client.instrumentation = tableau_rest.Instrumentation()
+    return client.instrumentation
+
+def test_calls_are_counted_per_endpoint(site, server, client, args, instrumentation):
+    for group in site.groups[1:4]:
+        tableau_rest.user_ids_in_group(*args[:3], group['id'], args[3], xmlns, client)
+    server.fail_next([404])
+    with pytest.raises(tableau_rest.ApiCallError):
+        tableau_rest.delete_group(*args, 'missing', client=client)
+    summary = instrumentation.summary()
+    members = summary['GET /api/{0}/sites/{{id}}/groups/{{id}}/users'.format(VERSION)]
+    assert (members['calls'], members['errors'], members['bytes_sent']) == (3, 0, 0)
+    assert members['bytes_received'] > 0
+    assert members['network']['count'] == members['parse']['count'] == 3
+    deletes = summary['DELETE /api/{0}/sites/{{id}}/groups/{{id}}'.format(VERSION)]
+    assert (deletes['calls'], deletes['errors'], deletes['parse']['count']) == (1, 1, 0)
+
+def test_hooks_see_every_attempt(server, client, args, instrumentation):
+    started, events = [], []
+    instrumentation.add_pre_hook(lambda method, url: started.append(method))
+    instrumentation.add_post_hook(events.append)
+    server.fail_next([503])
+    tableau_rest.QueryGroups(*args, client=client, cache=False)
+    assert started == ['GET', 'GET']
+    assert [event['status'] for event in events] == [503, 200]
+    assert events[0]['endpoint'] == 'GET /api/{0}/sites/{{id}}/groups'.format(VERSION)
+
+def test_histogram_quantiles_and_buckets():
+    histogram = tableau_rest._Histogram((0.1, 1, 10))
+    for seconds in (0.05, 0.05, 0.5, 5, 50):
+        histogram.observe(seconds)
+    exported = histogram.to_dict()
+    assert exported['buckets'] == {'0.1': 2, '1': 3, '10': 4, '+Inf': 5}
+    assert (exported['count'], exported['p50'], exported['p95']) == (5, 1, float('inf'))
+    assert exported['sum'] == pytest.approx(55.6)
+    assert tableau_rest._Histogram((1,)).quantile(0.5) is None
+
+def test_summary_exports_as_json_and_prometheus(client, args, instrumentation):
+    tableau_rest.QueryUsers(*args, client=client, cache=False)
+    endpoint = 'GET /api/{0}/sites/{{id}}/users'.format(VERSION)
+    assert json.loads(instrumentation.to_json())[endpoint]['calls'] == 1
+    lines = instrumentation.to_prometheus().splitlines()
+    labels = '{{method="GET",endpoint="/api/{0}/sites/{{id}}/users"}}'.format(VERSION)
+    assert 'tableau_rest_calls_total' + labels + ' 1' in lines
+    assert 'tableau_rest_network_seconds_count' + labels + ' 1' in lines
+    assert 'tableau_rest_network_seconds_bucket{{method="GET",endpoint="/api/{0}/sites/{{id}}/users",le="+Inf"}} 1'.format(VERSION) in lines
+    assert '# TYPE tableau_rest_parse_seconds histogram' in lines
+    instrumentation.reset()
+    assert instrumentation.summary() == {}
@@ -0,0 +1,36 @@
+import pytest
+
+import tableau_rest
+
+
+def _workbook(workbook_id, name, project_id):
+    return tableau_rest.WorkbookRecord(workbook_id, name, name, project_id, None, None, None, None)
+
+def test_lookups_agree_with_a_scan_of_the_listing(site, client, args):
+    users_obj = tableau_rest.QueryUsers(*args, client=client, cache=False)
+    for user in site.users[::25]:
+        assert users_obj.user_id_from_name(user['name']) == user['id']
+        assert users_obj.user_name_from_id(user['id']) == user['name']
+        assert users_obj.user_siterole_from_name(user['name']) == user['siteRole']
+    workbooks_obj = tableau_rest.QueryWorkbooks(*args, client=client, cache=False)
+    project_id = site.workbooks[0]['_project_id']
+    assert workbooks_obj.workbooks_from_projectid(project_id) == [workbook['name'] for workbook in site.workbooks if workbook['_project_id'] == project_id]
+
+def test_duplicate_names_resolve_to_the_first_record(args):
+    workbooks = [_workbook('1', 'Sales', 'a'), _workbook('2', 'Sales', 'b'), _workbook('3', 'Finance', 'a')]
+    workbooks_obj = tableau_rest.QueryWorkbooks(*args, records=workbooks)
+    assert workbooks_obj.workbook_id_from_name('Sales') == '1'
+    assert workbooks_obj.workbook_names == ['Sales', 'Sales', 'Finance']
+    assert workbooks_obj.workbooks_from_projectid('a') == ['Sales', 'Finance']
+
+def test_bulk_lookups_keep_the_order_of_the_keys(args):
+    workbooks_obj = tableau_rest.QueryWorkbooks(*args, records=[_workbook('1', 'Sales', 'a'), _workbook('2', 'Finance', 'a')])
+    assert workbooks_obj.ids_from_names(['Finance', 'Sales', 'Finance']) == ['2', '1', '2']
+    assert workbooks_obj.names_from_ids(['1', '2']) == ['Sales', 'Finance']
+
+def test_missing_keys_are_all_named(args):
+    workbooks_obj = tableau_rest.QueryWorkbooks(*args, records=[_workbook('1', 'Sales', 'a')])
+    with pytest.raises(ValueError, match='Marketing, HR not found'):
+        workbooks_obj.ids_from_names(['Marketing', 'Sales', 'HR'])
+    with pytest.raises(ValueError, match='Marketing not found'):
+        workbooks_obj.workbook_id_from_name('Marketing')
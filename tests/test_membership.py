@@ -0,0 +1,44 @@
+import pytest
+
+import tableau_rest
+
+
+@pytest.fixture
+def graph(client, args):
+    return tableau_rest.MembershipGraph(*args, max_workers=4, client=client)
+
+def _members(site, number):
+    return set(site.members[site.groups[number]['id']])
+
+def test_graph_is_built_with_one_members_read_per_group(site, server, graph):
+    assert len([path for method, path, status in server.calls if path.split('?')[0].endswith('/users') and '/groups/' in path]) == len(site.groups)
+    assert graph.group_users == {group_id: set(members) for group_id, members in site.members.items()}
+    user = site.users[100]
+    assert graph.groups_for_user(user['id']) == {group_id for group_id, members in site.members.items() if user['id'] in members}
+    assert graph.user_names[user['id']] == user['name']
+
+def test_set_operations(site, graph):
+    a, b, c = (site.groups[number]['id'] for number in (1, 2, 3))
+    assert graph.users_in_any([a, b]) == _members(site, 1) | _members(site, 2)
+    assert graph.users_in_all([a, b, c]) == _members(site, 1) & _members(site, 2) & _members(site, 3)
+    assert graph.users_in_a_not_b(a, b) == _members(site, 1) - _members(site, 2)
+    assert graph.users_in_all([]) == set()
+    with pytest.raises(ValueError):
+        graph.users_in_any([a, 'missing'])
+
+def test_save_and_load_round_trip(site, graph, tmp_path):
+    path = str(tmp_path / 'graph.json')
+    graph.save(path)
+    loaded = tableau_rest.MembershipGraph.load(path)
+    assert loaded.to_dict() == graph.to_dict()
+    assert loaded.site_id == graph.site_id
+    assert loaded.user_groups == graph.user_groups
+    # user0 is one of the non-ASCII names
+    assert loaded.user_names[site.users[0]['id']] == site.users[0]['name'] == 'üser0'
+    assert loaded.group_names == graph.group_names
+
+def test_graph_of_selected_groups(site, client, args):
+    group_ids = [group['id'] for group in site.groups[1:3]]
+    graph = tableau_rest.MembershipGraph(*args, group_ids=group_ids, client=client)
+    assert set(graph.group_users) == set(group_ids)
+    assert graph.users_in_any(group_ids) == _members(site, 1) | _members(site, 2)
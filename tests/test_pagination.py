@@ -0,0 +1,23 @@
+import pytest
+
+import tableau_rest
+from tableau_mock_server import MockTableauServer
+from conftest import VERSION, xmlns
+
+
+@pytest.mark.parametrize('listing, resource, page_size', [(tableau_rest.QueryUsers, 'users', 7), (tableau_rest.QueryWorkbooks, 'workbooks', 7),
+                                                          (tableau_rest.QueryProjects, 'projects', 3), (tableau_rest.QueryGroups, 'groups', 2)])
+def test_concurrent_pages_are_merged_in_page_order(site, client, listing, resource, page_size):
+    # jitter makes later pages finish before earlier ones
+    with MockTableauServer(site, jitter=0.02) as server:
+        token, site_id, user_id = tableau_rest.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+        listing_obj = listing(VERSION, site_id, token, server.url, xmlns, client=client, page_size=page_size, max_workers=4, cache=False)
+    records = getattr(listing_obj, listing._records_attribute)
+    assert [record.id for record in records] == [item['id'] for item in site.collection(resource)]
+    pages = sorted(int(path.split('pageNumber=')[1]) for method, path, status in server.calls if path.split('?')[0].endswith('/' + resource))
+    assert pages == list(range(1, -(-len(records) // page_size) + 1))
+
+def test_a_single_page_listing_makes_one_call(server, client, args):
+    groups_obj = tableau_rest.QueryGroups(*args, client=client, page_size=100, cache=False)
+    assert len(groups_obj.groups) == 11
+    assert len([path for method, path, status in server.calls if '/groups?' in path]) == 1
@@ -0,0 +1,39 @@
+import pytest
+
+import tableau_rest
+from conftest import VERSION, xmlns
+
+
+def _listings(args, client, project_id, workbook_id):
+    # every read path, in the format and with the parser currently selected
+    return {'projects': tableau_rest.QueryProjects(*args, client=client, cache=False).projects,
+            'workbooks': tableau_rest.QueryWorkbooks(*args, client=client, cache=False).workbooks,
+            'groups': tableau_rest.QueryGroups(*args, client=client, cache=False).groups,
+            'users': tableau_rest.QueryUsers(*args, client=client, cache=False).users,
+            'iter_users': list(tableau_rest.iter_users(*args, client=client, page_size=100)),
+            'views': tableau_rest.ViewIndex(*args, client=client, cache=False).views,
+            'workbook_views': tableau_rest.QueryWorkbookViews(*args, workbook_id, client=client).views,
+            'memberships': tableau_rest.MembershipGraph(*args, client=client).group_users,
+            'permissions': tableau_rest.QueryDefaultPermissions(*args, project_id, client=client).perm_dict}
+
+@pytest.fixture
+def baseline(site, client, args):
+    names = [project['name'] for project in site.projects]
+    project = next(project for project in site.projects if names.count(project['name']) == 1)
+    group = next(group for group in site.groups if group['name'] != 'All Users')
+    plan = {'permissions': {project['name']: {'project': {'groups': {group['name']: {'Read': 'Allow'}}},
+                                              'workbook': {'groups': {group['name']: {'Read': 'Allow', 'ExportData': 'Deny'}}}}}}
+    report = tableau_rest.execute_plan(*args, plan, client=client)
+    assert report['failed'] == 0
+    ids = project['id'], site.workbooks[0]['id']
+    return ids, _listings(args, client, *ids)
+
+@pytest.mark.parametrize('parser, response_format', [('etree', 'xml'), ('lxml', 'xml'), ('expat', 'json'), ('lxml', 'json')])
+def test_parsers_and_formats_give_identical_records(server, args, baseline, parser, response_format):
+    ids, expected = baseline
+    tableau_rest.set_xml_parser(parser)
+    with tableau_rest.TableauClient(scheduler=tableau_rest.RequestScheduler(backoff=0), response_format=response_format) as client:
+        listings = _listings(args, client, *ids)
+    for name in expected:
+        assert listings[name] == expected[name], name
+    assert all(expected.values())
@@ -0,0 +1,137 @@
+import random
+import time
+
+import pytest
+
+import tableau_rest
+from tableau_mock_server import MockTableauServer
+from conftest import VERSION, xmlns
+
+
+def _grant(site, project_id, permissions_obj, grantee_type, grantee_id, capabilities):
+    # writes grants straight into the mock server's store
+    site.permissions.setdefault((project_id, permissions_obj), {})[(grantee_type, grantee_id)] = dict(capabilities)
+
+def _permission_calls(server):
+    return [(method, path) for method, path, status in server.calls if 'permissions' in path]
+
+def test_every_content_type_is_read_into_perm_dict(site, server, client, args):
+    project_id, user_id, group_id = site.projects[0]['id'], site.users[1]['id'], site.groups[1]['id']
+    _grant(site, project_id, 'project', 'user', user_id, {'Read': 'Allow'})
+    _grant(site, project_id, 'workbook', 'group', group_id, {'ExportData': 'Deny', 'Read': 'Allow'})
+    permissions = tableau_rest.QueryDefaultPermissions(*args, project_id, client=client)
+    assert permissions.perm_dict['users'][user_id]['project'] == {'Read': 'Allow'}
+    assert permissions.perm_dict['groups'][group_id]['workbook'] == {'ExportData': 'Deny', 'Read': 'Allow'}
+    assert permissions.perm_dict['groups'][group_id]['flow'] == {}
+    assert permissions.query_permissions('workbook', 'groups', 'Deny') == {group_id}
+    assert permissions.all_allow_users == {user_id}
+    assert len(_permission_calls(server)) == 5
+
+def test_content_types_are_read_concurrently(site, client):
+    with MockTableauServer(site, latency=0.2) as server:
+        token, site_id, user_id = tableau_rest.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+        started = time.perf_counter()
+        tableau_rest.QueryDefaultPermissions(VERSION, site_id, token, server.url, xmlns, site.projects[0]['id'], client=client)
+        elapsed = time.perf_counter() - started
+    # five requests one after another would take a second
+    assert elapsed < 0.6
+
+def test_bulk_query_matches_one_query_per_project(site, server, client, args):
+    project_ids = [project['id'] for project in site.projects[:4]]
+    for number, project_id in enumerate(project_ids):
+        _grant(site, project_id, 'workbook', 'user', site.users[number]['id'], {'Read': 'Allow'})
+        _grant(site, project_id, 'datasource', 'group', site.groups[number]['id'], {'Connect': 'Deny'})
+    bulk = tableau_rest.BulkQueryDefaultPermissions(*args, project_ids, max_workers=6, client=client)
+    assert len(_permission_calls(server)) == 5 * len(project_ids)
+    for project_id in project_ids:
+        assert bulk.perm_dict(project_id) == tableau_rest.QueryDefaultPermissions(*args, project_id, client=client).perm_dict
+    assert bulk.query_permissions('workbook', 'users', 'Allow') == {project_id: {site.users[number]['id']} for number, project_id in enumerate(project_ids)}
+
+def _random_grants(seed):
+    rng = random.Random(seed)
+    grants = []
+    for number in range(40):
+        users_or_groups = rng.choice(('users', 'groups'))
+        for _ in range(rng.randrange(1, 6)):
+            permissions_obj = rng.choice(tableau_rest._permissions_objects)
+            grants.append((users_or_groups, 'grantee{0}'.format(number), permissions_obj, rng.choice(tableau_rest._capability_names[permissions_obj]), rng.choice(('Allow', 'Deny'))))
+    return grants
+
+def _dict_grants(perm_dict, users_or_groups):
+    # grantee id -> set of (content type, capability, mode), read from the nested dictionary
+    return {grantee_id: {(permissions_obj, cap_name, cap_mode) for permissions_obj, capabilities in grantee.items() for cap_name, cap_mode in capabilities.items()}
+            for grantee_id, grantee in perm_dict[users_or_groups].items()}
+
+@pytest.mark.parametrize('seed', range(5))
+def test_mask_queries_agree_with_the_dict_view(seed):
+    matrix = tableau_rest.PermissionMatrix(_random_grants(seed))
+    perm_dict = matrix.perm_dict()
+    wanted = {('workbook', 'ExportData', 'Allow'), ('workbook', 'ExportXml', 'Allow')}
+    mask = matrix.mask('workbook', ['ExportData', 'ExportXml'], 'Allow')
+    denied = matrix.mask(cap_mode='Deny')
+    for users_or_groups in ('users', 'groups'):
+        grants = _dict_grants(perm_dict, users_or_groups)
+        assert matrix.grantees_with_any(mask, users_or_groups) == {grantee_id for grantee_id, held in grants.items() if held & wanted}
+        assert matrix.grantees_with_all(mask, users_or_groups) == {grantee_id for grantee_id, held in grants.items() if wanted <= held}
+        assert matrix.grantees_with_any(denied, users_or_groups) == {grantee_id for grantee_id, held in grants.items() if any(mode == 'Deny' for _, _, mode in held)}
+        for grantee_id, grantee in perm_dict[users_or_groups].items():
+            assert matrix.row(users_or_groups, grantee_id) == matrix.mask_from_dict(grantee)
+            assert grantee_id in matrix.grantees_with_exactly(matrix.mask_from_dict(grantee), users_or_groups)
+
+def test_a_new_mode_replaces_the_old_one():
+    matrix = tableau_rest.PermissionMatrix([('users', 'a', 'workbook', 'Read', 'Allow'), ('users', 'a', 'workbook', 'Read', 'Deny')])
+    assert matrix.perm_dict()['users']['a']['workbook'] == {'Read': 'Deny'}
+    assert matrix.grantees_with_any(matrix.mask('workbook', 'Read', 'Allow'), 'users') == set()
+
+def test_undocumented_capabilities_get_their_own_bit():
+    matrix = tableau_rest.PermissionMatrix([('groups', 'a', 'metric', 'Overwrite', 'Allow'), ('groups', 'b', 'metric', 'View', 'Allow')])
+    assert matrix.grantees_with_any(matrix.mask('metric', 'Overwrite'), 'groups') == {'a'}
+    assert matrix.perm_dict()['groups']['a']['metric'] == {'Overwrite': 'Allow'}
+
+def test_mask_rejects_unknown_content_types():
+    with pytest.raises(ValueError):
+        tableau_rest.PermissionMatrix().mask('dashboard')
+
+def _writes(server):
+    return [(method, path) for method, path in _permission_calls(server) if method != 'GET']
+
+def test_unchanged_sync_makes_one_read_and_no_writes(site, server, client, args):
+    project_id, user_id = site.projects[0]['id'], site.users[1]['id']
+    _grant(site, project_id, 'workbook', 'user', user_id, {'Read': 'Allow', 'ExportData': 'Deny'})
+    writer = tableau_rest.WriteDefaultPermissions(*args, 'workbook', project_id, client=client)
+    server.calls.clear()
+    report = writer.sync_permissions({'users': {user_id: {'workbook': {'Read': 'Allow', 'ExportData': 'Deny'}}}})
+    assert report == {'add': [], 'delete': [], 'unchanged': 2, 'failed': {}, 'dry_run': False}
+    assert [method for method, path in _permission_calls(server)] == ['GET']
+
+def test_sync_sends_only_the_difference(site, server, client, args):
+    project_id, user_id, group_id = site.projects[0]['id'], site.users[1]['id'], site.groups[1]['id']
+    _grant(site, project_id, 'workbook', 'user', user_id, {'Read': 'Allow', 'ExportData': 'Deny'})
+    _grant(site, project_id, 'workbook', 'group', group_id, {'Read': 'Allow'})
+    writer = tableau_rest.WriteDefaultPermissions(*args, 'workbook', project_id, client=client)
+    server.calls.clear()
+    report = writer.sync_permissions({'users': {user_id: {'workbook': {'Read': 'Allow', 'ExportData': 'Allow'}}}})
+    assert report['delete'] == [('groups', group_id, 'Read', 'Allow'), ('users', user_id, 'ExportData', 'Deny')]
+    assert report['add'] == [('users', user_id, 'ExportData', 'Allow')]
+    assert sorted(method for method, path in _writes(server)) == ['DELETE', 'DELETE', 'PUT']
+    assert tableau_rest.QueryDefaultPermissions(*args, project_id, client=client).perm_dict['users'][user_id]['workbook'] == {'Read': 'Allow', 'ExportData': 'Allow'}
+
+def test_failed_delete_is_reported_and_the_other_changes_are_sent(site, server, client, args, monkeypatch):
+    project_id, user_id, group_id = site.projects[0]['id'], site.users[1]['id'], site.groups[1]['id']
+    _grant(site, project_id, 'workbook', 'group', group_id, {'Read': 'Allow', 'Filter': 'Allow'})
+    writer = tableau_rest.WriteDefaultPermissions(*args, 'workbook', project_id, client=client)
+    refused = ('groups', group_id, 'Filter', 'Allow')
+    delete_permission = writer._delete_permission
+
+    def refuse(deletion):
+        if deletion == refused:
+            raise tableau_rest.ApiCallError('403004: Forbidden - refused')
+        return delete_permission(deletion)
+    monkeypatch.setattr(writer, '_delete_permission', refuse)
+    server.calls.clear()
+    report = writer.sync_permissions({'users': {user_id: {'workbook': {'Read': 'Allow'}}}})
+    assert report['failed'] == {refused: '403004: Forbidden - refused'}
+    assert sorted(method for method, path in _writes(server)) == ['DELETE', 'PUT']
+    perm_dict = tableau_rest.QueryDefaultPermissions(*args, project_id, client=client).perm_dict
+    assert perm_dict['groups'][group_id]['workbook'] == {'Filter': 'Allow'}
+    assert perm_dict['users'][user_id]['workbook'] == {'Read': 'Allow'}
@@ -0,0 +1,47 @@
+import tableau_rest
+from conftest import xmlns
+
+
+def _create_project(args, client, name, parent_project_id=None):
+    server_response = tableau_rest._post_project(*args, name, '', 'LockedToProject', parent_project_id, client)
+    return tableau_rest._response_records(server_response, xmlns, 'project', tableau_rest.ProjectRecord)[0][0].id
+
+def test_checkpoint_resumes_a_failed_run(server, client, args, tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    plan = {'groups': [{'name': 'Onboarding'}], 'users': [{'name': 'new.hire', 'site_role': 'Viewer'}],
+            'memberships': {'Onboarding': ['new.hire']}}
+    post_group = tableau_rest._post_group
+
+    def fail_once(*args):
+        monkeypatch.setattr(tableau_rest, '_post_group', post_group)
+        raise tableau_rest.ApiCallError('500000: Internal Server Error - injected')
+    monkeypatch.setattr(tableau_rest, '_post_group', fail_once)
+    report = tableau_rest.execute_plan(*args, plan, checkpoint=checkpoint, max_workers=1, client=client)
+    assert report['steps'][('group', 'Onboarding')]['status'] == 'failed'
+    assert report['steps'][('user', 'new.hire')]['status'] == 'done'
+    assert report['steps'][('membership', 'Onboarding', 'new.hire')]['status'] == 'skipped'
+    report = tableau_rest.execute_plan(*args, plan, checkpoint=checkpoint, max_workers=1, client=client)
+    assert {key: step['status'] for key, step in report['steps'].items()} == {
+        ('group', 'Onboarding'): 'done', ('user', 'new.hire'): 'resumed', ('membership', 'Onboarding', 'new.hire'): 'done'}
+    # the user from the first run was not sent again
+    assert len([path for method, path, status in server.calls if method == 'POST' and path.endswith('/users') and '/groups/' not in path]) == 1
+
+def test_existing_projects_are_matched_under_their_parent(server, client, args):
+    departments_id = _create_project(args, client, 'Departments')
+    finance_id = _create_project(args, client, 'Finance', departments_id)
+    report = tableau_rest.execute_plan(*args, {'projects': [{'name': 'Finance', 'parent': 'Departments'}]}, client=client)
+    assert report['steps'][('project', 'Finance')] == {'status': 'exists', 'seconds': 0.0, 'id': finance_id}
+    # a top level Finance is another project
+    report = tableau_rest.execute_plan(*args, {'projects': [{'name': 'Finance'}]}, client=client)
+    assert report['steps'][('project', 'Finance')]['status'] == 'done'
+    assert report['steps'][('project', 'Finance')]['id'] != finance_id
+
+def test_ambiguous_project_names_are_rejected(server, client, args):
+    _create_project(args, client, 'Shared')
+    _create_project(args, client, 'Shared', _create_project(args, client, 'Archive'))
+    plan = {'projects': [{'name': 'Reports', 'parent': 'Shared'}], 'groups': [{'name': 'Readers'}],
+            'permissions': {'Shared': {'project': {'groups': {'Readers': {'Read': 'Allow'}}}}}}
+    report = tableau_rest.execute_plan(*args, plan, client=client)
+    assert 'ambiguous' in report['steps'][('project', 'Reports')]['error']
+    assert 'ambiguous' in report['steps'][('permissions', 'Shared', 'project')]['error']
+    assert report['steps'][('group', 'Readers')]['status'] == 'done'
@@ -0,0 +1,26 @@
+import pytest
+
+import tableau_rest
+
+
+def test_records_have_no_instance_dictionary(client, args):
+    user = tableau_rest.QueryUsers(*args, client=client, cache=False).users[0]
+    assert not hasattr(user, '__dict__')
+    with pytest.raises(AttributeError):
+        user.name = 'renamed'
+
+def test_get_reads_fields_by_their_xml_attribute(site, client, args):
+    workbook = tableau_rest.QueryWorkbooks(*args, client=client, cache=False).workbooks[0]
+    expected = site.workbooks[0]
+    assert workbook.get('contentUrl') == workbook.content_url == expected['contentUrl']
+    assert workbook.get('project/id') == workbook.project_id == expected['_project_id']
+    assert workbook.get('size') is None
+    assert workbook.get('size', 'unknown') == 'unknown'
+
+def test_low_cardinality_values_are_shared(client, args):
+    users = tableau_rest.QueryUsers(*args, client=client, cache=False).users
+    viewers = [user for user in users if user.site_role == 'Viewer']
+    assert len(viewers) > 1
+    assert all(user.site_role is viewers[0].site_role for user in viewers)
+    assert all(user.locale is users[0].locale for user in users)
+
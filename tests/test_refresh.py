@@ -0,0 +1,28 @@
+import tableau_rest
+from conftest import xmlns
+
+
+def _new_id(server_response, element_name, record_type):
+    return tableau_rest._response_records(server_response, xmlns, element_name, record_type)[0][0].id
+
+def test_projects_refresh_finds_added_updated_and_deleted(site, client, args):
+    projects_obj = tableau_rest.QueryProjects(*args, client=client, cache=False)
+    updated_id, deleted_id = site.projects[0]['id'], site.projects[1]['id']
+    added_id = _new_id(tableau_rest._post_project(*args, 'Added', '', 'LockedToProject', None, client), 'project', tableau_rest.ProjectRecord)
+    tableau_rest.update_project_contentpermissions(args[0], args[1], args[2], updated_id, args[3], xmlns, 'ManagedByOwner', client=client)
+    tableau_rest.delete_project(*args, deleted_id, client=client)
+    report = projects_obj.refresh(args[2])
+    assert report == {'added': [added_id], 'updated': [updated_id], 'deleted': [deleted_id]}
+    assert projects_obj.projects == tableau_rest.QueryProjects(*args, client=client, cache=False).projects
+    assert projects_obj.project_name_from_id(added_id) == 'Added'
+
+def test_users_refresh_finds_users_that_never_signed_in(site, client, args):
+    users_obj = tableau_rest.QueryUsers(*args, client=client, cache=False)
+    deleted_id = site.users[-1]['id']
+    # new users have no lastLogin, so only the id listing shows them
+    added_id = _new_id(tableau_rest._post_user(*args, 'new.hire', 'Viewer', client), 'user', tableau_rest.UserRecord)
+    tableau_rest.delete_user(*args, deleted_id, client=client)
+    report = users_obj.refresh(args[2])
+    assert report['added'] == [added_id]
+    assert report['deleted'] == [deleted_id]
+    assert users_obj.users == tableau_rest.QueryUsers(*args, client=client, cache=False).users
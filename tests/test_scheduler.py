@@ -0,0 +1,70 @@
+import pytest
+import requests
+
+import tableau_rest
+from conftest import VERSION, xmlns
+
+
+class _Response():
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+    def close(self):
+        pass
+
+
+def _raises(error):
+    def send():
+        raise error
+    return send
+
+
+def test_transient_failures_are_retried(server, client, args):
+    server.fail_next([503, 502])
+    users = tableau_rest.QueryUsers(*args, client=client, cache=False).users
+    assert len(users) == 250
+    assert [status for method, path, status in server.calls if '/users' in path] == [503, 502, 200]
+
+def test_post_is_not_retried_after_server_error(server, client, args):
+    server.fail_next([500])
+    with pytest.raises(tableau_rest.ApiCallError):
+        tableau_rest.add_group(*args, 'new group', client=client)
+    assert [status for method, path, status in server.calls if method == 'POST' and path.endswith('/groups')] == [500]
+
+def test_truncated_get_body_is_retried():
+    scheduler = tableau_rest.RequestScheduler(backoff=0)
+    outcomes = [requests.exceptions.ChunkedEncodingError('truncated'), _Response(200)]
+
+    def send():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    assert scheduler.send(send, 'GET', 'http://server/api/3.11/sites/id/users').status_code == 200
+
+@pytest.mark.parametrize('error', [requests.exceptions.ChunkedEncodingError('truncated'), requests.exceptions.InvalidHeader('bad header'), RuntimeError('hook')])
+def test_failed_calls_release_their_concurrency_slot(error):
+    scheduler = tableau_rest.RequestScheduler(retries=0, max_concurrency=2, initial_concurrency=2)
+    for _ in range(3):
+        with pytest.raises(type(error)):
+            scheduler.send(_raises(error), 'GET', 'http://server/api/3.11/sites/id/users')
+    assert scheduler.limit.in_flight == 0
+    # the limit still lets calls through (this blocked forever when slots leaked)
+    assert scheduler.send(lambda: _Response(200), 'GET', 'http://server/api/3.11/sites/id/users').status_code == 200
+
+def test_raising_hook_does_not_leak_a_slot(server):
+    instrumentation = tableau_rest.Instrumentation()
+    failures = [RuntimeError('hook')] * 2
+
+    def hook(method, url):
+        if failures:
+            raise failures.pop()
+    instrumentation.add_pre_hook(hook)
+    scheduler = tableau_rest.RequestScheduler(retries=0, max_concurrency=2, initial_concurrency=2)
+    with tableau_rest.TableauClient(scheduler=scheduler, instrumentation=instrumentation) as client:
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                tableau_rest.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+        assert scheduler.limit.in_flight == 0
+        assert tableau_rest.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)[0]
@@ -0,0 +1,46 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import tableau_rest
+from tableau_mock_server import MockTableauServer, SyntheticSite
+from conftest import VERSION, xmlns
+
+
+def _sign_ins(server):
+    return len([path for method, path, status in server.calls if path.endswith('/auth/signin')])
+
+def _session(server, **options):
+    return tableau_rest.TableauSession(server.url, 'admin', 'password', VERSION, xmlns, scheduler=tableau_rest.RequestScheduler(backoff=0), **options)
+
+def test_token_store_lets_the_next_run_skip_sign_in(server, tmp_path):
+    token_store = tableau_rest.TokenStore(str(tmp_path / 'tokens.json'))
+    with _session(server, token_store=token_store) as session:
+        token = session.token
+    assert os.stat(token_store.path).st_mode & 0o777 == 0o600
+    with _session(server, token_store=token_store) as session:
+        assert session.token == token
+        assert len(tableau_rest.QueryGroups(VERSION, session.site_id, session.token, server.url, xmlns, client=session, cache=False).groups) == 11
+        session.sign_out()
+    assert _sign_ins(server) == 1
+    assert token_store.get(session._key) is None
+
+def test_expired_token_is_replaced_once_for_every_thread(server):
+    with _session(server) as session:
+        token = session.token
+        server.expire_tokens()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            listings = list(executor.map(lambda _: tableau_rest.QueryGroups(VERSION, session.site_id, token, server.url, xmlns, client=session, cache=False), range(8)))
+        assert session.token != token
+    assert all(len(groups_obj.groups) == 11 for groups_obj in listings)
+    assert _sign_ins(server) == 2
+
+def test_session_pool_keeps_one_session_per_site():
+    sites = {'': SyntheticSite.generate(users=5, groups=1, projects=1, workbooks=1, seed=1),
+             'finance': SyntheticSite.generate(users=7, groups=1, projects=1, workbooks=1, content_url='finance', seed=2)}
+    with MockTableauServer(sites) as server:
+        with tableau_rest.SessionPool(server.url, 'admin', 'password', VERSION, xmlns, max_concurrency=4) as pool:
+            assert pool.session('finance') is pool.session('finance')
+            assert pool.session('finance').site_id == sites['finance'].id
+            assert sorted(site.content_url for site in pool.query_sites()) == ['', 'finance']
+            assert pool.session('').scheduler is pool.session('finance').scheduler
+        assert _sign_ins(server) == 2
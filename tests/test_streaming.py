@@ -0,0 +1,43 @@
+import tracemalloc
+
+import pytest
+
+import tableau_rest
+from tableau_mock_server import MockTableauServer, SyntheticSite
+from conftest import VERSION, xmlns
+
+
+def _peak_memory(function):
+    tracemalloc.start()
+    try:
+        result = function()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.parametrize('iterate, listing', [(tableau_rest.iter_users, tableau_rest.QueryUsers), (tableau_rest.iter_groups, tableau_rest.QueryGroups),
+                                              (tableau_rest.iter_projects, tableau_rest.QueryProjects), (tableau_rest.iter_workbooks, tableau_rest.QueryWorkbooks),
+                                              (tableau_rest.iter_views, tableau_rest.ViewIndex)])
+@pytest.mark.parametrize('response_format', ['xml', 'json'])
+def test_iter_yields_the_records_of_the_listing_class(client, args, iterate, listing, response_format):
+    records = list(iterate(*args, client=client, page_size=7, response_format=response_format))
+    assert records == getattr(listing(*args, client=client, cache=False), listing._records_attribute)
+
+def test_pages_are_requested_as_records_are_consumed(server, client, args):
+    users = tableau_rest.iter_users(*args, client=client, page_size=100)
+    for _ in range(100):
+        next(users)
+    assert len([path for method, path, status in server.calls if '/users?' in path]) == 1
+    next(users)
+    assert len([path for method, path, status in server.calls if '/users?' in path]) == 2
+
+def test_memory_stays_flat_however_many_users_the_site_has(client):
+    site = SyntheticSite.generate(users=5000, groups=2, projects=1, workbooks=0, seed=1)
+    with MockTableauServer(site) as server:
+        token, site_id, user_id = tableau_rest.sign_in(server.url, 'admin', 'password', VERSION, xmlns, client=client)
+        args = VERSION, site_id, token, server.url, xmlns
+        streamed, streamed_peak = _peak_memory(lambda: sum(1 for user in tableau_rest.iter_users(*args, client=client, page_size=250)))
+        listed, listed_peak = _peak_memory(lambda: len(tableau_rest.QueryUsers(*args, client=client, page_size=250, cache=False).users))
+    assert streamed == listed == 5000
+    # the listing holds all 5000 records at once; the stream holds one page of xml
+    assert streamed_peak * 3 < listed_peak
@@ -0,0 +1,43 @@
+import pytest
+
+import tableau_rest
+
+
+@pytest.fixture
+def view_id(site):
+    return site.views[0]['id']
+
+@pytest.mark.parametrize('content_type, encoding', [('text/csv', 'utf-8-sig'), ('text/csv; charset=utf-8', 'utf-8-sig'),
+                                                    ('text/csv; charset="ISO-8859-1"', 'ISO-8859-1'), ('', 'utf-8-sig')])
+def test_csv_encoding(content_type, encoding):
+    assert tableau_rest._csv_encoding({'Content-Type': content_type}) == encoding
+
+def test_iter_view_data_drops_the_byte_order_mark(server, client, args, view_id):
+    VERSION, site_id, token, server_url, xmlns = args
+    batches = list(tableau_rest.iter_view_data(VERSION, site_id, token, xmlns, view_id, server_url, batch_size=400, client=client))
+    columns = batches[0][0]
+    assert not columns[0].startswith('﻿')
+    assert sum(len(rows) for columns, rows in batches) == server.view_rows
+
+def test_query_view_data_matches_the_streamed_rows(server, client, args, view_id):
+    VERSION, site_id, token, server_url, xmlns = args
+    text = tableau_rest.query_view_data(VERSION, site_id, token, xmlns, view_id, server_url, client=client)
+    assert text.startswith('Region,')
+    streamed = [row for columns, rows in tableau_rest.iter_view_data(VERSION, site_id, token, xmlns, view_id, server_url, client=client) for row in rows]
+    assert 'Nörth' in text
+    assert len(text.splitlines()) == len(streamed) + 1
+
+def test_view_data_columns_are_typed(server, client, args, view_id):
+    VERSION, site_id, token, server_url, xmlns = args
+    data = tableau_rest.view_data_columns(VERSION, site_id, token, xmlns, view_id, server_url, batch_size=300, client=client)
+    assert list(data) == ['Region', 'Category', 'Sales', 'Profit']
+    assert [str(data[name].dtype) for name in data] == ['object', 'object', 'int64', 'float64']
+    assert len(data['Sales']) == server.view_rows
+    # empty cells in a numeric column are nan
+    assert str(data['Profit'][0]) == 'nan'
+
+def test_integers_too_large_for_int64_fall_back_to_float():
+    column = tableau_rest._numpy_column(('1', '99999999999999999999'))
+    assert str(column.dtype) == 'float64'
+    assert column[1] == 1e20
+    assert str(tableau_rest._numpy_column(('1', '99999999999999999999', 'n/a')).dtype) == 'object'
@@ -0,0 +1,18 @@
+import tableau_rest
+
+
+def test_view_index_matches_one_call_per_workbook(site, server, client, args):
+    view_index = tableau_rest.ViewIndex(*args, client=client, page_size=50, cache=False)
+    assert len([path for method, path, status in server.calls if '/views?' in path and '/workbooks/' not in path]) == -(-len(site.views) // 50)
+    for workbook in site.workbooks[:5]:
+        workbook_views = tableau_rest.QueryWorkbookViews(*args, workbook['id'], client=client)
+        assert view_index.views_for_workbook(workbook['id']) == workbook_views.views
+        assert view_index.workbook_views(workbook['id']).view_ids == workbook_views.view_ids
+    assert view_index.views_for_workbook('missing') == []
+
+def test_view_index_lookups(site, client, args):
+    view_index = tableau_rest.ViewIndex(*args, client=client, cache=False)
+    view = site.views[7]
+    assert view_index.view_id_from_contenturl(view['contentUrl']) == view['id']
+    assert view_index.view_contenturl_from_id(view['id']) == view['contentUrl']
+    assert view_index.names_from_ids([view['id'], site.views[0]['id']]) == [view['name'], site.views[0]['name']]